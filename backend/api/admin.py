@@ -1,60 +1,155 @@
-from django.contrib.admin import ModelAdmin, TabularInline, display, register
+from django.contrib.admin import (ModelAdmin, SimpleListFilter, TabularInline,
+                                  display, register)
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
 
+from api.deletion import delete_recipes
+from api.duplicates import clusters
 from api.models import (Favorite, Follow, Ingredient, IngredientRecipe, Recipe,
-                        ShoppingList, Tag)
+                        RecipeDuplicate, ShoppingList, Tag)
+from api.paginations import EstimatedCountPaginator
+from api.upkeep import recipes_saved
+
+
+class LargeTableAdmin(ModelAdmin):
+    """Админка для больших таблиц: без полного COUNT(*) на каждой странице."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class SoftDeleteMixin:
+    """
+    Удаление из админки только помечает объекты, строки удаляет
+    команда purge_deleted. Подтверждение не собирает связанные объекты.
+    """
+
+    def soft_delete(self, queryset):
+        raise NotImplementedError
+
+    def get_deleted_objects(self, objs, request):
+        return (
+            [str(obj) for obj in objs],
+            {self.model._meta.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self.soft_delete(self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.soft_delete(queryset)
 
 
 class IngredientsInline(TabularInline):
 
     model = IngredientRecipe
-    extra = 3
+    extra = 1
+    autocomplete_fields = ("ingredient",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("ingredient")
+
+
+class TagListFilter(SimpleListFilter):
+    """Фильтр по тегу через битовую маску тегов рецепта."""
+
+    title = "Тег"
+    parameter_name = "tag"
+
+    def lookups(self, request, model_admin):
+        return Tag.objects.values_list("slug", "name")
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        bit = Tag.slug_bits().get(self.value())
+        if bit is None:
+            return queryset.none()
+        return queryset.alias(
+            tag_bit=F("tags_mask").bitand(bit)
+        ).exclude(tag_bit=0)
 
 
 @register(Follow)
-class FollowAdmin(ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
 
-    list_display = ("user", "user")
-    list_filter = ("user",)
-    search_fields = ("user",)
+    list_display = ("user", "following")
+    list_select_related = ("user", "following")
+    search_fields = ("user__username", "following__username")
+    autocomplete_fields = ("user", "following")
 
 
 @register(Favorite)
-class FavoriteAdmin(ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
 
     list_display = ("user", "recipe")
-    list_filter = ("user",)
-    search_fields = ("user",)
+    list_select_related = ("user", "recipe")
+    search_fields = ("user__username", "recipe__name")
+    autocomplete_fields = ("user", "recipe")
 
 
 @register(ShoppingList)
-class ShoppingListAdmin(ModelAdmin):
+class ShoppingListAdmin(LargeTableAdmin):
 
     list_display = ("user", "recipe")
-    list_filter = ("user",)
-    search_fields = ("user",)
+    list_select_related = ("user", "recipe")
+    search_fields = ("user__username", "recipe__name")
+    autocomplete_fields = ("user", "recipe")
 
 
 @register(IngredientRecipe)
-class IngredientRecipeAdmin(ModelAdmin):
+class IngredientRecipeAdmin(LargeTableAdmin):
 
     list_display = ("id", "recipe", "ingredient", "amount")
-    list_filter = ("recipe", "ingredient")
-    search_fields = ("name",)
+    list_select_related = ("recipe", "ingredient")
+    search_fields = ("recipe__name", "ingredient__name")
+    autocomplete_fields = ("recipe", "ingredient")
 
 
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(SoftDeleteMixin, LargeTableAdmin):
 
     list_display = ("id", "name", "author", "count_favorites")
-    search_fields = ("name", "author__username", "tags__name")
-    list_filter = ("name", "author__username", "tags__name")
+    list_select_related = ("author",)
+    search_fields = ("name", "author__username")
+    list_filter = (TagListFilter,)
+    autocomplete_fields = ("author",)
     inlines = [IngredientsInline]
 
-    def count_favorites(self, obj):
-        return obj.favorite.count()
+    def get_queryset(self, request):
+        favorites = (
+            Favorite.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return (
+            super()
+            .get_queryset(request)
+            .defer("search_vector")
+            .annotate(favorites_count=Coalesce(Subquery(favorites), 0))
+        )
 
-    count_favorites.short_description = "Количество добавлений в избранное"
+    def soft_delete(self, queryset):
+        delete_recipes(queryset)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.update_tags_mask()
+        recipes_saved([form.instance], created=not change)
+
+    @display(
+        description="Количество добавлений в избранное",
+        ordering="favorites_count",
+    )
+    def count_favorites(self, obj):
+        return obj.favorites_count
 
 
 @register(Tag)
@@ -72,8 +167,45 @@ class TagAdmin(ModelAdmin):
 
 
 @register(Ingredient)
-class IngredientAdmin(ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
 
     list_display = ("name", "measurement_unit")
-    list_filter = ("name",)
+    list_filter = ("measurement_unit",)
     search_fields = ("name",)
+
+
+@register(RecipeDuplicate)
+class RecipeDuplicateAdmin(LargeTableAdmin):
+
+    list_display = ("recipe", "duplicate", "similarity", "created")
+    list_select_related = ("recipe", "duplicate")
+    autocomplete_fields = ("recipe", "duplicate")
+    change_list_template = "admin/api/recipeduplicate/change_list.html"
+
+    def get_urls(self):
+        return [
+            path(
+                "clusters/",
+                self.admin_site.admin_view(self.clusters_view),
+                name="api_recipeduplicate_clusters",
+            ),
+        ] + super().get_urls()
+
+    def clusters_view(self, request):
+        groups = clusters()
+        recipes = Recipe.objects.select_related("author").in_bulk(
+            {recipe_id for group in groups for recipe_id in group}
+        )
+        return TemplateResponse(
+            request,
+            "admin/api/recipeduplicate/clusters.html",
+            {
+                **self.admin_site.each_context(request),
+                "opts": self.model._meta,
+                "title": "Группы похожих рецептов",
+                "clusters": [
+                    [recipes[recipe_id] for recipe_id in sorted(group)]
+                    for group in groups
+                ],
+            },
+        )
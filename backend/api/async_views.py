@@ -0,0 +1,78 @@
+"""
+Обслуживание API под ASGI.
+
+Django 3.2 выполняет синхронные представления и middleware под ASGI
+в одном общем потоке, поэтому медленный запрос задерживает остальные,
+а каждый запрос многократно переключается между потоками.
+PooledASGIHandler выполняет всю синхронную обработку запроса за один
+переход в ограниченный пул потоков, там же читаются потоковые ответы.
+"""
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+
+from api.tasks import get_executor
+
+
+def _in_thread(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def offload(func, *args):
+    """Выполняет синхронную функцию в ограниченном пуле потоков."""
+    return sync_to_async(
+        _in_thread,
+        thread_sensitive=False,
+        executor=get_executor("async_views", settings.ASYNC_VIEWS_WORKERS),
+    )(func, *args)
+
+
+class PooledASGIHandler(ASGIHandler):
+    """Django под ASGI: middleware и представление выполняются в пуле."""
+
+    def load_middleware(self, is_async=False):
+        super().load_middleware(is_async=False)
+
+    async def get_response_async(self, request):
+        return await offload(self.get_response, request)
+
+    def _stream_body(self, response, send):
+        for part in response:
+            for chunk, _ in self.chunk_bytes(part):
+                send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": True,
+                })
+
+    async def send_response(self, response, send):
+        """
+        Потоковый ответ читается в пуле потоков целиком одним вызовом:
+        итераторы по базе нельзя выполнять в цикле событий и переносить
+        между потоками.
+        """
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        headers = [
+            (header.encode("ascii"), value.encode("latin1"))
+            for header, value in response.items()
+        ] + [
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": headers,
+        })
+        try:
+            await offload(self._stream_body, response, async_to_sync(send))
+            await send({"type": "http.response.body"})
+        finally:
+            await offload(response.close)
@@ -0,0 +1,131 @@
+"""
+Пакетное выполнение GET-запросов к API за один HTTP-запрос.
+
+Подзапросы проходят через тот же роутер URL и те же вьюсеты, но без
+повторной аутентификации и middleware: пользователь пакетного запроса
+передаётся им принудительно. Независимые подзапросы выполняются
+параллельно в ограниченном пуле потоков, но с соединениями с базой
+пакетного запроса: потоки пула на время подзапроса подставляют их
+вместо своих. Запросы через одно соединение выполняются по очереди,
+а разбор параметров, сериализация и ожидание кэша — параллельно.
+Подзапросы только читают: транзакции на общем соединении из
+нескольких потоков недопустимы.
+"""
+import contextvars
+import copy
+import json
+import logging
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.db import connections
+from django.http import QueryDict
+from django.urls import Resolver404, resolve, reverse
+
+from api.tasks import get_executor
+
+logger = logging.getLogger(__name__)
+
+
+def _sub_request(request, path, query):
+    sub_request = copy.copy(request._request)
+    for attribute in ("_body", "_post", "_files"):
+        sub_request.__dict__.pop(attribute, None)
+    sub_request._stream = BytesIO()
+    sub_request._read_started = False
+    sub_request.method = "GET"
+    sub_request.path = sub_request.path_info = path
+    sub_request.META = {
+        **request._request.META,
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_LENGTH": "0",
+    }
+    sub_request.META.pop("CONTENT_TYPE", None)
+    sub_request.GET = QueryDict(query)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def dispatch(request, url):
+    """Выполняет один GET-подзапрос и возвращает статус и тело ответа."""
+    path, _, query = url.partition("?")
+    if not path.startswith("/api/") or path == reverse("batch"):
+        return {"status": 400, "body": {"detail": "Недопустимый адрес"}}
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {"status": 404, "body": {"detail": "Страница не найдена."}}
+    sub_request = _sub_request(request, path, query)
+    sub_request.resolver_match = match
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        if response.streaming:
+            # Потоковый ответ может держать курсор базы: закрываем его.
+            response.close()
+            return {
+                "status": 400,
+                "body": {
+                    "detail": "Потоковые ответы в пакете не поддерживаются"
+                },
+            }
+        body = response.content.decode(response.charset) or None
+        if body and response.get("Content-Type", "").startswith(
+            "application/json"
+        ):
+            body = json.loads(body)
+    except Exception:
+        logger.exception("Ошибка подзапроса %s", url)
+        return {"status": 500, "body": {"detail": "Ошибка сервера"}}
+    return {"status": response.status_code, "body": body}
+
+
+@contextmanager
+def _shared_connections(wrappers):
+    """Подставляет в текущий поток соединения другого потока."""
+    own = {alias: connections[alias] for alias in wrappers}
+    for alias, wrapper in wrappers.items():
+        connections[alias] = wrapper
+    try:
+        yield
+    finally:
+        for alias, wrapper in own.items():
+            connections[alias] = wrapper
+
+
+def _dispatch_shared(wrappers, request, url):
+    with _shared_connections(wrappers):
+        return dispatch(request, url)
+
+
+def run_batch(request, urls):
+    """
+    Выполняет подзапросы. Один подзапрос или пул из одного потока
+    выполняются прямо в текущем потоке.
+    """
+    if len(urls) == 1 or settings.BATCH_MAX_WORKERS == 1:
+        return [dispatch(request, url) for url in urls]
+    wrappers = {alias: connections[alias] for alias in connections}
+    for wrapper in wrappers.values():
+        # Заранее: иначе потоки открыли бы соединение одновременно
+        # и одно из них осталось бы занятым в пуле.
+        wrapper.ensure_connection()
+        wrapper.inc_thread_sharing()
+    try:
+        executor = get_executor("batch", settings.BATCH_MAX_WORKERS)
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                _dispatch_shared, wrappers, request, url,
+            )
+            for url in urls
+        ]
+        return [future.result() for future in futures]
+    finally:
+        for wrapper in wrappers.values():
+            wrapper.dec_thread_sharing()
@@ -0,0 +1,1088 @@
+"""
+Сценарии нагрузочных замеров для команды manage.py benchmark.
+Сценарии работают на синтетических данных: в памяти или во временной
+тестовой базе, которая удаляется после замера.
+"""
+import random
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+def _timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1]
+
+
+@contextmanager
+def _test_database():
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def _seed_recipes(count, authors=100, name="Рецепт {}".format):
+    from django.contrib.auth import get_user_model
+
+    from api.models import Recipe
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(
+            username=f"bench{index}",
+            email=f"bench{index}@example.com",
+            first_name="bench",
+            last_name="bench",
+        )
+        for index in range(authors)
+    )
+    author_ids = list(User.objects.values_list("id", flat=True))
+    rng = random.Random(0)
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author_id=author_ids[index % len(author_ids)],
+                name=name(index),
+                text="Описание",
+                cooking_time=rng.randint(1, 120),
+                image="media/bench.png",
+            )
+            for index in range(count)
+        ),
+        batch_size=5000,
+    )
+    return author_ids, list(Recipe.objects.values_list("id", flat=True))
+
+
+def by_ingredients(write, recipes=100000, ingredients=2000, repeat=200):
+    """Ранжирование рецептов по имеющимся ингредиентам."""
+    from api.indexes import IngredientIndex
+
+    rng = random.Random(0)
+    population = range(1, ingredients + 1)
+    # Частота ингредиентов убывает по Ципфу: соль встречается чаще шафрана.
+    weights = [1 / rank for rank in population]
+    pairs = [
+        (recipe_id, ingredient_id)
+        for recipe_id in range(1, recipes + 1)
+        for ingredient_id in set(
+            rng.choices(population, weights, k=rng.randint(3, 15))
+        )
+    ]
+    index = IngredientIndex()
+    started = time.perf_counter()
+    index.load(pairs)
+    elapsed = time.perf_counter() - started
+    write(f"build: {recipes} рецептов за {elapsed:.2f} с")
+    for pantry_size in (3, 10, 30):
+        pantries = [
+            rng.choices(population, weights, k=pantry_size)
+            for _ in range(repeat)
+        ]
+        pantry = iter(pantries)
+        median, worst = _timed(lambda: index.rank(next(pantry))[:6], repeat)
+        write(
+            f"rank: {pantry_size} ингредиентов, медиана "
+            f"{median * 1000:.1f} мс, максимум {worst * 1000:.1f} мс"
+        )
+
+
+def trending(write, recipes=10000, steps=(0, 20000, 100000), repeat=50):
+    """
+    Сортировка по популярности по сравнению с подсчётом избранного
+    на лету при растущей таблице Favorite.
+    """
+    from django.db.models import Count
+
+    from api.models import Favorite, Recipe
+    from api.trending import record_event
+
+    with _test_database():
+        author_ids, recipe_ids = _seed_recipes(recipes)
+        rng = random.Random(0)
+        favorites = set()
+        for target in steps:
+            batch = []
+            while len(favorites) < target:
+                pair = (rng.choice(author_ids), rng.choice(recipe_ids))
+                if pair not in favorites:
+                    favorites.add(pair)
+                    batch.append(Favorite(user_id=pair[0], recipe_id=pair[1]))
+            Favorite.objects.bulk_create(batch, batch_size=5000)
+            for favorite in batch[:1000]:
+                record_event(Favorite, favorite.recipe_id)
+            indexed, _ = _timed(
+                lambda: list(
+                    Recipe.objects.order_by("-trending_score", "-pub_date")
+                    .values_list("id", flat=True)[:6]
+                ),
+                repeat,
+            )
+            aggregated, _ = _timed(
+                lambda: list(
+                    Recipe.objects.annotate(favorites=Count("favorite"))
+                    .order_by("-favorites", "-pub_date")
+                    .values_list("id", flat=True)[:6]
+                ),
+                5,
+            )
+            write(
+                f"favorite: {len(favorites)} строк, trending "
+                f"{indexed * 1000:.2f} мс, COUNT по избранному "
+                f"{aggregated * 1000:.1f} мс"
+            )
+
+
+def events(write, connections=2000):
+    """
+    Память на одно простаивающее SSE-соединение и время доставки
+    события всем подписчикам автора.
+    """
+    import asyncio
+    import threading
+    import tracemalloc
+
+    from django.contrib.auth import get_user_model
+
+    from api.events import events_app, get_broker, issue_ticket
+    from api.models import Follow
+
+    with _test_database():
+        author_ids, _ = _seed_recipes(0, authors=2)
+        Follow.objects.create(
+            user_id=author_ids[0], following_id=author_ids[1]
+        )
+        ticket = issue_ticket(get_user_model().objects.get(id=author_ids[0]))
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            closed = loop.create_future()
+            connected = asyncio.Semaphore(0)
+            delivered = asyncio.Semaphore(0)
+
+            async def receive():
+                await closed
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                body = message.get("body", b"")
+                if body.startswith(b":"):
+                    connected.release()
+                elif body:
+                    delivered.release()
+
+            scope = {
+                "type": "http",
+                "method": "GET",
+                "path": "/api/events/",
+                "query_string": f"ticket={ticket}".encode(),
+                "headers": [],
+            }
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            started = time.perf_counter()
+            tasks = [
+                asyncio.ensure_future(events_app(scope, receive, send))
+                for _ in range(connections)
+            ]
+            for _ in range(connections):
+                await connected.acquire()
+            elapsed = time.perf_counter() - started
+            size = sum(
+                stat.size_diff
+                for stat in tracemalloc.take_snapshot().compare_to(
+                    before, "filename"
+                )
+            )
+            tracemalloc.stop()
+            write(
+                f"connect: {connections} соединений за {elapsed:.2f} с, "
+                f"{size / connections / 1024:.1f} КиБ на соединение"
+            )
+            started = time.perf_counter()
+            threading.Thread(
+                target=get_broker().publish,
+                args=(f"author:{author_ids[1]}", "recipe", {"id": 1}),
+            ).start()
+            for _ in range(connections):
+                await delivered.acquire()
+            elapsed = time.perf_counter() - started
+            write(
+                f"publish: доставка {connections} подписчикам за "
+                f"{elapsed * 1000:.1f} мс"
+            )
+            closed.set_result(None)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+
+
+async def _http_client(port, paths, deadline, counts):
+    """Клиент HTTP/1.1 с keep-alive: запросы по кругу до deadline."""
+    import asyncio
+
+    reader = writer = None
+    index = 0
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        path = paths[index % len(paths)]
+        index += 1
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+        )
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        headers = {
+            name.strip().lower(): value.strip()
+            for name, _, value in (
+                line.partition(":") for line in head.split("\r\n")[1:]
+            )
+        }
+        await reader.readexactly(int(headers.get("content-length", 0)))
+        status = int(head.split(" ", 2)[1])
+        counts[status] = counts.get(status, 0) + 1
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def asgi(write, concurrency=200, duration=5, workers=1):
+    """
+    Пропускная способность горячих GET-эндпоинтов при concurrency
+    одновременных соединений: gunicorn с синхронными воркерами
+    против gunicorn с воркерами uvicorn. Серверы запускаются с текущими
+    настройками и читают данные из настроенной базы.
+    """
+    import asyncio
+    import os
+    import socket
+    import subprocess
+    import sys
+
+    from django.conf import settings
+
+    paths = [
+        "/api/tags/",
+        "/api/ingredients/?name=%D1%81",
+        "/api/recipes/?limit=6",
+    ]
+    servers = {
+        "wsgi": ["--worker-class", "sync", "foodgram.wsgi"],
+        "asgi": [
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "foodgram.asgi:application",
+        ],
+    }
+    for name, args in servers.items():
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn",
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(workers),
+                "--backlog", str(concurrency * 2),
+                "--log-level", "warning",
+                *args,
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "ALLOWED_HOSTS": "localhost"},
+        )
+        try:
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port)).close()
+                    break
+                except OSError:
+                    time.sleep(0.2)
+            for path in paths:
+                counts = {}
+
+                async def run():
+                    deadline = time.perf_counter() + duration
+                    await asyncio.gather(*(
+                        _http_client(port, [path], deadline, counts)
+                        for _ in range(concurrency)
+                    ))
+
+                asyncio.run(run())
+                total = sum(counts.values())
+                write(
+                    f"{name} {path}: {total / duration:.0f} запросов/с "
+                    f"при {concurrency} соединениях, статусы {counts}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def db_pool(write, threads=8, requests=500, pool_size=4):
+    """
+    Короткие запросы с подключением к базе на каждый запрос против
+    пула соединений. Оба варианта работают с временной базой SQLite
+    в отдельных потоках, как воркеры сервера.
+    """
+    import tempfile
+    import threading
+
+    from django.db.backends.sqlite3.base import DatabaseWrapper
+
+    from foodgram.db.pool import pool_stats
+    from foodgram.db.sqlite3.base import \
+        DatabaseWrapper as PooledDatabaseWrapper
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings_dict = {
+            "NAME": f"{directory}/bench.sqlite3",
+            "USER": "", "PASSWORD": "", "HOST": "", "PORT": "",
+            "ATOMIC_REQUESTS": False, "AUTOCOMMIT": True,
+            "CONN_MAX_AGE": 0, "OPTIONS": {}, "TIME_ZONE": None,
+            "TEST": {},
+            "POOL": {"MAX_SIZE": pool_size},
+        }
+        for name, wrapper_class in (
+            ("connect", DatabaseWrapper), ("pool", PooledDatabaseWrapper)
+        ):
+
+            def worker():
+                wrapper = wrapper_class(settings_dict, alias=name)
+                for _ in range(requests):
+                    with wrapper.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    wrapper.close()
+
+            workers = [
+                threading.Thread(target=worker) for _ in range(threads)
+            ]
+            started = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            write(
+                f"{name}: {threads * requests / elapsed:.0f} запросов/с, "
+                f"{elapsed / requests * 1e6:.0f} мкс на запрос в потоке"
+            )
+        for stats in pool_stats():
+            write(
+                f"pool: {stats['checkouts']} выдач, создано "
+                f"{stats['created']}, исчерпан {stats['exhausted']} раз, "
+                f"ожидание в среднем "
+                f"{stats['wait_total'] / stats['checkouts'] * 1e6:.0f} мкс, "
+                f"максимум {stats['wait_max'] * 1000:.1f} мс"
+            )
+
+
+def duplicates(write, recipes=5000, copies=200, ingredients=2000):
+    """
+    Поиск почти одинаковых рецептов: корзины LSH против сравнения
+    сигнатуры со всеми рецептами. Среди рецептов есть copies копий
+    с изменённым названием и одним заменённым ингредиентом.
+    """
+    from django.conf import settings
+
+    from api.duplicates import band_hashes, features, signature, similarity
+
+    rng = random.Random(0)
+    words = [f"слово{index}" for index in range(3000)]
+    catalog = []
+    for index in range(recipes):
+        catalog.append((
+            set(rng.sample(range(ingredients), rng.randint(5, 12))),
+            f"Рецепт {index}",
+            " ".join(rng.choices(words, k=40)),
+        ))
+    originals = rng.sample(range(recipes), copies)
+    for original in originals:
+        ingredient_ids, _, text = catalog[original]
+        ingredient_ids = set(ingredient_ids)
+        ingredient_ids.pop()
+        ingredient_ids.add(rng.randrange(ingredients))
+        catalog.append((ingredient_ids, f"Копия {original}", text))
+    started = time.perf_counter()
+    signatures = [signature(features(*recipe)) for recipe in catalog]
+    elapsed = time.perf_counter() - started
+    write(
+        f"signature: {elapsed / len(catalog) * 1000:.2f} мс на рецепт"
+    )
+    buckets = {}
+    for recipe_id, minhash in enumerate(signatures[:recipes]):
+        for key in band_hashes(minhash):
+            buckets.setdefault(key, []).append(recipe_id)
+    threshold = settings.DUPLICATES_THRESHOLD
+
+    def lsh(minhash):
+        candidates = {
+            recipe_id
+            for key in band_hashes(minhash)
+            for recipe_id in buckets.get(key, ())
+        }
+        return {
+            recipe_id for recipe_id in candidates
+            if similarity(minhash, signatures[recipe_id]) >= threshold
+        }
+
+    def scan(minhash):
+        return {
+            recipe_id for recipe_id in range(recipes)
+            if similarity(minhash, signatures[recipe_id]) >= threshold
+        }
+
+    for name, search in (("lsh", lsh), ("scan", scan)):
+        queries = iter(signatures[recipes:])
+        median, worst = _timed(lambda: search(next(queries)), copies)
+        found = sum(
+            original in search(minhash)
+            for original, minhash in zip(originals, signatures[recipes:])
+        )
+        write(
+            f"{name}: медиана {median * 1000:.2f} мс, максимум "
+            f"{worst * 1000:.2f} мс, найдено копий {found} из {copies}"
+        )
+
+
+def admin(write, recipes=2000, ingredients=2000):
+    """
+    Число запросов к базе и размер страниц админки на больших таблицах.
+    Бюджет запросов страниц списков проверяет api.tests.test_admin.
+    """
+    from django.contrib.admin import site
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from api.models import (Favorite, Follow, Ingredient, IngredientRecipe,
+                            ShoppingList)
+
+    with _test_database():
+        author_ids, recipe_ids = _seed_recipes(recipes)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+            for index in range(ingredients)
+        )
+        ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+        rng = random.Random(0)
+        IngredientRecipe.objects.bulk_create(
+            (
+                IngredientRecipe(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id, amount=1
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(ingredient_ids, 5)
+            ),
+            batch_size=5000,
+        )
+        for model in (Favorite, ShoppingList):
+            model.objects.bulk_create(
+                model(user_id=rng.choice(author_ids), recipe_id=recipe_id)
+                for recipe_id in rng.sample(recipe_ids, recipes // 2)
+            )
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, following_id=following_id)
+            for user_id, following_id in zip(author_ids, author_ids[1:])
+        )
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(
+            get_user_model().objects.create_superuser(
+                "admin", "admin@example.com", "admin"
+            )
+        )
+        changelists = [
+            reverse(f"admin:{model._meta.app_label}_"
+                    f"{model._meta.model_name}_changelist")
+            for model in site._registry
+        ] + [reverse("admin:api_recipeduplicate_clusters")]
+        pages = changelists + [
+            reverse("admin:api_recipe_change", args=[recipe_ids[0]]),
+            reverse("admin:api_recipe_add"),
+        ]
+        for page in pages:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(page)
+            write(
+                f"{page}: статус {response.status_code}, "
+                f"запросов {len(queries)}, "
+                f"{len(response.content) // 1024} КиБ"
+            )
+
+
+def documents(write, recipes=2000, page=100, repeat=50):
+    """
+    Страница списка рецептов: сборка документов по моделям против
+    готовых документов с полями пользователя.
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import Prefetch
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from api.documents import refresh_recipes, render
+    from api.models import Ingredient, IngredientRecipe, Recipe, Tag
+    from api.views import serialize_recipes
+
+    with _test_database():
+        author_ids, recipe_ids = _seed_recipes(recipes)
+        tags = [
+            Tag.objects.create(
+                name=f"Тег {index}", color=color, slug=f"tag{index}"
+            )
+            for index, (color, _) in enumerate(Tag.COLOR_CHOICES)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+            for index in range(500)
+        )
+        ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+        rng = random.Random(0)
+        IngredientRecipe.objects.bulk_create(
+            (
+                IngredientRecipe(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id, amount=1
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(ingredient_ids, 8)
+            ),
+            batch_size=5000,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+            for recipe_id in recipe_ids
+            for tag in rng.sample(tags, 2)
+        )
+        refresh_recipes(recipe_ids)
+        request = Request(
+            APIRequestFactory().get("/api/recipes/", HTTP_HOST="localhost")
+        )
+        request.user = get_user_model().objects.get(id=author_ids[0])
+        context = {"request": request}
+        page_ids = recipe_ids[:page]
+
+        def models():
+            return list(
+                Recipe.objects.filter(id__in=page_ids)
+                .defer("search_vector")
+                .select_related("author")
+                .prefetch_related(
+                    "tags",
+                    Prefetch(
+                        "recipe_ingredients",
+                        queryset=IngredientRecipe.objects.select_related(
+                            "ingredient"
+                        ),
+                    ),
+                )
+            )
+
+        loaded = models()
+        for name, func in (
+            ("render", lambda: [render(recipe) for recipe in models()]),
+            ("render без запросов", lambda: [
+                render(recipe) for recipe in loaded
+            ]),
+            ("documents", lambda: serialize_recipes(page_ids, context)),
+        ):
+            median, worst = _timed(func, repeat)
+            write(
+                f"{name}: медиана {median * 1000:.2f} мс, "
+                f"максимум {worst * 1000:.2f} мс на {page} рецептов"
+            )
+
+
+def export(write, small=1000, large=4000, image_size=16 * 1024):
+    """
+    Пиковая память выгрузки архива для двух аккаунтов, больших, чем
+    EXPORT_CHUNK_SIZE. Рост памяти с размером аккаунта проверяет
+    api.tests.test_export.
+    """
+    import os
+    import tempfile
+    import tracemalloc
+    import zipfile
+
+    from django.contrib.auth import get_user_model
+    from django.core.management.base import CommandError
+    from django.test import override_settings
+
+    from api.documents import refresh_recipes
+    from api.export import export_archive
+    from api.models import Favorite, Recipe
+
+    with tempfile.TemporaryDirectory() as media, override_settings(
+        MEDIA_ROOT=media
+    ), _test_database():
+        author_ids, _ = _seed_recipes(0, authors=2)
+        rng = random.Random(0)
+        os.makedirs(os.path.join(media, "media"))
+        for author_id, count in zip(author_ids, (small, large)):
+            images = []
+            for index in range(count):
+                name = f"media/{author_id}-{index}.png"
+                with open(os.path.join(media, name), "wb") as image:
+                    image.write(rng.randbytes(image_size))
+                images.append(name)
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=author_id,
+                    name=f"Рецепт {index}",
+                    text="Описание " * 50,
+                    cooking_time=1,
+                    image=name,
+                )
+                for index, name in enumerate(images)
+            )
+        refresh_recipes(Recipe.objects.values_list("id", flat=True))
+        Favorite.objects.bulk_create(
+            Favorite(user_id=author_id, recipe_id=recipe_id)
+            for recipe_id, author_id in Recipe.objects.values_list(
+                "id", "author_id"
+            )
+        )
+        for user, count in zip(
+            get_user_model().objects.filter(id__in=author_ids).order_by("id"),
+            (small, large),
+        ):
+            path = os.path.join(media, "export.zip")
+            tracemalloc.start()
+            started = time.perf_counter()
+            with open(path, "wb") as archive:
+                for data in export_archive(user):
+                    archive.write(data)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            with zipfile.ZipFile(path) as archive:
+                broken = archive.testzip()
+                members = len(archive.namelist())
+            if broken is not None:
+                raise CommandError(f"Повреждён файл архива {broken}")
+            write(
+                f"рецептов {count}: архив "
+                f"{os.path.getsize(path) // 1024} КиБ, "
+                f"файлов {members}, {elapsed:.2f} с, пик памяти "
+                f"{peak // 1024} КиБ"
+            )
+
+
+def import_recipes(write, recipes=1000, api_recipes=100, ingredients=500):
+    """
+    Импорт рецептов из NDJSON против создания через POST /api/recipes/.
+    Время на рецепт с картинкой, тегами и ингредиентами.
+    """
+    import base64
+    import io
+    import json
+    import tempfile
+
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from PIL import Image
+    from rest_framework.test import APIClient
+
+    from api import imports
+    from api.models import Ingredient, Recipe, Tag
+
+    rng = random.Random(0)
+    words = [f"слово{index}" for index in range(3000)]
+
+    def row(index):
+        image = io.BytesIO()
+        Image.new("RGB", (64, 64), (rng.randrange(256), 0, 0)).save(
+            image, "PNG"
+        )
+        return {
+            "name": f"Рецепт {index}",
+            "text": " ".join(rng.choices(words, k=40)),
+            "cooking_time": rng.randint(1, 120),
+            "tags": rng.sample(slugs, 2),
+            "ingredients": [
+                {"id": ingredient_id, "name": name, "amount": 1}
+                for ingredient_id, name in rng.sample(ingredient_names, 8)
+            ],
+            "image": "data:image/png;base64,"
+            + base64.b64encode(image.getvalue()).decode(),
+        }
+
+    with tempfile.TemporaryDirectory() as media, override_settings(
+        MEDIA_ROOT=media, ALLOWED_HOSTS=["*"]
+    ), _test_database():
+        author_ids, _ = _seed_recipes(0, authors=2)
+        slugs = []
+        for index, (color, _) in enumerate(Tag.COLOR_CHOICES):
+            Tag.objects.create(
+                name=f"Тег {index}", color=color, slug=f"tag{index}"
+            )
+            slugs.append(f"tag{index}")
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+            for index in range(ingredients)
+        )
+        ingredient_names = list(Ingredient.objects.values_list("id", "name"))
+        author, api_author = get_user_model().objects.filter(
+            id__in=author_ids
+        )
+        lines = [
+            json.dumps(row(index), ensure_ascii=False).encode()
+            for index in range(recipes)
+        ]
+        started = time.perf_counter()
+        for event in imports.import_recipes(lines, author):
+            pass
+        elapsed = time.perf_counter() - started
+        write(
+            f"import: {event['created']} рецептов за {elapsed:.2f} с, "
+            f"{elapsed / recipes * 1000:.2f} мс на рецепт"
+        )
+        client = APIClient()
+        client.force_authenticate(api_author)
+        bodies = [row(index) for index in range(api_recipes)]
+        for body in bodies:
+            body["tags"] = [
+                Tag.objects.get(slug=slug).id for slug in body["tags"]
+            ]
+        started = time.perf_counter()
+        for body in bodies:
+            client.post("/api/recipes/", body, format="json")
+        elapsed = time.perf_counter() - started
+        write(
+            f"api: {Recipe.objects.filter(author=api_author).count()} "
+            f"рецептов за {elapsed:.2f} с, "
+            f"{elapsed / api_recipes * 1000:.2f} мс на рецепт"
+        )
+
+
+STARTUP_SCRIPT = """
+import asyncio
+import json
+import sys
+import time
+
+started = time.perf_counter()
+from django.conf import settings
+
+settings.DATABASES["default"]["NAME"] = sys.argv[1]
+from asgiref.testing import ApplicationCommunicator
+
+from foodgram.asgi import application
+
+timings = {"импорт": time.perf_counter() - started}
+if sys.argv[2] == "warm":
+    from foodgram.warmup import warm_up
+
+    warm_up()
+timings["прогрев"] = time.perf_counter() - started - timings["импорт"]
+
+
+async def get(url):
+    path, _, query = url.partition("?")
+    communicator = ApplicationCommunicator(application, {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "server": ("localhost", 80),
+        "client": ("127.0.0.1", 0),
+    })
+    await communicator.send_input({"type": "http.request", "body": b""})
+    start = await communicator.receive_output(60)
+    while (await communicator.receive_output(60)).get("more_body"):
+        pass
+    return start["status"]
+
+
+for url in sys.argv[3:]:
+    for attempt in ("первый", "второй"):
+        requested = time.perf_counter()
+        status = asyncio.run(get(url))
+        assert status == 200, (url, status)
+        timings[f"{url} {attempt}"] = time.perf_counter() - requested
+timings["до первого ответа"] = (
+    timings["импорт"] + timings["прогрев"]
+    + timings[f"{sys.argv[3]} первый"]
+)
+print(json.dumps(timings))
+"""
+
+
+def startup(write, recipes=2000, ingredients=2000, runs=3, modules=15):
+    """
+    Запуск процесса сервера: время импорта по пакетам (python -X
+    importtime) и время до первого ответа без прогрева и с прогревом
+    из foodgram.warmup. Каждый вариант запускается в новом процессе
+    runs раз, выводится медиана.
+    """
+    import json
+    import os
+    import re
+    import statistics
+    import subprocess
+    import sys
+    import tempfile
+
+    from django.conf import settings
+
+    from api.documents import refresh_recipes
+    from api.models import Ingredient, Tag
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import foodgram.asgi"],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    packages = {}
+    for own, name in re.findall(
+        r"import time:\s+(\d+) \|\s+\d+ \|\s+(\S+)", result.stderr
+    ):
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+    write(
+        f"импорт foodgram.asgi: {sum(packages.values()) / 1000:.0f} мс, "
+        "по пакетам:"
+    )
+    for package, own in sorted(
+        packages.items(), key=lambda item: item[1], reverse=True
+    )[:modules]:
+        write(f"  {package}: {own / 1000:.1f} мс")
+    urls = ["/api/recipes/", "/api/tags/", "/api/ingredients/?name=%D0%B8"]
+
+    def measure(variant):
+        timings = [
+            json.loads(subprocess.run(
+                [
+                    sys.executable, "-c", STARTUP_SCRIPT,
+                    connection.settings_dict["NAME"], variant, *urls,
+                ],
+                cwd=settings.BASE_DIR, capture_output=True, text=True,
+                check=True,
+            ).stdout)
+            for _ in range(runs)
+        ]
+        return ", ".join(
+            f"{key} "
+            f"{statistics.median(run[key] for run in timings) * 1000:.0f} мс"
+            for key in timings[0]
+        )
+
+    test_settings = connection.settings_dict["TEST"]
+    old_test_name = test_settings["NAME"]
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            # Базу в памяти не увидят дочерние процессы.
+            test_settings["NAME"] = os.path.join(directory, "startup.db")
+        try:
+            with _test_database():
+                _, recipe_ids = _seed_recipes(recipes)
+                for index, (color, _) in enumerate(Tag.COLOR_CHOICES):
+                    Tag.objects.create(
+                        name=f"Тег {index}", color=color, slug=f"tag{index}"
+                    )
+                Ingredient.objects.bulk_create(
+                    Ingredient(
+                        name=f"Ингредиент {index}", measurement_unit="г"
+                    )
+                    for index in range(ingredients)
+                )
+                refresh_recipes(recipe_ids)
+                write(f"без прогрева: {measure('cold')}")
+                write(f"с прогревом: {measure('warm')}")
+        finally:
+            test_settings["NAME"] = old_test_name
+
+
+def throttling(write, clients=10000, requests=200000):
+    """
+    Стоимость проверки CostThrottle на запрос: счётчики в памяти
+    процесса и в кэше Django, clients разных адресов и пользователей.
+    """
+    from types import SimpleNamespace
+
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import override_settings
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from api import throttling
+    from api.paginations import CustomPagination
+
+    factory = APIRequestFactory()
+    pool = []
+    for index in range(clients):
+        request = Request(factory.get(
+            "/api/recipes/", REMOTE_ADDR=f"10.{index >> 16 & 255}."
+            f"{index >> 8 & 255}.{index & 255}"
+        ))
+        request.user = (
+            SimpleNamespace(id=index, is_authenticated=True)
+            if index % 2 else AnonymousUser()
+        )
+        pool.append(request)
+    view = SimpleNamespace(
+        basename="recipes", action="list", paginator=CustomPagination()
+    )
+    for backend in ("LocalCounters", "CacheCounters"):
+        with override_settings(
+            THROTTLE_BACKEND=f"api.throttling.{backend}",
+            THROTTLE_IP_BUDGET=requests,
+            THROTTLE_USER_BUDGET=requests,
+        ):
+            throttling._counters = None
+            throttle = throttling.CostThrottle()
+            started = time.perf_counter()
+            for index in range(requests):
+                throttle.allow_request(pool[index % clients], view)
+            elapsed = time.perf_counter() - started
+        throttling._counters = None
+        write(
+            f"{backend}: {elapsed / requests * 1e6:.1f} мкс на запрос, "
+            f"{clients} клиентов"
+        )
+
+
+def suggest(write, recipes=1000000, database=100000, repeat=200):
+    """
+    Подсказки названий рецептов: построение RecipeNameIndex, память,
+    поиск по префиксам разной длины, обновления и масштабирование
+    популярности на recipes рецептах; для сравнения — запрос
+    istartswith к базе на database рецептах.
+    """
+    import tracemalloc
+
+    from api.indexes import RecipeNameIndex, normalize_name
+    from api.models import Recipe
+
+    rng = random.Random(0)
+    dishes = [
+        "Борщ", "Салат", "Суп", "Пирог", "Плов", "Котлеты", "Омлет",
+        "Запеканка", "Блины", "Рагу", "Паста", "Ёжики", "Щи", "Каша",
+        "Торт", "Пицца", "Сырники", "Жаркое", "Уха", "Соус",
+    ]
+    words = [
+        "домашний", "быстрый", "острый", "овощной", "мясной", "грибной",
+        "сырный", "сливочный", "постный", "летний", "зимний", "бабушкин",
+        "праздничный", "лёгкий", "ёлочный", "печёный", "куриный", "рыбный",
+    ]
+
+    def name():
+        return " ".join(
+            [rng.choice(dishes)] + rng.sample(words, rng.randint(1, 3))
+            + [str(rng.randrange(10000))]
+        )
+
+    rows = [
+        (recipe_id, name(), rng.paretovariate(1.5))
+        for recipe_id in range(1, recipes + 1)
+    ]
+    index = RecipeNameIndex()
+    started = time.perf_counter()
+    index.load(rows)
+    elapsed = time.perf_counter() - started
+    # Память — отдельным построением: tracemalloc замедляет его в разы.
+    tracemalloc.start()
+    measured = RecipeNameIndex()
+    measured.load(rows)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del measured
+    write(
+        f"build: {recipes} рецептов за {elapsed:.2f} с, "
+        f"{size / 2 ** 20:.0f} МБ, пик {peak / 2 ** 20:.0f} МБ"
+    )
+    originals = [original for _, original, _ in rng.sample(rows, 500)]
+    samples = [normalize_name(original) for original in originals]
+
+    def search_cold(query):
+        index._top.clear()
+        return index.search(query)
+
+    for length in (1, 2, 4, 8, 16):
+        queries = [sample[:length] for sample in samples]
+        query = iter(queries * 2)
+        cold, _ = _timed(lambda: search_cold(next(query)), len(queries))
+        warm, worst = _timed(lambda: index.search(next(query)), len(queries))
+        write(
+            f"search: префикс {length}, медиана {cold * 1e6:.0f} мкс "
+            f"впервые, {warm * 1e6:.0f} мкс повторно, "
+            f"максимум {worst * 1e6:.0f} мкс"
+        )
+    for prefix in {sample[:1] for sample in samples}:
+        index.search(prefix)
+    changes = iter(rng.sample(rows, repeat * 3))
+
+    def rescore():
+        recipe_id, recipe_name, score = next(changes)
+        index.update([recipe_id], [(recipe_id, recipe_name, score * 2)])
+
+    def rename():
+        recipe_id, _, score = next(changes)
+        index.update([recipe_id], [(recipe_id, name(), score)])
+
+    def delete():
+        recipe_id, _, _ = next(changes)
+        index.update([recipe_id], [])
+
+    for label, change in (
+        ("популярность", rescore), ("переименование", rename),
+        ("удаление", delete),
+    ):
+        median, worst = _timed(change, repeat)
+        write(
+            f"update: {label}, медиана {median * 1000:.2f} мс, "
+            f"максимум {worst * 1000:.2f} мс"
+        )
+    started = time.perf_counter()
+    index.rescale(0.5)
+    write(f"rescale: {(time.perf_counter() - started) * 1000:.1f} мс")
+    with _test_database():
+        _seed_recipes(database, name=lambda index: name())
+        for length in (1, 4, 16):
+            query = iter(originals)
+            median, _ = _timed(
+                lambda: list(
+                    Recipe.objects.filter(
+                        name__istartswith=next(query)[:length]
+                    )
+                    .order_by("-trending_score")
+                    .values_list("id", "name")[:10]
+                ),
+                50,
+            )
+            write(
+                f"база: istartswith на {database} рецептах, префикс "
+                f"{length}, медиана {median * 1000:.1f} мс"
+            )
+
+
+SCENARIOS = {
+    "by_ingredients": by_ingredients,
+    "trending": trending,
+    "events": events,
+    "asgi": asgi,
+    "db_pool": db_pool,
+    "duplicates": duplicates,
+    "admin": admin,
+    "documents": documents,
+    "export": export,
+    "import_recipes": import_recipes,
+    "startup": startup,
+    "throttling": throttling,
+    "suggest": suggest,
+}
@@ -0,0 +1,358 @@
+"""
+Бюджеты стоимости операций API.
+
+Операции берутся из docs/openapi-schema.yml. Каждая вызывается на
+одном и том же наборе данных анонимно и от имени пользователя с
+токеном; изменения откатываются, кэш перед вызовом очищается. Для
+вызова считаются запросы к базе, время базы и размер ответа; они
+сравниваются с бюджетами из budgets.json. Там же хранятся тексты
+запросов: при превышении выводится разница с ними.
+
+Статус, число запросов и размер ответа проверяет api.tests.test_budgets
+при каждом manage.py test. Время базы зависит от машины, поэтому его
+проверяет только команда check_budgets; она же записывает бюджеты.
+"""
+import base64
+import difflib
+import io
+import json
+import math
+import random
+from pathlib import Path
+
+import yaml
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.documents import refresh_recipes
+from api.models import (Favorite, Follow, Ingredient, IngredientRecipe, Recipe,
+                        ShoppingList, Tag)
+from api.nplusone import normalize
+from users.models import User
+
+BUDGETS_FILE = Path(__file__).with_name("budgets.json")
+METHODS = ("get", "post", "put", "patch", "delete")
+PASSWORD = "Budget-password-1"
+USERS = 30
+RECIPES = 300
+INGREDIENTS = 200
+# Подписок у пользователя больше порога NPLUSONE_THRESHOLD (5), иначе
+# запрос на каждого автора не отличить от нормы.
+FOLLOWS = 8
+# Запас на шум при записи бюджетов: время базы и размер ответа
+# меняются от запуска к запуску, число запросов — нет.
+DB_TIME_FACTOR = 2
+DB_TIME_MIN = 10
+SIZE_FACTOR = 1.1
+
+SAVEPOINT = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+def load_operations(schema):
+    """Пары (метод, путь) из схемы OpenAPI в порядке описания."""
+    with open(schema, encoding="utf-8") as file:
+        paths = yaml.safe_load(file)["paths"]
+    return [
+        (method, path)
+        for path, item in paths.items()
+        for method in item
+        if method in METHODS
+    ]
+
+
+def _image():
+    image = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 100, 0)).save(image, "PNG")
+    return "data:image/png;base64," + base64.b64encode(
+        image.getvalue()
+    ).decode()
+
+
+def seed():
+    """Заполняет базу набором данных и возвращает его ключевые объекты."""
+    rng = random.Random(0)
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(
+            email=f"budget{index}@example.com",
+            username=f"budget{index}",
+            first_name="Имя",
+            last_name="Фамилия",
+            password=password,
+        )
+        for index in range(USERS)
+    )
+    users = list(User.objects.order_by("id"))
+    tags = [
+        Tag.objects.create(
+            name=f"Тег {index}", color=color, slug=f"tag{index}"
+        )
+        for index, (color, _) in enumerate(Tag.COLOR_CHOICES)
+    ]
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+        for index in range(INGREDIENTS)
+    )
+    ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=users[index % USERS],
+            name=f"Рецепт {index}",
+            text="Описание рецепта",
+            cooking_time=rng.randint(1, 120),
+            image="media/budget.png",
+        )
+        for index in range(RECIPES)
+    )
+    recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(
+            recipe_id=recipe_id, ingredient_id=ingredient_id, amount=10
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(ingredient_ids, 8)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+        for recipe_id in recipe_ids
+        for tag in rng.sample(tags, 2)
+    )
+    for model in (Favorite, ShoppingList):
+        model.objects.bulk_create(
+            model(user=user, recipe_id=recipe_id)
+            for user in users
+            for recipe_id in rng.sample(recipe_ids, 10)
+        )
+    Follow.objects.bulk_create(
+        Follow(user=user, following=following)
+        for user in users
+        for following in rng.sample(
+            [other for other in users if other != user], FOLLOWS
+        )
+    )
+    refresh_recipes(recipe_ids)
+    user = users[0]
+    return {
+        "user": user,
+        "token": Token.objects.create(user=user).key,
+        "tag": tags[0].id,
+        "tags": [tag.id for tag in tags[:2]],
+        "ingredient": ingredient_ids[0],
+        "ingredients": ingredient_ids[:5],
+        "own": Recipe.objects.filter(author=user).values_list(
+            "id", flat=True
+        )[0],
+        "recipe": Recipe.objects.exclude(author=user).values_list(
+            "id", flat=True
+        )[0],
+        "favorite": Favorite.objects.filter(user=user).values_list(
+            "recipe_id", flat=True
+        )[0],
+        "not_favorite": Recipe.objects.exclude(favorite__user=user)
+        .exclude(author=user)
+        .values_list("id", flat=True)[0],
+        "in_cart": ShoppingList.objects.filter(user=user).values_list(
+            "recipe_id", flat=True
+        )[0],
+        "not_in_cart": Recipe.objects.exclude(shopping_cart__user=user)
+        .exclude(author=user)
+        .values_list("id", flat=True)[0],
+        "following": Follow.objects.filter(user=user).values_list(
+            "following_id", flat=True
+        )[0],
+        "not_following": User.objects.exclude(following__user=user)
+        .exclude(id=user.id)
+        .values_list("id", flat=True)[0],
+        "other": users[1].id,
+    }
+
+
+def requests(data):
+    """
+    Параметры пути и тело запроса для каждой операции. Операция схемы,
+    которой здесь нет, считается ошибкой: для неё нужны данные.
+    """
+    recipe = {
+        "ingredients": [
+            {"id": ingredient_id, "amount": 10}
+            for ingredient_id in data["ingredients"]
+        ],
+        "tags": data["tags"],
+        "image": _image(),
+        "name": "Новый рецепт",
+        "text": "Описание нового рецепта",
+        "cooking_time": 15,
+    }
+    return {
+        ("get", "/api/users/"): ({}, None),
+        ("post", "/api/users/"): ({}, {
+            "email": "new@example.com",
+            "username": "new",
+            "first_name": "Имя",
+            "last_name": "Фамилия",
+            "password": PASSWORD,
+        }),
+        ("get", "/api/tags/"): ({}, None),
+        ("get", "/api/tags/{id}/"): ({"id": data["tag"]}, None),
+        ("get", "/api/recipes/"): ({}, None),
+        ("post", "/api/recipes/"): ({}, recipe),
+        ("get", "/api/recipes/download_shopping_cart/"): ({}, None),
+        ("get", "/api/recipes/{id}/"): ({"id": data["recipe"]}, None),
+        ("patch", "/api/recipes/{id}/"): ({"id": data["own"]}, recipe),
+        ("delete", "/api/recipes/{id}/"): ({"id": data["own"]}, None),
+        ("post", "/api/recipes/{id}/favorite/"): (
+            {"id": data["not_favorite"]}, None
+        ),
+        ("delete", "/api/recipes/{id}/favorite/"): (
+            {"id": data["favorite"]}, None
+        ),
+        ("post", "/api/recipes/{id}/shopping_cart/"): (
+            {"id": data["not_in_cart"]}, None
+        ),
+        ("delete", "/api/recipes/{id}/shopping_cart/"): (
+            {"id": data["in_cart"]}, None
+        ),
+        ("get", "/api/users/{id}/"): ({"id": data["other"]}, None),
+        ("get", "/api/users/me/"): ({}, None),
+        ("get", "/api/users/subscriptions/"): ({}, None),
+        ("post", "/api/users/{id}/subscribe/"): (
+            {"id": data["not_following"]}, None
+        ),
+        ("delete", "/api/users/{id}/subscribe/"): (
+            {"id": data["following"]}, None
+        ),
+        ("get", "/api/ingredients/"): ({}, None),
+        ("get", "/api/ingredients/{id}/"): ({"id": data["ingredient"]}, None),
+        ("post", "/api/users/set_password/"): ({}, {
+            "current_password": PASSWORD,
+            "new_password": "Budget-password-2",
+        }),
+        ("post", "/api/auth/token/login/"): ({}, {
+            "email": data["user"].email,
+            "password": PASSWORD,
+        }),
+        ("post", "/api/auth/token/logout/"): ({}, None),
+    }
+
+
+def measure(client, method, url, body):
+    """
+    Вызывает операцию с откатом изменений. Возвращает статус, размер
+    ответа, время базы в миллисекундах и нормализованные запросы.
+    """
+    cache.clear()
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(client, method)(url, body, format="json")
+            if response.streaming:
+                size = sum(len(part) for part in response.streaming_content)
+            else:
+                size = len(response.content)
+        transaction.set_rollback(True)
+    queries = [
+        query for query in captured.captured_queries
+        if not query["sql"].startswith(SAVEPOINT)
+    ]
+    return {
+        "status": response.status_code,
+        "bytes": size,
+        "db_ms": sum(float(query["time"]) for query in queries) * 1000,
+        "sql": [normalize(query["sql"]) for query in queries],
+    }
+
+
+def run(schema, repeat=3):
+    """
+    Замеры всех операций схемы: словарь
+    {"МЕТОД путь": {"anonymous": замер, "user": замер}}.
+    Время базы — лучшее из repeat вызовов.
+    """
+    data = seed()
+    params = requests(data)
+    clients = {
+        "anonymous": APIClient(HTTP_HOST="localhost"),
+        "user": APIClient(
+            HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Token {data['token']}"
+        ),
+    }
+    results = {}
+    for method, path in load_operations(schema):
+        if (method, path) not in params:
+            raise LookupError(f"Нет данных для {method.upper()} {path}")
+        kwargs, body = params[method, path]
+        url = path.format(**kwargs)
+        results[f"{method.upper()} {path}"] = {
+            role: min(
+                (measure(client, method, url, body) for _ in range(repeat)),
+                key=lambda result: result["db_ms"],
+            )
+            for role, client in clients.items()
+        }
+    return results
+
+
+def budget(result):
+    """Бюджет по замеру с запасом на шум."""
+    return {
+        "status": result["status"],
+        "queries": len(result["sql"]),
+        "db_ms": max(
+            math.ceil(result["db_ms"] * DB_TIME_FACTOR), DB_TIME_MIN
+        ),
+        "bytes": math.ceil(result["bytes"] * SIZE_FACTOR),
+        "sql": result["sql"],
+    }
+
+
+def load_budgets(path=BUDGETS_FILE):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_budgets(results, path=BUDGETS_FILE):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                operation: {
+                    role: budget(result) for role, result in roles.items()
+                }
+                for operation, roles in results.items()
+            },
+            file,
+            ensure_ascii=False,
+            indent=2,
+        )
+        file.write("\n")
+
+
+def violations(result, expected):
+    """Список нарушений бюджета; пустой, если замер в бюджете."""
+    problems = []
+    if result["status"] != expected["status"]:
+        problems.append(
+            f"статус {result['status']} вместо {expected['status']}"
+        )
+    if len(result["sql"]) > expected["queries"]:
+        problems.append(
+            f"запросов {len(result['sql'])} > {expected['queries']}:\n"
+            + "\n".join(
+                difflib.unified_diff(
+                    expected["sql"], result["sql"],
+                    "бюджет", "замер", lineterm="",
+                )
+            )
+        )
+    if result["db_ms"] > expected["db_ms"]:
+        problems.append(
+            f"время базы {result['db_ms']:.1f} мс > {expected['db_ms']} мс"
+        )
+    if result["bytes"] > expected["bytes"]:
+        problems.append(
+            f"размер ответа {result['bytes']} > {expected['bytes']} байт"
+        )
+    return problems
@@ -0,0 +1,67 @@
+"""
+Общий кэш процессов.
+
+Кэши membership, версии индексов в памяти и счётчики CacheCounters
+полагаются на то, что кэш default общий для всех воркеров. Кэш в памяти
+процесса (LocMemCache) у каждого воркера свой: запись одного воркера
+не видна остальным. С таким кэшем данные обновляются только по
+истечении коротких сроков (*_LOCAL_TIMEOUT), а проверка api.W001
+предупреждает о нём при DEBUG=False. Счётчики CacheCounters в таком
+кэше ничем не лучше LocalCounters: о них предупреждает api.W002.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_shared(alias="default"):
+    """Общий ли кэш alias для процессов сервера."""
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_BACKENDS
+
+
+def timeout(shared, local):
+    """Срок хранения: shared для общего кэша, local — для кэша процесса."""
+    return shared if is_shared() else local
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or is_shared():
+        return []
+    return [
+        Warning(
+            "Кэш default хранится в памяти процесса.",
+            hint=(
+                "При нескольких воркерах изменения доходят до остальных "
+                "только по истечении *_LOCAL_TIMEOUT. Задайте общий кэш "
+                "через CACHE_BACKEND и CACHE_LOCATION, например "
+                "django.core.cache.backends.memcached.PyMemcacheCache."
+            ),
+            id="api.W001",
+        )
+    ]
+
+
+@register()
+def check_throttle_cache(app_configs, **kwargs):
+    if (
+        settings.THROTTLE_BACKEND != "api.throttling.CacheCounters"
+        or is_shared()
+    ):
+        return []
+    return [
+        Warning(
+            "Счётчики CacheCounters хранятся в памяти процесса.",
+            hint=(
+                "У каждого воркера свои счётчики, и лимиты умножаются на "
+                "число воркеров. Задайте общий кэш через CACHE_BACKEND и "
+                "CACHE_LOCATION или THROTTLE_BACKEND="
+                "api.throttling.LocalCounters."
+            ),
+            id="api.W002",
+        )
+    ]
@@ -0,0 +1,99 @@
+"""
+Журнал изменений рецептов для офлайн-кэша клиентов.
+
+Записи добавляются в той же транзакции, что и изменение рецепта.
+Клиент читает журнал после своего курсора и получает последнее действие
+по каждому рецепту: created и updated означают «загрузить или обновить»,
+deleted — «удалить». Команда compact_recipe_changes оставляет из старых
+записей только последнюю по каждому рецепту, поэтому журнал остаётся
+полным снимком каталога для любого курсора.
+
+Id записи выдаётся при вставке, а видимой она становится при фиксации
+транзакции, поэтому записи с меньшим id могут появиться позже записей
+с большим. Клиент получает записи только до горизонта: старше
+RECIPE_CHANGES_LAG секунд и, на PostgreSQL, старше начала самой старой
+незавершённой пишущей транзакции. Всё, что вставлено до горизонта,
+к моменту чтения уже зафиксировано, и курсор не перескакивает
+через запись, которая появится позже.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from api.models import RecipeChange
+from api.replicas import primary
+
+
+def log_change(recipe_id, action):
+    RecipeChange.objects.create(recipe_id=recipe_id, action=action)
+
+
+def log_changes(recipe_ids, action):
+    RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=recipe_id, action=action)
+        for recipe_id in recipe_ids
+    )
+
+
+def _horizon():
+    """Момент, до которого все вставленные записи уже зафиксированы."""
+    horizon = timezone.now() - timedelta(seconds=settings.RECIPE_CHANGES_LAG)
+    if connection.vendor != "postgresql":
+        return horizon
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+        )
+        (oldest,) = cursor.fetchone()
+    return min(horizon, oldest) if oldest is not None else horizon
+
+
+def changes_since(cursor):
+    """
+    Изменения после курсора: список (id рецепта, действие), новый курсор
+    и признак того, что изменения есть и после него.
+
+    Журнал читается с основной базы: горизонт считается по её
+    транзакциям, а реплика может ещё не получить часть из них.
+    """
+    with primary():
+        horizon = _horizon()
+        entries = list(
+            RecipeChange.objects.filter(id__gt=cursor)
+            .order_by("id")
+            .values_list("id", "recipe_id", "action", "created")[
+                : settings.RECIPE_CHANGES_PAGE_SIZE + 1
+            ]
+        )
+    has_more = len(entries) > settings.RECIPE_CHANGES_PAGE_SIZE
+    entries = entries[: settings.RECIPE_CHANGES_PAGE_SIZE]
+    for position, entry in enumerate(entries):
+        if entry[3] >= horizon:
+            entries = entries[:position]
+            has_more = False
+            break
+    latest = {}
+    for _, recipe_id, action, _ in entries:
+        latest.pop(recipe_id, None)
+        latest[recipe_id] = action
+    new_cursor = entries[-1][0] if entries else cursor
+    return list(latest.items()), new_cursor, has_more
+
+
+def compact(older_than):
+    """Удаляет записи старше older_than, кроме последней по рецепту."""
+    last_entries = (
+        RecipeChange.objects.values("recipe_id")
+        .annotate(last_id=Max("id"))
+        .values("last_id")
+    )
+    deleted, _ = (
+        RecipeChange.objects.filter(created__lt=timezone.now() - older_than)
+        .exclude(id__in=last_entries)
+        .delete()
+    )
+    return deleted
@@ -0,0 +1,137 @@
+"""
+Удаление пользователей и рецептов.
+
+Запрос на удаление только помечает строки датой удаления: менеджеры
+по умолчанию сразу перестают их возвращать, а производные структуры
+(журнал изменений, поиск, индекс ингредиентов) обновляются как при
+обычном удалении. Сами строки и всё, что на них ссылается, удаляет
+команда purge_deleted небольшими пачками; там же удаляются картинки
+рецептов, на которые больше никто не ссылается.
+
+Пачка удаляется запросами DELETE ... WHERE ... IN по таблицам, без
+сборщика Django: он загружает в память все связанные объекты пачки
+и удаляет их построчно. Сигналы удаления при этом не отправляются —
+производные структуры обновлены ещё при пометке.
+"""
+import functools
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.models import Recipe
+from api.upkeep import recipes_deleted
+
+User = get_user_model()
+
+
+def delete_recipes(queryset):
+    """Помечает рецепты из queryset удалёнными."""
+    recipe_ids = list(queryset.values_list("id", flat=True))
+    if not recipe_ids:
+        return
+    with transaction.atomic():
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            deleted_at=timezone.now()
+        )
+        recipes_deleted(recipe_ids)
+
+
+def delete_user(user):
+    """Помечает пользователя и его рецепты удалёнными."""
+    with transaction.atomic():
+        User.objects.filter(id=user.id).update(
+            deleted_at=timezone.now(), is_active=False
+        )
+        Token.objects.filter(user=user).delete()
+    delete_recipes(Recipe.objects.filter(author=user))
+
+
+def _dependents(model):
+    """Внешние ключи других таблиц на model: пары (модель, поле)."""
+    return [
+        (relation.related_model, relation.field)
+        for relation in model._meta.get_fields(include_hidden=True)
+        if relation.auto_created
+        and not relation.concrete
+        and (relation.one_to_many or relation.one_to_one)
+    ]
+
+
+def _raw_delete(model, ids):
+    """
+    Удаляет строки model с id из ids и каскадно всё, что на них
+    ссылается: сначала зависимые таблицы, затем сами строки.
+    """
+    if not ids:
+        return
+    for related, field in _dependents(model):
+        queryset = related._base_manager.filter(**{f"{field.name}__in": ids})
+        on_delete = field.remote_field.on_delete
+        if on_delete is DO_NOTHING:
+            continue
+        if on_delete is SET_NULL:
+            queryset.update(**{field.name: None})
+        elif on_delete is not CASCADE:
+            # PROTECT, RESTRICT и SET_DEFAULT проверяет сборщик Django.
+            queryset.delete()
+        elif _dependents(related):
+            _raw_delete(related, list(queryset.values_list("pk", flat=True)))
+        else:
+            queryset._raw_delete(queryset.db)
+    queryset = model._base_manager.filter(pk__in=ids)
+    queryset._raw_delete(queryset.db)
+
+
+def _delete_images(names):
+    storage = Recipe._meta.get_field("image").storage
+    used = set(
+        Recipe.all_objects.filter(image__in=names).values_list(
+            "image", flat=True
+        )
+    )
+    for name in set(names) - used:
+        storage.delete(name)
+
+
+def purge_recipes(batch_size=None):
+    """
+    Удаляет помеченные рецепты пачками. После каждой пачки отдаёт
+    пару (удалено всего, осталось).
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    deleted = Recipe.all_objects.filter(deleted_at__isnull=False)
+    purged = 0
+    while True:
+        batch = list(deleted.values_list("id", "image")[:batch_size])
+        if not batch:
+            return
+        images = [image for _, image in batch if image]
+        with transaction.atomic():
+            _raw_delete(Recipe, [recipe_id for recipe_id, _ in batch])
+            transaction.on_commit(functools.partial(_delete_images, images))
+        purged += len(batch)
+        yield purged, deleted.count()
+
+
+def purge_users(batch_size=None):
+    """
+    Удаляет помеченных пользователей без оставшихся рецептов пачками.
+    После каждой пачки отдаёт пару (удалено всего, осталось).
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    deleted = User.all_objects.filter(deleted_at__isnull=False).exclude(
+        id__in=Recipe.all_objects.values("author_id")
+    )
+    purged = 0
+    while True:
+        batch = list(deleted.values_list("id", flat=True)[:batch_size])
+        if not batch:
+            return
+        with transaction.atomic():
+            _raw_delete(User, batch)
+        purged += len(batch)
+        yield purged, deleted.count()
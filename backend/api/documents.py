@@ -0,0 +1,142 @@
+"""
+Готовые документы рецептов.
+
+Автор, теги и ингредиенты рецепта одинаковы для всех пользователей,
+поэтому их представление собирается при записи и хранится в
+RecipeDocument. Чтение берёт документы одним запросом и добавляет
+только поля текущего пользователя: is_favorited, is_in_shopping_cart
+и author.is_subscribed.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Prefetch
+from django.db.models.fields.json import KeyTransform
+
+from api.models import IngredientRecipe, Recipe, RecipeDocument
+from api.replicas import primary
+
+FIELDS = (
+    "id",
+    "tags",
+    "author",
+    "ingredients",
+    "is_favorited",
+    "is_in_shopping_cart",
+    "name",
+    "image",
+    "text",
+    "cooking_time",
+)
+USER_FIELDS = ("is_favorited", "is_in_shopping_cart")
+AUTHOR_FIELDS = ("email", "id", "username", "first_name", "last_name")
+REFRESH_CHUNK = 500
+
+
+def render(recipe):
+    """Документ рецепта с подгруженными автором, тегами и ингредиентами."""
+    return {
+        "id": recipe.id,
+        "tags": [
+            {
+                "id": tag.id,
+                "name": tag.name,
+                "color": tag.color,
+                "slug": tag.slug,
+            }
+            for tag in recipe.tags.all()
+        ],
+        "author": {
+            name: getattr(recipe.author, name) for name in AUTHOR_FIELDS
+        },
+        "ingredients": [
+            {
+                "id": item.ingredient.id,
+                "name": item.ingredient.name,
+                "measurement_unit": item.ingredient.measurement_unit,
+                "amount": item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        "name": recipe.name,
+        "image": recipe.image.url if recipe.image else None,
+        "text": recipe.text,
+        "cooking_time": recipe.cooking_time,
+    }
+
+
+def render_documents(recipe_ids):
+    """
+    Документы рецептов по моделям без сохранения: {id рецепта: документ},
+    удалённых рецептов в словаре нет.
+    """
+    with primary():
+        recipes = (
+            Recipe.objects.filter(id__in=recipe_ids)
+            .defer("search_vector")
+            .select_related("author")
+            .prefetch_related(
+                "tags",
+                Prefetch(
+                    "recipe_ingredients",
+                    queryset=IngredientRecipe.objects.select_related(
+                        "ingredient"
+                    ),
+                ),
+            )
+        )
+        return {recipe.id: render(recipe) for recipe in recipes}
+
+
+def refresh_documents(recipe_ids):
+    """
+    Пересобирает и сохраняет документы рецептов. Возвращает словарь
+    {id рецепта: документ}; удалённые рецепты в него не попадают.
+    """
+    documents = render_documents(recipe_ids)
+    with transaction.atomic():
+        RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeDocument.objects.bulk_create(
+            (
+                RecipeDocument(recipe_id=recipe_id, document=document)
+                for recipe_id, document in documents.items()
+            ),
+            ignore_conflicts=True,
+        )
+    return documents
+
+
+def refresh_recipes(recipe_ids):
+    """Пересобирает документы большого числа рецептов частями."""
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), REFRESH_CHUNK):
+        refresh_documents(recipe_ids[start:start + REFRESH_CHUNK])
+
+
+def load_documents(recipe_ids, fields=None):
+    """
+    Документы рецептов одним запросом, удалённые рецепты пропускаются.
+    Документы есть у всех рецептов (миграция 0019, дальше — запись
+    рецепта). Если документа всё же нет, он собирается в памяти:
+    чтение не пишет в базу.
+    С fields в PostgreSQL читаются только эти ключи документов (?fields=
+    и ?omit=). В SQLite JSON_EXTRACT возвращает строку "123" числом,
+    поэтому там документы читаются целиком.
+    """
+    queryset = RecipeDocument.objects.filter(
+        recipe_id__in=recipe_ids, recipe__deleted_at__isnull=True
+    )
+    using = router.db_for_read(RecipeDocument)
+    if fields is not None and connections[using].vendor == "postgresql":
+        keys = [name for name in fields if name not in USER_FIELDS]
+        documents = {
+            recipe_id: dict(zip(keys, values))
+            for recipe_id, *values in queryset.values_list(
+                "recipe_id",
+                *(KeyTransform(name, "document") for name in keys),
+            )
+        }
+    else:
+        documents = dict(queryset.values_list("recipe_id", "document"))
+    missing = [id for id in recipe_ids if id not in documents]
+    if missing:
+        documents.update(render_documents(missing))
+    return documents
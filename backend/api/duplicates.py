@@ -0,0 +1,194 @@
+"""
+Поиск почти одинаковых рецептов: MinHash и LSH.
+
+Рецепт описывается множеством признаков: ингредиенты, слова названия
+и тройки слов описания после нормализации. MinHash-сигнатура из
+DUPLICATES_PERMUTATIONS чисел сохраняет оценку меры Жаккара между
+такими множествами. Сигнатура режется на DUPLICATES_BANDS полос,
+хэш каждой полосы записывается в таблицу корзин. Кандидаты в дубликаты —
+рецепты хотя бы с одной общей корзиной: поиск идёт по индексу, а не
+сравнением со всеми рецептами. Кандидаты со сходством не ниже
+DUPLICATES_THRESHOLD сохраняются в RecipeDuplicate для модерации.
+"""
+import hashlib
+import random
+import re
+import zlib
+from array import array
+
+from django.conf import settings
+from django.db.models import Q
+
+from api.models import (IngredientRecipe, RecipeBucket, RecipeDuplicate,
+                        RecipeSignature)
+
+PRIME = (1 << 61) - 1
+WORD = re.compile(r"\w+")
+
+_rng = random.Random(0)
+PERMUTATIONS = [
+    (_rng.randrange(1, PRIME), _rng.randrange(PRIME))
+    for _ in range(settings.DUPLICATES_PERMUTATIONS)
+]
+
+
+def normalize(text):
+    return WORD.findall(text.casefold().replace("ё", "е"))
+
+
+def features(ingredient_ids, name, text):
+    words = normalize(text)
+    return (
+        {f"i:{id}" for id in ingredient_ids}
+        | {f"n:{word}" for word in normalize(name)}
+        | {
+            "t:" + " ".join(words[index:index + 3])
+            for index in range(max(len(words) - 2, 1))
+            if words
+        }
+    )
+
+
+def signature(shingles):
+    hashes = [zlib.crc32(shingle.encode()) for shingle in shingles]
+    if not hashes:
+        return array("Q", [PRIME] * len(PERMUTATIONS))
+    return array(
+        "Q",
+        [
+            min((a * value + b) % PRIME for value in hashes)
+            for a, b in PERMUTATIONS
+        ],
+    )
+
+
+def band_hashes(minhash):
+    """Хэши полос сигнатуры: список (номер полосы, хэш)."""
+    rows = len(minhash) // settings.DUPLICATES_BANDS
+    return [
+        (
+            band,
+            int.from_bytes(
+                hashlib.blake2b(
+                    minhash[band * rows:(band + 1) * rows].tobytes(),
+                    digest_size=8,
+                ).digest(),
+                "little",
+                signed=True,
+            ),
+        )
+        for band in range(settings.DUPLICATES_BANDS)
+    ]
+
+
+def similarity(first, second):
+    """Оценка меры Жаккара по доле совпавших минимумов."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def index_recipes(recipes):
+    """
+    Пересчитывает сигнатуры и корзины рецептов и записывает найденные
+    дубликаты, как если бы рецепты индексировались по очереди.
+    Возвращает словарь {id рецепта: [(id дубликата, сходство)]}.
+    """
+    recipe_ids = [recipe.id for recipe in recipes]
+    ingredients = {}
+    for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list("recipe_id", "ingredient_id"):
+        ingredients.setdefault(recipe_id, []).append(ingredient_id)
+    minhashes = {
+        recipe.id: signature(
+            features(ingredients.get(recipe.id, ()), recipe.name, recipe.text)
+        )
+        for recipe in recipes
+    }
+    bands = {
+        recipe_id: band_hashes(minhash)
+        for recipe_id, minhash in minhashes.items()
+    }
+    RecipeBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeDuplicate.objects.filter(
+        Q(recipe_id__in=recipe_ids) | Q(duplicate_id__in=recipe_ids)
+    ).delete()
+    buckets = {}
+    for recipe_id, *bucket in RecipeBucket.objects.filter(
+        hash__in={value for keys in bands.values() for _, value in keys}
+    ).values_list("recipe_id", "band", "hash"):
+        buckets.setdefault(tuple(bucket), set()).add(recipe_id)
+    candidates = {}
+    for recipe_id in recipe_ids:
+        candidates[recipe_id] = set()
+        for key in bands[recipe_id]:
+            candidates[recipe_id] |= buckets.get(key, set())
+            buckets.setdefault(key, set()).add(recipe_id)
+        candidates[recipe_id].discard(recipe_id)
+    signatures = dict(minhashes)
+    for recipe_id, other in RecipeSignature.objects.filter(
+        recipe_id__in=set().union(*candidates.values()) - set(minhashes),
+        recipe__deleted_at__isnull=True,
+    ).values_list("recipe_id", "minhash"):
+        signatures[recipe_id] = array("Q", bytes(other))
+    duplicates = {}
+    for recipe_id in recipe_ids:
+        duplicates[recipe_id] = []
+        for other_id in candidates[recipe_id]:
+            if other_id not in signatures:
+                continue
+            score = similarity(minhashes[recipe_id], signatures[other_id])
+            if score >= settings.DUPLICATES_THRESHOLD:
+                duplicates[recipe_id].append((other_id, score))
+    RecipeSignature.objects.bulk_create(
+        RecipeSignature(recipe_id=recipe_id, minhash=minhash.tobytes())
+        for recipe_id, minhash in minhashes.items()
+    )
+    RecipeBucket.objects.bulk_create(
+        RecipeBucket(recipe_id=recipe_id, band=band, hash=value)
+        for recipe_id, keys in bands.items()
+        for band, value in keys
+    )
+    RecipeDuplicate.objects.bulk_create(
+        (
+            RecipeDuplicate(
+                recipe_id=recipe_id, duplicate_id=other_id, similarity=score
+            )
+            for recipe_id, found in duplicates.items()
+            for other_id, score in found
+        ),
+        ignore_conflicts=True,
+    )
+    return duplicates
+
+
+def index_recipe(recipe):
+    """
+    Пересчитывает сигнатуру и корзины рецепта и записывает найденные
+    дубликаты. Возвращает список пар (id рецепта, сходство).
+    """
+    return index_recipes([recipe])[recipe.id]
+
+
+def clusters():
+    """
+    Группы рецептов, связанных парами дубликатов, от больших к малым.
+    Элементы: множества id рецептов.
+    """
+    parent = {}
+
+    def find(recipe_id):
+        parent.setdefault(recipe_id, recipe_id)
+        while parent[recipe_id] != recipe_id:
+            parent[recipe_id] = parent[parent[recipe_id]]
+            recipe_id = parent[recipe_id]
+        return recipe_id
+
+    for recipe_id, duplicate_id in RecipeDuplicate.objects.filter(
+        recipe__deleted_at__isnull=True, duplicate__deleted_at__isnull=True
+    ).values_list("recipe_id", "duplicate_id"):
+        parent[find(recipe_id)] = find(duplicate_id)
+    groups = {}
+    for recipe_id in parent:
+        groups.setdefault(find(recipe_id), set()).add(recipe_id)
+    return sorted(groups.values(), key=len, reverse=True)
@@ -0,0 +1,311 @@
+"""
+Server-Sent Events: поток /api/events/ для авторизованного пользователя.
+
+Обработчик — чистое ASGI-приложение без потока на соединение: каждое
+соединение — это корутина и очередь asyncio, поэтому процесс держит
+тысячи простаивающих клиентов. События приходят через брокер
+EVENTS_BROKER: PostgresBroker доставляет их подписчикам во всех
+процессах сервера, LocalBroker — только внутри процесса (для разработки
+и тестов).
+
+Клиент подключается с заголовком Authorization или с коротким билетом
+?ticket=, который выдаёт POST /api/events/ticket/. Токен API в адресе
+не принимается: адреса попадают в журналы доступа.
+
+Каналы:
+    user:<id>   — события пользователя (изменение списка покупок,
+                  подписки и отписки для обновления каналов авторов);
+    author:<id> — новые рецепты автора.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import (DEFAULT_DB_ALIAS, close_old_connections, connections,
+                       transaction)
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+FOLLOW = "follow"
+UNFOLLOW = "unfollow"
+
+
+class LocalBroker:
+    """
+    Pub/sub в памяти процесса. publish можно вызывать из любого потока:
+    событие передаётся в цикл событий подписчика через
+    call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def subscribe(self, channel, queue):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._channels.setdefault(channel, {})[queue] = loop
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            subscribers = self._channels.get(channel)
+            if subscribers is None:
+                return
+            subscribers.pop(queue, None)
+            if not subscribers:
+                del self._channels[channel]
+
+    def publish(self, channel, event, data):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, {}).items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, (event, data))
+            except RuntimeError:
+                # Цикл событий уже закрыт, соединение уходит.
+                pass
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Pub/sub через LISTEN/NOTIFY PostgreSQL. publish отправляет NOTIFY,
+    а каждый процесс слушает канал отдельным соединением в фоновом
+    потоке и раздаёт полученные события своим подписчикам. События,
+    отправленные, пока слушатель переподключается, теряются.
+    """
+
+    CHANNEL = "foodgram_events"
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, channel, queue):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="events-listener", daemon=True
+                )
+                self._listener.start()
+        super().subscribe(channel, queue)
+
+    def publish(self, channel, event, data):
+        payload = json.dumps(
+            {"channel": channel, "event": event, "data": data},
+            ensure_ascii=False,
+        )
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.CHANNEL, payload])
+
+    def _listen(self):
+        while True:
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Слушатель событий PostgreSQL отключился")
+                time.sleep(1)
+
+    def _listen_once(self):
+        import psycopg2
+
+        wrapper = connections[DEFAULT_DB_ALIAS]
+        connection = psycopg2.connect(**wrapper.get_connection_params())
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.CHANNEL}")
+            while True:
+                if not select.select([connection], [], [], 60)[0]:
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    message = json.loads(connection.notifies.pop(0).payload)
+                    super().publish(
+                        message["channel"], message["event"], message["data"]
+                    )
+        finally:
+            connection.close()
+
+
+def _deliver(queue, message):
+    # Последнее место в очереди оставлено для сигнала отключения.
+    if queue.qsize() >= queue.maxsize - 1:
+        # Медленный клиент теряет самое старое событие, а не память.
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
+
+
+def publish(channel, event, data):
+    """Отправляет событие после фиксации текущей транзакции."""
+    transaction.on_commit(lambda: get_broker().publish(channel, event, data))
+
+
+TICKET_SALT = "api.events.ticket"
+
+
+def issue_ticket(user):
+    """Билет на подключение к потоку, действует EVENTS_TICKET_MAX_AGE."""
+    return signing.dumps(user.id, salt=TICKET_SALT)
+
+
+def _credentials(scope):
+    """Токен из заголовка Authorization или билет из ?ticket=."""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            keyword, _, key = value.decode("latin-1").partition(" ")
+            if keyword.lower() == "token" and key:
+                return key.strip(), None
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    tickets = query.get("ticket")
+    return None, tickets[0] if tickets else None
+
+
+def _ticket_user_id(ticket):
+    try:
+        return signing.loads(
+            ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+
+
+@sync_to_async(thread_sensitive=False)
+def _authenticate(key, ticket):
+    """Пользователь по токену или билету и id авторов его подписок."""
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    from api.membership import get_ids
+    from api.models import Follow
+
+    close_old_connections()
+    try:
+        if key is not None:
+            user = Token.objects.select_related("user").get(key=key).user
+        else:
+            user = get_user_model().objects.get(id=_ticket_user_id(ticket))
+        if not user.is_active:
+            return None, ()
+        return user.id, tuple(get_ids(user.id, Follow))
+    except ObjectDoesNotExist:
+        return None, ()
+    finally:
+        close_old_connections()
+
+
+async def _respond(send, status, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({
+        "type": "http.response.body",
+        "body": json.dumps(body, ensure_ascii=False).encode(),
+    })
+
+
+def _format(event, data):
+    return (
+        f"event: {event}\n"
+        f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    ).encode()
+
+
+async def _wait_disconnect(receive, queue):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            queue.put_nowait(None)
+            return
+
+
+async def events_app(scope, receive, send):
+    """ASGI-приложение потока событий."""
+    if scope["method"] != "GET":
+        await _respond(send, 405, {"detail": "Метод не разрешён"})
+        return
+    key, ticket = _credentials(scope)
+    user_id, authors = (
+        await _authenticate(key, ticket) if key or ticket else (None, ())
+    )
+    if user_id is None:
+        await _respond(send, 401, {"detail": "Учетные данные не переданы"})
+        return
+    broker = get_broker()
+    queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE + 1)
+    channels = {f"user:{user_id}"} | {
+        f"author:{author_id}" for author_id in authors
+    }
+    for channel in channels:
+        broker.subscribe(channel, queue)
+    watcher = asyncio.ensure_future(_wait_disconnect(receive, queue))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": b": connected\n\n",
+            "more_body": True,
+        })
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(), settings.EVENTS_HEARTBEAT
+                )
+            except asyncio.TimeoutError:
+                body = b": ping\n\n"
+            else:
+                if message is None:
+                    break
+                event, data = message
+                if event in (FOLLOW, UNFOLLOW):
+                    channel = f"author:{data['id']}"
+                    if event == FOLLOW and channel not in channels:
+                        channels.add(channel)
+                        broker.subscribe(channel, queue)
+                    elif event == UNFOLLOW and channel in channels:
+                        channels.discard(channel)
+                        broker.unsubscribe(channel, queue)
+                    continue
+                body = _format(event, data)
+            await send({
+                "type": "http.response.body",
+                "body": body,
+                "more_body": True,
+            })
+    except OSError:
+        pass
+    finally:
+        watcher.cancel()
+        for channel in channels:
+            broker.unsubscribe(channel, queue)
@@ -0,0 +1,164 @@
+"""
+Выгрузка личных данных пользователя одним ZIP-архивом.
+
+Архив собирается по ходу отдачи ответа: записи читаются из базы
+итераторами по EXPORT_CHUNK_SIZE строк, картинки копируются из
+хранилища кусками по EXPORT_FILE_CHUNK байт. В памяти остаётся только
+оглавление архива — по записи на файл, — которое ZIP пишет в конце.
+"""
+import csv
+import io
+import json
+import os
+import time
+import zipfile
+
+from django.conf import settings
+
+from api.documents import load_documents
+from api.models import Favorite, Follow, Recipe, ShoppingList
+
+
+class _Buffer:
+    """Поток без seek для ZipFile: копит записанное до drain()."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        parts, self._parts = self._parts, []
+        return parts
+
+
+def _image_path(name):
+    return f"images/{os.path.basename(name)}"
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _recipes(user):
+    rows = (
+        Recipe.objects.filter(author=user)
+        .order_by("id")
+        .values_list("id", "image")
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+    separator = b"[\n"
+    for chunk in _chunks(rows, settings.EXPORT_CHUNK_SIZE):
+        documents = load_documents([recipe_id for recipe_id, _ in chunk])
+        for recipe_id, image in chunk:
+            if recipe_id not in documents:
+                continue
+            document = {
+                **documents[recipe_id],
+                "image": _image_path(image) if image else None,
+            }
+            yield separator + json.dumps(document, ensure_ascii=False).encode()
+            separator = b",\n"
+    yield b"[]\n" if separator == b"[\n" else b"\n]\n"
+
+
+def _csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _recipe_list(model, user):
+    return _csv(
+        ("id", "name", "cooking_time"),
+        model.objects.filter(user=user, recipe__deleted_at__isnull=True)
+        .order_by("recipe_id")
+        .values_list("recipe_id", "recipe__name", "recipe__cooking_time")
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE),
+    )
+
+
+def _file(storage, name):
+    with storage.open(name, "rb") as source:
+        while True:
+            data = source.read(settings.EXPORT_FILE_CHUNK)
+            if not data:
+                return
+            yield data
+
+
+def _info(name, compress_type=zipfile.ZIP_DEFLATED):
+    info = zipfile.ZipInfo(name, time.localtime()[:6])
+    info.compress_type = compress_type
+    return info
+
+
+def _members(user):
+    """Пары (ZipInfo, итератор байтов)."""
+    profile = {
+        field: getattr(user, field)
+        for field in ("id", "email", "username", "first_name", "last_name")
+    }
+    yield _info("profile.json"), [
+        json.dumps(profile, ensure_ascii=False, indent=2).encode()
+    ]
+    yield _info("recipes.json"), _recipes(user)
+    yield _info("favorites.csv"), _recipe_list(Favorite, user)
+    yield _info("shopping_cart.csv"), _recipe_list(ShoppingList, user)
+    yield _info("subscriptions.csv"), _csv(
+        ("id", "username", "first_name", "last_name"),
+        Follow.objects.filter(user=user, following__deleted_at__isnull=True)
+        .order_by("following_id")
+        .values_list(
+            "following_id",
+            "following__username",
+            "following__first_name",
+            "following__last_name",
+        )
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE),
+    )
+    storage = Recipe._meta.get_field("image").storage
+    for name in (
+        Recipe.objects.filter(author=user)
+        .exclude(image="")
+        .order_by("id")
+        .values_list("image", flat=True)
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    ):
+        if not storage.exists(name):
+            continue
+        # Картинки уже сжаты, поэтому сохраняются без сжатия.
+        info = _info(_image_path(name), zipfile.ZIP_STORED)
+        info.file_size = storage.size(name)
+        yield info, _file(storage, name)
+
+
+def export_archive(user):
+    """Итератор байтов ZIP-архива с данными пользователя."""
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for info, content in _members(user):
+            with archive.open(info, "w", force_zip64=True) as member:
+                for data in content:
+                    member.write(data)
+                    yield from buffer.drain()
+            yield from buffer.drain()
+    yield from buffer.drain()
@@ -0,0 +1,116 @@
+"""
+Персональная лента рецептов авторов, на которых подписан пользователь.
+
+Новый рецепт раскладывается по лентам подписчиков в фоне (fan-out on
+write). Для популярных авторов раскладка не выполняется: их рецепты
+подмешиваются в ленту при чтении (fan-out on read).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from api.membership import member_ids
+from api.models import Follow, Recipe, TimelineEntry
+
+POPULAR_AUTHORS_KEY = "feed:popular_authors"
+
+
+def popular_authors():
+    """Множество id авторов, у которых подписчиков больше порога."""
+    authors = cache.get(POPULAR_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(
+            Follow.objects.order_by()
+            .values("following")
+            .annotate(followers=Count("id"))
+            .filter(followers__gt=settings.FEED_FANOUT_LIMIT)
+            .values_list("following", flat=True)
+        )
+        cache.set(
+            POPULAR_AUTHORS_KEY,
+            authors,
+            settings.FEED_POPULAR_AUTHORS_TIMEOUT,
+        )
+    return authors
+
+
+def fan_out_recipe(recipe_id):
+    """Добавляет рецепт в ленты всех подписчиков автора."""
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or recipe.author_id in popular_authors():
+        return
+    followers = (
+        Follow.objects.filter(following_id=recipe.author_id)
+        .order_by("id")
+        .values_list("user_id", flat=True)
+    )
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                recipe_id=recipe.id,
+                author_id=recipe.author_id,
+                pub_date=recipe.pub_date,
+            )
+            for user_id in followers.iterator(chunk_size=batch_size)
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту последние рецепты нового автора из подписок."""
+    if author_id in popular_authors():
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        "id", "pub_date"
+    )[: settings.FEED_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in recipes
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def trim_timeline(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def sync_timeline(user_id, author_id):
+    """
+    Приводит ленту к текущему состоянию подписки. Задача смотрит на
+    подписку в базе, а не на то, чем её поставили, поэтому итог верен,
+    даже если подписку и отписку обработали разные процессы.
+    """
+    if Follow.objects.filter(user_id=user_id, following_id=author_id).exists():
+        backfill_timeline(user_id, author_id)
+    else:
+        trim_timeline(user_id, author_id)
+
+
+def feed_queryset(request):
+    """
+    Id и даты публикации рецептов ленты, отсортированные по дате.
+    Лента из таблицы объединяется с рецептами популярных авторов.
+    """
+    timeline = TimelineEntry.objects.filter(
+        user_id=request.user.id
+    ).values_list("recipe_id", "pub_date")
+    popular = popular_authors() & member_ids(request, Follow)
+    if popular:
+        timeline = timeline.order_by().union(
+            Recipe.objects.filter(author_id__in=popular)
+            .order_by()
+            .values_list("id", "pub_date")
+        )
+    return timeline.order_by("-pub_date")
@@ -1,11 +1,17 @@
 from django.contrib.auth import get_user_model
+from django.db.models import F
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
 from api.models import Recipe, Tag
+from api.search import search_recipes
 
 User = get_user_model()
 
+# До этого числа тегов фильтр перечисляет все подходящие значения маски
+# и использует индекс по Recipe.tags_mask, иначе сравнивает биты.
+MAX_ENUMERATED_TAGS = 8
+
 
 class IngredientSearchFilter(SearchFilter):
     search_param = "name"
@@ -13,19 +19,45 @@ class IngredientSearchFilter(SearchFilter):
 
 class RecipeFilter(FilterSet):
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name="tags__slug",
-        to_field_name="slug",
-        queryset=Tag.objects.all(),
-    )
+    tags = filters.CharFilter(method="filter_tags")
     is_in_shopping_cart = filters.NumberFilter(
         method="filter_is_in_shopping_cart"
     )
     is_favorited = filters.NumberFilter(method="filter_is_favorited")
+    search = filters.CharFilter(method="filter_search")
+    ordering = filters.ChoiceFilter(
+        choices=(("trending", "Популярные"),), method="filter_ordering"
+    )
 
     class Meta:
         model = Recipe
-        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "tags",
+            "author",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+            "ordering",
+        )
+
+    def filter_tags(self, queryset, name, value):
+        bits = Tag.slug_bits()
+        mask = 0
+        for slug in self.request.query_params.getlist(name):
+            mask |= bits.get(slug, 0)
+        if not mask:
+            return queryset.none()
+        positions = max(bits.values()).bit_length()
+        if positions <= MAX_ENUMERATED_TAGS:
+            return queryset.filter(
+                tags_mask__in=[
+                    tags_mask for tags_mask in range(1, 1 << positions)
+                    if tags_mask & mask
+                ]
+            )
+        return queryset.alias(
+            matched_tags=F("tags_mask").bitand(mask)
+        ).exclude(matched_tags=0)
 
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -36,3 +68,11 @@ class RecipeFilter(FilterSet):
         if self.request.user.is_authenticated and value:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        if value == "trending":
+            return queryset.order_by("-trending_score", "-pub_date")
+        return queryset
@@ -0,0 +1,32 @@
+"""
+Разбор картинок из base64 для пула процессов импорта. Модуль не
+зависит от Django, чтобы его можно было загрузить в новом процессе.
+"""
+import base64
+import binascii
+import io
+
+from PIL import Image, UnidentifiedImageError
+
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+
+def decode_image(data):
+    """
+    Картинка из строки base64, можно с префиксом data:. Возвращает
+    тройку (расширение, байты, ошибка).
+    """
+    if not isinstance(data, str) or not data:
+        return None, None, "Нужно добавить картинку!"
+    if data.startswith("data:") and ";base64," in data:
+        data = data.split(";base64,", 1)[1]
+    try:
+        content = base64.b64decode(data, validate=True)
+        with Image.open(io.BytesIO(content)) as image:
+            image.verify()
+            extension = EXTENSIONS.get(image.format)
+    except (binascii.Error, ValueError, UnidentifiedImageError, OSError):
+        return None, None, "Загрузите правильное изображение."
+    if extension is None:
+        return None, None, "Неподдерживаемый формат изображения."
+    return extension, content, None
@@ -0,0 +1,290 @@
+"""
+Пакетный импорт рецептов из NDJSON: по рецепту в строке.
+
+    {"name": "...", "text": "...", "cooking_time": 10,
+     "tags": ["breakfast"], "image": "data:image/png;base64,...",
+     "ingredients": [{"name": "соль", "measurement_unit": "г",
+                      "amount": 5}]}
+
+Теги ищутся по слагу, ингредиенты — по названию (и единице измерения,
+если названий несколько) в словарях, загруженных один раз. Строки
+проверяются и сохраняются пачками по IMPORT_BATCH_SIZE в одной
+транзакции; картинки разбираются в пуле процессов. Ошибочные строки
+пропускаются и попадают в отчёт. После каждой пачки сообщается номер
+последней обработанной строки: с него импорт можно продолжить.
+"""
+import functools
+import json
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, transaction
+
+from api.events import publish
+from api.feed import fan_out_recipe
+from api.images import decode_image
+from api.models import (MAX_AMOUNT, MIN_AMOUNT, Ingredient, IngredientRecipe,
+                        Recipe, Tag)
+from api.search import update_search_index
+from api.tasks import run_in_background
+from api.upkeep import recipes_saved
+
+NAME_MAX_LENGTH = Recipe._meta.get_field("name").max_length
+
+
+def _amount(value):
+    if isinstance(value, int) and MIN_AMOUNT <= value <= MAX_AMOUNT:
+        return value
+    return None
+
+
+class RecipeImporter:
+    """Импорт рецептов одного автора."""
+
+    def __init__(self, author):
+        self.author = author
+        self.tags = {
+            slug: (tag_id, 1 << position)
+            for slug, tag_id, position in Tag.objects.values_list(
+                "slug", "id", "position"
+            )
+        }
+        self.ingredients = {}
+        for ingredient_id, name, unit in Ingredient.objects.values_list(
+            "id", "name", "measurement_unit"
+        ):
+            self.ingredients.setdefault(name.casefold(), {})[
+                unit.casefold()
+            ] = ingredient_id
+        self.names = set(
+            Recipe.objects.filter(author=author).values_list("name", flat=True)
+        )
+        # Названия проверенных строк, ещё не сохранённых в базу.
+        self.pending = set()
+        self.storage = Recipe._meta.get_field("image").storage
+
+    def _ingredient_id(self, item):
+        units = self.ingredients.get(str(item.get("name", "")).casefold())
+        if not units:
+            return None
+        unit = item.get("measurement_unit")
+        if unit is not None:
+            return units.get(str(unit).casefold())
+        if len(units) == 1:
+            return next(iter(units.values()))
+        return None
+
+    def parse(self, row):
+        """Проверенная строка или словарь ошибок."""
+        if not isinstance(row, dict):
+            return None, {"non_field_errors": "Ожидается объект JSON"}
+        errors = {}
+        name = row.get("name")
+        if not isinstance(name, str) or not name.strip():
+            errors["name"] = "Поле обязательное"
+        elif len(name) > NAME_MAX_LENGTH:
+            errors["name"] = f"Не больше {NAME_MAX_LENGTH} символов"
+        elif name in self.names or name in self.pending:
+            errors["name"] = "Рецепт с таким названием уже есть"
+        if not isinstance(row.get("text"), str) or not row["text"].strip():
+            errors["text"] = "Поле обязательное"
+        if _amount(row.get("cooking_time")) is None:
+            errors["cooking_time"] = (
+                f"Целое число от {MIN_AMOUNT} до {MAX_AMOUNT}"
+            )
+        tags = row.get("tags")
+        if not isinstance(tags, list) or not tags:
+            errors["tags"] = "Нужно выбрать тег!"
+        elif any(
+            not isinstance(slug, str) or slug not in self.tags
+            for slug in tags
+        ):
+            errors["tags"] = "Неизвестный тег"
+        elif len(set(tags)) != len(tags):
+            errors["tags"] = "Теги повторяются!"
+        ingredients = {}
+        items = row.get("ingredients")
+        if not isinstance(items, list) or not items:
+            errors["ingredients"] = "Нужно выбрать ингредиент!"
+        else:
+            for item in items:
+                if not isinstance(item, dict):
+                    errors["ingredients"] = "Ожидается список объектов"
+                    break
+                ingredient_id = self._ingredient_id(item)
+                if ingredient_id is None:
+                    errors["ingredients"] = (
+                        f"Неизвестный ингредиент: {item.get('name')}"
+                    )
+                    break
+                if ingredient_id in ingredients:
+                    errors["ingredients"] = "Ингридиенты повторяются!"
+                    break
+                if _amount(item.get("amount")) is None:
+                    errors["ingredients"] = (
+                        f"Количество — целое число от {MIN_AMOUNT} "
+                        f"до {MAX_AMOUNT}"
+                    )
+                    break
+                ingredients[ingredient_id] = item["amount"]
+        if not row.get("image"):
+            errors["image"] = "Нужно добавить картинку!"
+        if errors:
+            return None, errors
+        self.pending.add(name)
+        return {
+            "name": name,
+            "text": row["text"],
+            "cooking_time": row["cooking_time"],
+            "tags": [self.tags[slug] for slug in tags],
+            "ingredients": ingredients,
+            "image": row["image"],
+        }, None
+
+    def _save_image(self, extension, content):
+        field = Recipe._meta.get_field("image")
+        return self.storage.save(
+            field.generate_filename(None, f"{uuid.uuid4()}.{extension}"),
+            ContentFile(content),
+        )
+
+    def save(self, rows, pool):
+        """
+        Сохраняет пачку проверенных строк [(номер, строка)]. Возвращает
+        id созданных рецептов и список ошибок [(номер, ошибки)].
+        """
+        self.pending.difference_update(row["name"] for _, row in rows)
+        errors = []
+        recipes = []
+        for (line, row), (extension, content, error) in zip(
+            rows,
+            pool.map(decode_image, [row["image"] for _, row in rows]),
+        ):
+            if error:
+                errors.append((line, {"image": error}))
+                continue
+            mask = 0
+            for _, bit in row["tags"]:
+                mask |= bit
+            recipes.append((
+                line,
+                Recipe(
+                    author=self.author,
+                    name=row["name"],
+                    text=row["text"],
+                    cooking_time=row["cooking_time"],
+                    image=self._save_image(extension, content),
+                    tags_mask=mask,
+                ),
+                row,
+            ))
+        if not recipes:
+            return [], errors
+        try:
+            with transaction.atomic():
+                self._insert([row[1:] for row in recipes])
+                transaction.on_commit(functools.partial(
+                    self._announce, [recipe for _, recipe, _ in recipes]
+                ))
+        except DatabaseError as error:
+            for line, recipe, _ in recipes:
+                self.storage.delete(recipe.image.name)
+                errors.append((line, {"non_field_errors": str(error)}))
+            return [], errors
+        self.names.update(recipe.name for _, recipe, _ in recipes)
+        return [recipe.id for _, recipe, _ in recipes], errors
+
+    def _insert(self, recipes):
+        Recipe.objects.bulk_create(recipe for recipe, _ in recipes)
+        ids = dict(
+            Recipe.objects.filter(
+                author=self.author,
+                name__in=[recipe.name for recipe, _ in recipes],
+            ).values_list("name", "id")
+        )
+        for recipe, _ in recipes:
+            recipe.id = ids[recipe.name]
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe_id=recipe.id, ingredient_id=ingredient_id, amount=amount
+            )
+            for recipe, row in recipes
+            for ingredient_id, amount in row["ingredients"].items()
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe, row in recipes
+            for tag_id, _ in row["tags"]
+        )
+        recipes_saved([recipe for recipe, _ in recipes], created=True)
+        # bulk_create не отправляет post_save: поиск обновляется здесь.
+        for recipe, _ in recipes:
+            update_search_index(recipe)
+
+    def _announce(self, recipes):
+        """Разносит рецепты по лентам и сообщает о них подписчикам."""
+        for recipe in recipes:
+            run_in_background(fan_out_recipe, recipe.id)
+            publish(
+                f"author:{recipe.author_id}",
+                "recipe",
+                {
+                    "id": recipe.id,
+                    "name": recipe.name,
+                    "author": recipe.author_id,
+                },
+            )
+
+
+def import_recipes(lines, author, skip=0, batch_size=None):
+    """
+    Импортирует рецепты из строк NDJSON, пропуская первые skip строк.
+    Отдаёт события:
+        {"line": N, "errors": {...}} — строка N не импортирована;
+        {"checkpoint": N, "created": K} — пачка до строки N сохранена;
+    и в конце {"checkpoint": N, "created": K, "failed": F, "done": true}
+    с итогами.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    importer = RecipeImporter(author)
+    created = failed = 0
+    line = skip
+    batch = []
+    with ProcessPoolExecutor(
+        max_workers=settings.IMPORT_IMAGE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+
+        def flush():
+            nonlocal created, failed
+            recipe_ids, errors = importer.save(batch, pool)
+            for error_line, error in errors:
+                yield {"line": error_line, "errors": error}
+            created += len(recipe_ids)
+            failed += len(errors)
+            batch.clear()
+            yield {"checkpoint": line, "created": len(recipe_ids)}
+
+        for line, raw in enumerate(lines, 1):
+            if line <= skip or not raw.strip():
+                continue
+            try:
+                row, errors = importer.parse(json.loads(raw))
+            except ValueError:
+                row, errors = None, {"non_field_errors": "Некорректный JSON"}
+            if errors:
+                failed += 1
+                yield {"line": line, "errors": errors}
+                continue
+            batch.append((line, row))
+            if len(batch) == batch_size:
+                yield from flush()
+        if batch:
+            yield from flush()
+    yield {
+        "checkpoint": line, "created": created, "failed": failed,
+        "done": True,
+    }
@@ -0,0 +1,639 @@
+"""
+Индексы в памяти процесса.
+
+Каждый процесс держит свою копию индекса. Номер поколения индекса и
+список изменённых объектов хранятся в общем кэше: запись увеличивает
+поколение и сохраняет изменённые id, а читатель, отставший на несколько
+поколений, догружает только эти объекты. Если изменения уже вытеснены
+из кэша, индекс перестраивается целиком.
+
+Это работает только с общим для воркеров кэшем (api/caches.py). С кэшем
+в памяти процесса поколения другим воркерам не видны: тогда запись
+сразу обновляет копию своего процесса, а остальные перестраивают
+индекс целиком не реже раза в INDEX_LOCAL_TIMEOUT секунд и до того
+отдают устаревшие данные.
+"""
+import heapq
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.caches import is_shared
+from api.models import Ingredient, IngredientRecipe, Recipe, Tag
+from api.replicas import primary
+
+
+class LocalIndex:
+    """Базовый класс индекса в памяти процесса."""
+
+    name = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._generation = None
+        self._built_at = None
+
+    @property
+    def _generation_key(self):
+        return f"index:{self.name}:generation"
+
+    def _delta_key(self, generation):
+        return f"index:{self.name}:delta:{generation}"
+
+    def _shared_generation(self):
+        generation = cache.get(self._generation_key)
+        if generation is None:
+            # Случайное начальное значение, чтобы после вытеснения ключа
+            # процессы не приняли новое поколение за своё.
+            cache.add(self._generation_key, time.time_ns())
+            generation = cache.get(self._generation_key)
+        return generation
+
+    def build(self):
+        """Полностью перестраивает индекс из базы данных."""
+        raise NotImplementedError
+
+    def refresh(self, ids):
+        """Перечитывает из базы данных объекты с указанными id."""
+        raise NotImplementedError
+
+    def apply(self, deltas):
+        """Применяет изменения нескольких поколений по порядку."""
+        self.refresh({pk for ids in deltas for pk in ids})
+
+    def _ensure_recent(self):
+        """Перестраивает индекс, если он старше INDEX_LOCAL_TIMEOUT."""
+        def recent():
+            return self._built_at is not None and (
+                time.monotonic() - self._built_at
+                < settings.INDEX_LOCAL_TIMEOUT
+            )
+
+        if recent():
+            return
+        with self._lock, primary():
+            if not recent():
+                self.build()
+                self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Приводит локальную копию к общему поколению."""
+        if not is_shared():
+            self._ensure_recent()
+            return
+        generation = self._shared_generation()
+        if generation == self._generation:
+            return
+        # Изменения читаются с основной базы: реплика может ещё не получить
+        # то, о чём уже объявлено в кэше.
+        with self._lock, primary():
+            if generation == self._generation:
+                return
+            behind = (
+                generation - self._generation
+                if self._generation is not None else None
+            )
+            deltas = None
+            if behind is not None and 0 < behind <= settings.INDEX_MAX_REPLAY:
+                keys = [
+                    self._delta_key(self._generation + step)
+                    for step in range(1, behind + 1)
+                ]
+                deltas = cache.get_many(keys)
+                if len(deltas) != len(keys):
+                    deltas = None
+            if deltas is None:
+                self.build()
+            else:
+                self.apply([deltas[key] for key in keys])
+            self._generation = generation
+
+    def invalidate(self):
+        """
+        После фиксации транзакции заставляет все процессы перестроить
+        индекс целиком: новое поколение публикуется без списка изменений.
+        """
+        transaction.on_commit(self._invalidate)
+
+    def _invalidate(self):
+        with self._lock:
+            self._built_at = None
+            if not is_shared():
+                return
+            self._shared_generation()
+            try:
+                cache.incr(self._generation_key)
+            except ValueError:
+                pass
+            self._generation = None
+
+    def touch(self, ids):
+        """
+        Сообщает об изменении объектов после фиксации транзакции:
+        обновляет локальную копию и публикует изменение для остальных.
+        """
+        ids = list(ids)
+        transaction.on_commit(lambda: self._publish(ids))
+
+    def _publish(self, delta):
+        with self._lock:
+            if not is_shared():
+                if self._built_at is not None:
+                    self.apply([delta])
+                return
+            self._shared_generation()
+            try:
+                generation = cache.incr(self._generation_key)
+            except ValueError:
+                self._generation = None
+                return
+            cache.set(
+                self._delta_key(generation), delta,
+                settings.INDEX_DELTA_TIMEOUT,
+            )
+            if self._generation == generation - 1:
+                self.apply([delta])
+                self._generation = generation
+
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        return bin(mask).count("1")
+
+
+class Ranking:
+    """
+    Ленивый список результатов IngredientIndex.rank для пагинации.
+    Группы рецептов с одинаковым числом найденных и недостающих
+    ингредиентов хранятся битовыми масками и разворачиваются в id
+    только для запрошенного среза.
+    """
+
+    def __init__(self, groups):
+        self.groups = [
+            (found, missing, mask, popcount(mask))
+            for found, missing, mask in groups
+        ]
+
+    def __len__(self):
+        return sum(size for *_, size in self.groups)
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(len(self))
+        result = []
+        for found, missing, mask, size in self.groups:
+            if stop <= 0:
+                break
+            # Внутри группы сначала новые рецепты: старшие биты первыми.
+            position = 0
+            while mask and start < size and position < stop:
+                bit = mask.bit_length() - 1
+                mask ^= 1 << bit
+                if position >= start:
+                    result.append((bit, found, missing))
+                position += 1
+            start = max(start - size, 0)
+            stop -= size
+        return result
+
+
+class IngredientIndex(LocalIndex):
+    """
+    Инвертированный индекс: id ингредиента -> битовая маска id рецептов,
+    в которых он используется. Маски — целые числа Python, поэтому
+    пересечения и объединения выполняются над всеми рецептами сразу.
+    """
+
+    name = "ingredients"
+
+    def __init__(self):
+        super().__init__()
+        self.postings = {}
+        self.sizes = {}
+        self.recipe_ingredients = {}
+
+    def load(self, pairs):
+        """Строит индекс из пар (id рецепта, id ингредиента)."""
+        recipe_ingredients = {}
+        for recipe_id, ingredient_id in pairs:
+            recipe_ingredients.setdefault(recipe_id, []).append(
+                ingredient_id
+            )
+        postings = {}
+        sizes = {}
+        for recipe_id, ingredients in recipe_ingredients.items():
+            for ingredient_id in ingredients:
+                postings.setdefault(ingredient_id, []).append(recipe_id)
+            sizes.setdefault(len(ingredients), []).append(recipe_id)
+        self.postings = {
+            ingredient_id: self._mask(recipe_ids)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self.sizes = {
+            size: self._mask(recipe_ids) for size, recipe_ids in sizes.items()
+        }
+        self.recipe_ingredients = {
+            recipe_id: tuple(ingredients)
+            for recipe_id, ingredients in recipe_ingredients.items()
+        }
+
+    @staticmethod
+    def _mask(recipe_ids):
+        recipe_ids = sorted(recipe_ids)
+        mask = bytearray(recipe_ids[-1] // 8 + 1)
+        for recipe_id in recipe_ids:
+            mask[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        return int.from_bytes(mask, "little")
+
+    def build(self):
+        self.load(
+            IngredientRecipe.objects.filter(recipe__deleted_at__isnull=True)
+            .order_by("recipe_id")
+            .values_list("recipe_id", "ingredient_id")
+            .iterator(chunk_size=10000)
+        )
+
+    def _remove(self, recipe_id):
+        ingredients = self.recipe_ingredients.pop(recipe_id, ())
+        bit = 1 << recipe_id
+        for ingredient_id in ingredients:
+            self.postings[ingredient_id] &= ~bit
+        if ingredients:
+            self.sizes[len(ingredients)] &= ~bit
+
+    def refresh(self, ids):
+        current = {}
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in=ids, recipe__deleted_at__isnull=True
+        ).values_list("recipe_id", "ingredient_id"):
+            current.setdefault(recipe_id, []).append(ingredient_id)
+        with self._lock:
+            for recipe_id in ids:
+                self._remove(recipe_id)
+                ingredients = current.get(recipe_id)
+                if not ingredients:
+                    continue
+                bit = 1 << recipe_id
+                self.recipe_ingredients[recipe_id] = tuple(ingredients)
+                for ingredient_id in ingredients:
+                    self.postings[ingredient_id] = (
+                        self.postings.get(ingredient_id, 0) | bit
+                    )
+                size = len(ingredients)
+                self.sizes[size] = self.sizes.get(size, 0) | bit
+
+    def rank(self, ingredient_ids):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов,
+        отсортированные по доле имеющихся ингредиентов, затем по числу
+        недостающих, затем по числу найденных и от новых к старым.
+        Элементы результата: (id рецепта, найдено, недостаёт).
+
+        Число совпадений для всех рецептов сразу считается побитовым
+        сумматором: planes[j] хранит j-й разряд счётчика каждого рецепта.
+        """
+        with self._lock:
+            masks = [
+                self.postings[ingredient_id]
+                for ingredient_id in set(ingredient_ids)
+                if ingredient_id in self.postings
+            ]
+            sizes = dict(self.sizes)
+        planes = []
+        for carry in masks:
+            for index, plane in enumerate(planes):
+                planes[index], carry = plane ^ carry, plane & carry
+                if not carry:
+                    break
+            else:
+                if carry:
+                    planes.append(carry)
+        matched = 0
+        for plane in planes:
+            matched |= plane
+        groups = []
+        for found in range(1, min(len(masks), 2 ** len(planes) - 1) + 1):
+            found_mask = matched
+            for index, plane in enumerate(planes):
+                found_mask &= plane if found >> index & 1 else ~plane
+            if not found_mask:
+                continue
+            for size, size_mask in sizes.items():
+                if size >= found and found_mask & size_mask:
+                    groups.append(
+                        (found, size - found, found_mask & size_mask)
+                    )
+        groups.sort(key=lambda group: (
+            -group[0] / (group[0] + group[1]), group[1], -group[0]
+        ))
+        return Ranking(groups)
+
+
+class TagIndex(LocalIndex):
+    """Список тегов, заранее сериализованный в JSON."""
+
+    name = "tags"
+
+    def __init__(self):
+        super().__init__()
+        self.content = b"[]"
+
+    def build(self):
+        self.content = json.dumps(
+            list(Tag.objects.values("id", "name", "color", "slug")),
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+
+    def refresh(self, ids):
+        self.build()
+
+
+class IngredientNameIndex(LocalIndex):
+    """
+    Ингредиенты для поиска по началу названия: отсортированный список
+    пар (название в нижнем регистре, id) и двоичный поиск по нему.
+    """
+
+    name = "ingredient_names"
+
+    def __init__(self):
+        super().__init__()
+        self.ingredients = {}
+        self.keys = []
+
+    def build(self):
+        ingredients = {
+            ingredient["id"]: ingredient
+            for ingredient in Ingredient.objects.values(
+                "id", "name", "measurement_unit"
+            )
+        }
+        keys = sorted(
+            (ingredient["name"].lower(), id)
+            for id, ingredient in ingredients.items()
+        )
+        with self._lock:
+            self.ingredients, self.keys = ingredients, keys
+
+    def refresh(self, ids):
+        current = {
+            ingredient["id"]: ingredient
+            for ingredient in Ingredient.objects.filter(id__in=ids).values(
+                "id", "name", "measurement_unit"
+            )
+        }
+        with self._lock:
+            for id in ids:
+                old = self.ingredients.pop(id, None)
+                if old is not None:
+                    key = (old["name"].lower(), id)
+                    index = bisect_left(self.keys, key)
+                    if index < len(self.keys) and self.keys[index] == key:
+                        del self.keys[index]
+                if id in current:
+                    self.ingredients[id] = current[id]
+                    insort(self.keys, (current[id]["name"].lower(), id))
+
+    def search(self, terms):
+        """
+        Ингредиенты, название которых начинается с каждого из слов
+        запроса, в порядке id — как фильтр ^name в IngredientViewSet.
+        """
+        terms = [term.lower() for term in terms]
+        with self._lock:
+            if not terms:
+                return [
+                    self.ingredients[id] for id in sorted(self.ingredients)
+                ]
+            prefix = max(terms, key=len)
+            found = []
+            index = bisect_left(self.keys, (prefix,))
+            while index < len(self.keys):
+                name, id = self.keys[index]
+                if not name.startswith(prefix):
+                    break
+                if all(name.startswith(term) for term in terms):
+                    found.append(id)
+                index += 1
+            return [self.ingredients[id] for id in sorted(found)]
+
+
+def normalize_name(name):
+    """Название для поиска: casefold, «ё» как «е», одиночные пробелы."""
+    return " ".join(name.casefold().replace("ё", "е").split())
+
+
+class RecipeNameIndex(LocalIndex):
+    """
+    Подсказки по началу названия рецепта. Нормализованные названия
+    хранятся отсортированными, рядом — массивы id, исходных названий и
+    популярности в том же порядке. Рецепты с общим началом занимают
+    отрезок, который находится двоичным поиском; лучшие по популярности
+    выбираются из него heapq.nlargest. Для префиксов, отрезок которых
+    длиннее memo_from, выбор запоминается и поправляется при изменениях.
+
+    Популярность читается при построении индекса и при изменении
+    рецепта. Добавления в избранное и список покупок индекс не трогают,
+    чтобы не менять поколение на каждое событие; decay_trending
+    масштабирует её на месте (scale), без перестроения.
+    """
+
+    name = "recipe_names"
+    memo_from = 1000
+
+    def __init__(self):
+        super().__init__()
+        self.keys = []
+        self.ids = array("q")
+        self.names = []
+        self.scores = array("d")
+        self._top = {}
+
+    def load(self, rows):
+        """Строит индекс из троек (id рецепта, название, популярность)."""
+        rows = list(rows)
+        keys = [normalize_name(name) for _, name, _ in rows]
+        # Сортировка номеров по строкам быстрее сортировки кортежей.
+        order = sorted(range(len(rows)), key=keys.__getitem__)
+        keys = [keys[position] for position in order]
+        ids = array("q", (rows[position][0] for position in order))
+        names = [rows[position][1] for position in order]
+        scores = array("d", (rows[position][2] for position in order))
+        del rows, order
+        with self._lock:
+            self.keys, self.ids, self.names, self.scores = (
+                keys, ids, names, scores
+            )
+            self._top = {}
+
+    def build(self):
+        self.load(
+            Recipe.objects.values_list("id", "name", "trending_score")
+            .iterator(chunk_size=10000)
+        )
+
+    def _prefixes(self, key):
+        """Запомненные префиксы, которым соответствует название key."""
+        return [
+            key[:size] for size in range(1, len(key) + 1)
+            if key[:size] in self._top
+        ]
+
+    def _forget(self, key):
+        for prefix in self._prefixes(key):
+            del self._top[prefix]
+
+    def _find(self, key, recipe_id):
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == recipe_id:
+                return position
+            position += 1
+        return None
+
+    def _rescore(self, position, name, score):
+        key, recipe_id = self.keys[position], self.ids[position]
+        old = self.scores[position]
+        self.names[position], self.scores[position] = name, score
+        if score < old:
+            self._forget(key)
+            return
+        # Популярность выросла: в запомненный выбор может войти только
+        # этот рецепт.
+        for prefix in self._prefixes(key):
+            top = [
+                entry for entry in self._top[prefix]
+                if entry[1] != recipe_id
+            ]
+            top.append((score, recipe_id, name))
+            top.sort(key=lambda entry: -entry[0])
+            self._top[prefix] = top[:settings.SUGGEST_LIMIT]
+
+    def _remove(self, recipe_id):
+        # array.index сравнивает элементы как объекты Python; поиск
+        # байтов в копии массива быстрее на порядок.
+        data = self.ids.tobytes()
+        needle = array("q", [recipe_id]).tobytes()
+        position = data.find(needle)
+        while position > 0 and position % self.ids.itemsize:
+            position = data.find(needle, position + 1)
+        if position < 0:
+            return
+        position //= self.ids.itemsize
+        self._forget(self.keys[position])
+        del self.keys[position]
+        del self.ids[position]
+        del self.names[position]
+        del self.scores[position]
+
+    def refresh(self, ids):
+        self.update(
+            ids,
+            Recipe.objects.filter(id__in=ids).values_list(
+                "id", "name", "trending_score"
+            ),
+        )
+
+    def scale(self, factor):
+        """
+        После фиксации транзакции умножает популярность всех рецептов
+        на factor во всех процессах, как это сделал trending.decay().
+        """
+        transaction.on_commit(lambda: self._publish({"scale": factor}))
+
+    def apply(self, deltas):
+        # Перечитанные из базы рецепты уже в новом масштабе, поэтому
+        # масштаб применяется до них.
+        factor = 1
+        ids = set()
+        for delta in deltas:
+            if isinstance(delta, dict):
+                factor *= delta["scale"]
+            else:
+                ids.update(delta)
+        if factor != 1:
+            self.rescale(factor)
+        if ids:
+            self.refresh(ids)
+
+    def rescale(self, factor):
+        """
+        Умножает популярность на factor; значения меньше
+        TRENDING_MIN_SCORE обнуляются, как в базе.
+        """
+        with self._lock:
+            minimum = settings.TRENDING_MIN_SCORE
+            self.scores = array("d", (
+                0.0 if score < minimum else score
+                for score in (score * factor for score in self.scores)
+            ))
+            self._top = {}
+
+    def update(self, ids, rows):
+        """
+        Обновляет рецепты ids по тройкам (id, название, популярность);
+        рецепты ids без тройки удаляются из индекса.
+        """
+        current = {
+            recipe_id: (name, score) for recipe_id, name, score in rows
+        }
+        with self._lock:
+            for recipe_id in ids:
+                if recipe_id in current:
+                    name, score = current[recipe_id]
+                    key = normalize_name(name)
+                    position = self._find(key, recipe_id)
+                    if position is not None:
+                        self._rescore(position, name, score)
+                        continue
+                # Новый, переименованный или удалённый рецепт.
+                self._remove(recipe_id)
+                if recipe_id not in current:
+                    continue
+                position = bisect_right(self.keys, key)
+                self.keys.insert(position, key)
+                self.ids.insert(position, recipe_id)
+                self.names.insert(position, name)
+                self.scores.insert(position, score)
+                self._forget(key)
+
+    def search(self, query):
+        """
+        До SUGGEST_LIMIT рецептов, название которых начинается с query,
+        от популярных к менее популярным, при равенстве по алфавиту.
+        """
+        key = normalize_name(query)
+        if not key:
+            return []
+        with self._lock:
+            top = self._top.get(key)
+            if top is None:
+                start = bisect_left(self.keys, key)
+                end = bisect_right(self.keys, key + "\U0010ffff", start)
+                top = [
+                    (self.scores[position], self.ids[position],
+                     self.names[position])
+                    for position in heapq.nlargest(
+                        settings.SUGGEST_LIMIT,
+                        range(start, end),
+                        key=self.scores.__getitem__,
+                    )
+                ]
+                if end - start > self.memo_from:
+                    self._top[key] = top
+        return [{"id": recipe_id, "name": name} for _, recipe_id, name in top]
+
+
+ingredient_index = IngredientIndex()
+tag_index = TagIndex()
+ingredient_name_index = IngredientNameIndex()
+recipe_name_index = RecipeNameIndex()
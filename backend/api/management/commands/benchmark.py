@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Запускает нагрузочные замеры на синтетических данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios", nargs="*",
+            help=f"Сценарии для запуска: {', '.join(SCENARIOS)} "
+            "(по умолчанию все)",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["scenarios"]) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Неизвестные сценарии: {', '.join(unknown)}")
+        for name in options["scenarios"] or SCENARIOS:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            SCENARIOS[name](self.stdout.write)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.documents import refresh_recipes
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Собирает готовые документы рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Пересобрать документы всех рецептов",
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by("id")
+        if not options["full"]:
+            recipes = recipes.filter(document__isnull=True)
+        recipe_ids = list(recipes.values_list("id", flat=True))
+        refresh_recipes(recipe_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f"Собрано документов: {len(recipe_ids)}")
+        )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Recipe
+from api.recommendations import build_similarities
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает похожие рецепты для рекомендаций"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Пересчитать все рецепты, а не только изменившиеся",
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = None
+        if options["full"]:
+            recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+        total = build_similarities(
+            recipe_ids,
+            report=lambda done, total: self.stdout.write(
+                f"Обработано рецептов: {done}/{total}"
+            ),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Похожие рецепты пересчитаны: {total}")
+        )
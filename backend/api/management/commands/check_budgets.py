@@ -0,0 +1,77 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from api import budgets
+from api.benchmarks import _test_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет число запросов, время базы и размер ответа каждой "
+        "операции из схемы OpenAPI по бюджетам"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schema",
+            default=settings.BASE_DIR.parent / "docs" / "openapi-schema.yml",
+            help="Путь к схеме OpenAPI",
+        )
+        parser.add_argument(
+            "--budgets", default=budgets.BUDGETS_FILE,
+            help="Файл с бюджетами",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3,
+            help="Сколько раз вызывать операцию для замера времени",
+        )
+        parser.add_argument(
+            "--update", action="store_true",
+            help="Записать текущие замеры как новые бюджеты",
+        )
+
+    def handle(self, *args, **options):
+        # Поиск N+1 замедляет каждый запрос и исказил бы время базы.
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media, NPLUSONE_MODE=""
+        ), _test_database():
+            try:
+                results = budgets.run(options["schema"], options["repeat"])
+            except LookupError as error:
+                raise CommandError(error)
+        if options["update"]:
+            budgets.save_budgets(results, options["budgets"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Бюджеты записаны в {options['budgets']}"
+            ))
+            return
+        expected = budgets.load_budgets(options["budgets"])
+        failed = []
+        for operation, roles in results.items():
+            for role, result in roles.items():
+                if role not in expected.get(operation, {}):
+                    failed.append(f"{operation} [{role}]")
+                    self.stderr.write(f"{operation} [{role}]: нет бюджета")
+                    continue
+                limit = expected[operation][role]
+                self.stdout.write(
+                    f"{operation} [{role}]: статус {result['status']}, "
+                    f"запросов {len(result['sql'])}/{limit['queries']}, "
+                    f"база {result['db_ms']:.1f}/{limit['db_ms']} мс, "
+                    f"{result['bytes']}/{limit['bytes']} байт"
+                )
+                problems = budgets.violations(result, limit)
+                if problems:
+                    failed.append(f"{operation} [{role}]")
+                    for problem in problems:
+                        self.stderr.write(f"{operation} [{role}]: {problem}")
+        for operation in set(expected) - set(results):
+            self.stderr.write(f"{operation}: бюджет без операции в схеме")
+        if failed:
+            raise CommandError(
+                "Превышены бюджеты: " + ", ".join(failed)
+            )
+        self.stdout.write(self.style.SUCCESS("Все операции в бюджете"))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.changes import compact
+
+
+class Command(BaseCommand):
+    help = "Сворачивает старые записи журнала изменений рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30,
+            help="Сворачивать записи старше указанного числа дней",
+        )
+
+    def handle(self, *args, **options):
+        deleted = compact(timedelta(days=options["days"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"Удалено устаревших записей: {deleted}")
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.trending import decay
+
+
+class Command(BaseCommand):
+    help = "Применяет затухание к популярности рецептов"
+
+    def handle(self, *args, **options):
+        updated = decay()
+        self.stdout.write(
+            self.style.SUCCESS(f"Популярность пересчитана: {updated}")
+        )
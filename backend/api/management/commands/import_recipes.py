@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from api.imports import import_recipes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Импортирует рецепты из файла NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="Файл NDJSON, «-» — стандартный ввод"
+        )
+        parser.add_argument(
+            "--author", required=True,
+            help="Email или имя пользователя автора рецептов",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл с номером последней обработанной строки: "
+            "импорт продолжится после неё",
+        )
+        parser.add_argument(
+            "--report", help="Файл NDJSON для строк с ошибками"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=None,
+            help="Сколько рецептов сохранять за одну транзакцию",
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(
+            Q(email=options["author"]) | Q(username=options["author"])
+        ).first()
+        if author is None:
+            raise CommandError(f"Пользователь {options['author']} не найден")
+        checkpoint = options["checkpoint"]
+        skip = 0
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                skip = int(file.read().strip() or 0)
+        source = (
+            sys.stdin.buffer if options["path"] == "-"
+            else open(options["path"], "rb")
+        )
+        report = open(options["report"], "a") if options["report"] else None
+        try:
+            for event in import_recipes(
+                source, author, skip, options["batch_size"]
+            ):
+                if "errors" in event:
+                    if report:
+                        report.write(
+                            json.dumps(event, ensure_ascii=False) + "\n"
+                        )
+                    continue
+                if checkpoint:
+                    with open(f"{checkpoint}.tmp", "w") as file:
+                        file.write(str(event["checkpoint"]))
+                    os.replace(f"{checkpoint}.tmp", checkpoint)
+                if event.get("done"):
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"Импортировано рецептов: {event['created']}, "
+                            f"с ошибками: {event['failed']}"
+                        )
+                    )
+                else:
+                    self.stdout.write(
+                        f"Строка {event['checkpoint']}: "
+                        f"сохранено {event['created']}"
+                    )
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+            if report:
+                report.close()
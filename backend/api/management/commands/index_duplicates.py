@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.duplicates import index_recipe
+from api.models import Recipe, RecipeBucket, RecipeDuplicate, RecipeSignature
+
+
+class Command(BaseCommand):
+    help = "Строит индекс MinHash и ищет почти одинаковые рецепты"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Перестроить индекс для всех рецептов",
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by("id")
+        if options["full"]:
+            RecipeBucket.objects.all().delete()
+            RecipeSignature.objects.all().delete()
+            RecipeDuplicate.objects.all().delete()
+        else:
+            recipes = recipes.filter(signature__isnull=True)
+        indexed = found = 0
+        for recipe in recipes.only("id", "name", "text").iterator():
+            with transaction.atomic():
+                found += len(index_recipe(recipe))
+            indexed += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Проиндексировано рецептов: {indexed}, "
+                f"найдено дубликатов: {found}"
+            )
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.deletion import purge_recipes, purge_users
+
+
+class Command(BaseCommand):
+    help = "Удаляет помеченные на удаление рецепты и пользователей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=None,
+            help="Сколько строк удалять за одну транзакцию",
+        )
+
+    def handle(self, *args, **options):
+        for name, purge in (
+            ("рецептов", purge_recipes),
+            ("пользователей", purge_users),
+        ):
+            purged = 0
+            for purged, left in purge(options["batch_size"]):
+                self.stdout.write(f"Удалено {name}: {purged}, осталось {left}")
+            self.stdout.write(
+                self.style.SUCCESS(f"Всего удалено {name}: {purged}")
+            )
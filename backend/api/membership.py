@@ -0,0 +1,89 @@
+"""
+Кэш принадлежности пользователя: id избранных рецептов, рецептов
+из списка покупок и авторов, на которых он подписан.
+
+Множества хранятся в кэше компактными отсортированными массивами
+целых чисел. При изменении ключ удаляется после фиксации транзакции,
+и следующий запрос загружает массив заново: правка на месте не атомарна,
+и одновременные добавление и удаление затёрли бы друг друга. Удаление
+видно всем воркерам только в общем кэше; с кэшем в памяти процесса
+массивы живут MEMBERSHIP_LOCAL_TIMEOUT секунд.
+Для ответа сериализаторам массив один раз за запрос превращается
+во frozenset, поэтому каждая проверка флага стоит O(1) и не требует
+обращения к базе.
+"""
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.caches import timeout
+from api.models import Favorite, Follow, ShoppingList
+from api.replicas import primary
+
+SOURCES = {
+    Favorite: "recipe_id",
+    ShoppingList: "recipe_id",
+    Follow: "following_id",
+}
+
+
+def _cache_key(model, user_id):
+    return f"membership:{model._meta.model_name}:{user_id}"
+
+
+def _load(model, user_id):
+    # Массив живёт в кэше долго, поэтому читается с основной базы:
+    # копия с отстающей реплики осталась бы в кэше после её догоняния.
+    field = SOURCES[model]
+    with primary():
+        ids = array("q", (
+            model.objects.filter(user_id=user_id)
+            .order_by(field)
+            .values_list(field, flat=True)
+        ))
+    return ids
+
+
+def get_ids(user_id, model):
+    """Отсортированный массив id для пользователя, загруженный один раз."""
+    key = _cache_key(model, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _load(model, user_id)
+        cache.set(key, ids, timeout(
+            settings.MEMBERSHIP_CACHE_TIMEOUT,
+            settings.MEMBERSHIP_LOCAL_TIMEOUT,
+        ))
+    return ids
+
+
+def member_ids(request, model):
+    """
+    Множество id для пользователя запроса.
+    Запоминается на объекте запроса, чтобы вложенные сериализаторы
+    не обращались к кэшу для каждого объекта.
+    """
+    user = request.user
+    if user.is_anonymous:
+        return frozenset()
+    memo = getattr(request, "_membership", None)
+    if memo is None:
+        memo = request._membership = {}
+    if model not in memo:
+        memo[model] = frozenset(get_ids(user.id, model))
+    return memo[model]
+
+
+def invalidate_members(request, model):
+    """
+    Сбрасывает массив model пользователя запроса после добавления
+    или удаления записи.
+    """
+    key = _cache_key(model, request.user.id)
+    cache.delete(key)
+    # Удаление и после фиксации: запрос, прочитавший базу до неё,
+    # мог успеть положить в кэш старый массив.
+    transaction.on_commit(lambda: cache.delete(key))
+    request.__dict__.pop("_membership", None)
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:44
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# GIN-индекс и теневая таблица FTS5 зависят от СУБД,
+# поэтому создаются здесь, а не в Meta модели.
+POSTGRES_FORWARD = [
+    "CREATE INDEX recipe_search_vector_gin ON api_recipe "
+    "USING gin (search_vector)",
+    "UPDATE api_recipe AS r SET search_vector = "
+    "setweight(to_tsvector(%(config)s, r.name), 'A') || "
+    "setweight(to_tsvector(%(config)s, coalesce(("
+    "SELECT string_agg(i.name, ' ') FROM api_ingredientrecipe AS ir "
+    "JOIN api_ingredient AS i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = r.id), '')), 'B') || "
+    "setweight(to_tsvector(%(config)s, r.text), 'C')",
+]
+POSTGRES_BACKWARD = ["DROP INDEX IF EXISTS recipe_search_vector_gin"]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE api_recipe_fts USING fts5("
+    "name, ingredients, text, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO api_recipe_fts (rowid, name, ingredients, text) "
+    "SELECT r.id, r.name, coalesce(("
+    "SELECT group_concat(i.name, ' ') FROM api_ingredientrecipe AS ir "
+    "JOIN api_ingredient AS i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = r.id), ''), r.text FROM api_recipe AS r",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS api_recipe_fts"]
+
+
+def _execute(schema_editor, postgres, sqlite):
+    vendor = schema_editor.connection.vendor
+    statements = {"postgresql": postgres, "sqlite": sqlite}.get(vendor, [])
+    params = {"config": settings.SEARCH_CONFIG}
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            if vendor == "postgresql":
+                cursor.execute(statement, params)
+            else:
+                cursor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _execute(schema_editor, POSTGRES_FORWARD, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    _execute(schema_editor, POSTGRES_BACKWARD, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+import django.core.validators
+
+
+def fill_tag_bitmasks(apps, schema_editor):
+    Tag = apps.get_model("api", "Tag")
+    Recipe = apps.get_model("api", "Recipe")
+    for position, tag in enumerate(Tag.objects.order_by("id")):
+        tag.position = position
+        tag.save(update_fields=["position"])
+    positions = dict(Tag.objects.values_list("id", "position"))
+    masks = {}
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+        "recipe_id", "tag_id"
+    ):
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << positions[tag_id]
+    for recipe_id, tags_mask in masks.items():
+        Recipe.objects.filter(pk=recipe_id).update(tags_mask=tags_mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='position',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Номер бита в маске тегов рецепта'),
+        ),
+        migrations.RunPython(fill_tag_bitmasks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='position',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Номер бита в маске тегов рецепта'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:56
+
+from django.db import migrations, models
+
+
+def log_existing_recipes(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    RecipeChange = apps.get_model('api', 'RecipeChange')
+    RecipeChange.objects.bulk_create(
+        (
+            RecipeChange(recipe_id=recipe_id, action='created')
+            for recipe_id in Recipe.objects.order_by('id').values_list(
+                'id', flat=True
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(verbose_name='Id рецепта')),
+                ('action', models.CharField(choices=[('created', 'Создан'), ('updated', 'Изменён'), ('deleted', 'Удалён')], max_length=7, verbose_name='Действие')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'Изменения рецептов',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipechange',
+            index=models.Index(fields=['recipe_id', '-id'], name='change_recipe'),
+        ),
+        migrations.RunPython(log_existing_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_recipechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('hash', models.BigIntegerField(verbose_name='Хэш полосы')),
+            ],
+            options={
+                'verbose_name': 'Корзина LSH',
+                'verbose_name_plural': 'Корзины LSH',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeDuplicate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField(verbose_name='Оценка сходства')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата обнаружения')),
+            ],
+            options={
+                'verbose_name': 'Дубликат рецепта',
+                'verbose_name_plural': 'Дубликаты рецептов',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='api.recipe', verbose_name='Рецепт')),
+                ('minhash', models.BinaryField(verbose_name='Сигнатура')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура рецепта',
+                'verbose_name_plural': 'Сигнатуры рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipeduplicate',
+            name='duplicate',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.recipe', verbose_name='Похожий рецепт'),
+        ),
+        migrations.AddField(
+            model_name='recipeduplicate',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicates', to='api.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='recipebucket',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='api.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeduplicate',
+            constraint=models.UniqueConstraint(fields=('recipe', 'duplicate'), name='unique_duplicate'),
+        ),
+        migrations.AddIndex(
+            model_name='recipebucket',
+            index=models.Index(fields=['hash'], name='bucket_hash'),
+        ),
+    ]
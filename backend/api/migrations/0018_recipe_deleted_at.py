@@ -0,0 +1,26 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_recipedocument'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='recipe',
+            name='unique_recipe',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Дата удаления'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('name', 'author'), name='unique_recipe'),
+        ),
+    ]
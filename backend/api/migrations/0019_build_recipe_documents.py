@@ -0,0 +1,79 @@
+from django.db import migrations
+from django.db.models import Prefetch
+
+# Копия api.documents.render на момент миграции: миграция должна
+# собирать документы одинаково, как бы потом ни менялся модуль.
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+CHUNK = 500
+
+
+def render(recipe):
+    return {
+        'id': recipe.id,
+        'tags': [
+            {
+                'id': tag.id,
+                'name': tag.name,
+                'color': tag.color,
+                'slug': tag.slug,
+            }
+            for tag in recipe.tags.all()
+        ],
+        'author': {
+            name: getattr(recipe.author, name) for name in AUTHOR_FIELDS
+        },
+        'ingredients': [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        'name': recipe.name,
+        'image': recipe.image.url if recipe.image else None,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def build_recipe_documents(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    IngredientRecipe = apps.get_model('api', 'IngredientRecipe')
+    RecipeDocument = apps.get_model('api', 'RecipeDocument')
+    recipe_ids = list(
+        Recipe.objects.filter(document__isnull=True)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    for start in range(0, len(recipe_ids), CHUNK):
+        recipes = (
+            Recipe.objects.filter(id__in=recipe_ids[start:start + CHUNK])
+            .defer('search_vector')
+            .select_related('author')
+            .prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipe_ingredients',
+                    queryset=IngredientRecipe.objects.select_related(
+                        'ingredient'
+                    ),
+                ),
+            )
+        )
+        RecipeDocument.objects.bulk_create(
+            RecipeDocument(recipe_id=recipe.id, document=render(recipe))
+            for recipe in recipes
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_recipe_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_recipe_documents, migrations.RunPython.noop),
+    ]
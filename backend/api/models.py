@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models
+
+from api.caches import timeout
 
 User = get_user_model()
 
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32000
+MAX_TAG_POSITION = 62
+TAG_BITS_CACHE_KEY = "tag_bits"
 
 
 class Follow(models.Model):
@@ -55,6 +63,12 @@ class Tag(models.Model):
     slug = models.CharField(
         verbose_name="Слаг тэга", max_length=150, unique=True,
     )
+    position = models.PositiveSmallIntegerField(
+        verbose_name="Номер бита в маске тегов рецепта",
+        unique=True,
+        editable=False,
+        validators=[MaxValueValidator(MAX_TAG_POSITION)],
+    )
 
     class Meta:
         ordering = ["name"]
@@ -62,6 +76,60 @@ class Tag(models.Model):
     def __str__(self) -> str:
         return f"{self.name}"
 
+    @property
+    def bit(self):
+        return 1 << self.position
+
+    @classmethod
+    def slug_bits(cls):
+        """
+        Соответствие слагов битам маски. Кэшируется до изменения тегов,
+        но не дольше TAG_BITS_CACHE_TIMEOUT: изменение в другом воркере
+        с кэшем в памяти процесса иначе осталось бы незамеченным.
+        """
+        bits = cache.get(TAG_BITS_CACHE_KEY)
+        if bits is None:
+            bits = {
+                slug: 1 << position
+                for slug, position in cls.objects.using(
+                    DEFAULT_DB_ALIAS
+                ).values_list("slug", "position")
+            }
+            cache.set(TAG_BITS_CACHE_KEY, bits, timeout(
+                settings.TAG_BITS_CACHE_TIMEOUT,
+                settings.TAG_BITS_LOCAL_TIMEOUT,
+            ))
+        return bits
+
+    def save(self, *args, **kwargs):
+        if self.position is None:
+            used = set(Tag.objects.values_list("position", flat=True))
+            free = [
+                position for position in range(MAX_TAG_POSITION + 1)
+                if position not in used
+            ]
+            if not free:
+                raise ValidationError("Достигнуто максимальное число тегов")
+            self.position = free[0]
+        super().save(*args, **kwargs)
+        cache.delete(TAG_BITS_CACHE_KEY)
+
+    def clear_bit(self):
+        """
+        Снимает бит тега с масок всех рецептов, включая удалённые, чтобы
+        освободившийся номер бита можно было отдать новому тегу.
+        """
+        tagged = (
+            Recipe.all_objects.annotate(
+                tag_bit=models.F("tags_mask").bitand(self.bit)
+            )
+            .filter(tag_bit__gt=0)
+            .values("id")
+        )
+        Recipe.all_objects.filter(id__in=tagged).update(
+            tags_mask=models.F("tags_mask").bitand(~self.bit)
+        )
+
 
 class Ingredient(models.Model):
     """
@@ -89,6 +157,13 @@ class Ingredient(models.Model):
         return f"{self.name}"
 
 
+class ActiveManager(models.Manager):
+    """Записи, кроме помеченных на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     """
     Модель рецептов
@@ -132,6 +207,34 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name="Дата публикации", auto_now_add=True
     )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор", null=True, editable=False
+    )
+    tags_mask = models.BigIntegerField(
+        verbose_name="Битовая маска тегов",
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+    similarity_stale = models.BooleanField(
+        verbose_name="Нужно пересчитать похожие рецепты",
+        default=True,
+        db_index=True,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        verbose_name="Популярность", default=0, editable=False
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name="Дата удаления",
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-pub_date"]
@@ -140,13 +243,30 @@ class Recipe(models.Model):
         verbose_name_plural = "Рецепты"
         constraints = [
             models.UniqueConstraint(
-                fields=["name", "author"], name="unique_recipe"
+                fields=["name", "author"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="unique_recipe",
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["-trending_score", "-pub_date"],
+                name="recipe_trending",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.name}"
 
+    def update_tags_mask(self, tags=None):
+        """Пересчитывает маску по тегам рецепта и сохраняет её."""
+        if tags is None:
+            tags = self.tags.all()
+        self.tags_mask = 0
+        for tag in tags:
+            self.tags_mask |= tag.bit
+        Recipe.objects.filter(pk=self.pk).update(tags_mask=self.tags_mask)
+
 
 class IngredientRecipe(models.Model):
     """
@@ -254,3 +374,240 @@ class ShoppingList(models.Model):
 
     def __str__(self) -> str:
         return f"{self.recipe}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Лента пользователя: рецепты авторов, на которых он подписан.
+    Заполняется при публикации рецепта (fan-out on write).
+    """
+
+    user = models.ForeignKey(
+        User,
+        related_name="timeline",
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="timeline_entries",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    author = models.ForeignKey(
+        User,
+        related_name="+",
+        on_delete=models.CASCADE,
+        verbose_name="Автор рецепта",
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        ordering = ["-pub_date"]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_timeline_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date"], name="timeline_user_pub_date"
+            ),
+            models.Index(
+                fields=["user", "author"], name="timeline_user_author"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipe}"
+
+
+class RecipeSimilarity(models.Model):
+    """
+    Похожие рецепты: top-K соседей каждого рецепта, рассчитанные
+    командой build_recommendations.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="similar_recipes",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        related_name="+",
+        on_delete=models.CASCADE,
+        verbose_name="Похожий рецепт",
+    )
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        ordering = ["recipe", "-score"]
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"], name="unique_similarity"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "-score"], name="similarity_recipe_score"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipe} ~ {self.similar}"
+
+
+class TrendingEpoch(models.Model):
+    """
+    Точка отсчёта для популярности рецептов.
+    Вклад события в Recipe.trending_score равен весу события,
+    умноженному на 2 ** (время от точки отсчёта / период полураспада).
+    """
+
+    epoch = models.DateTimeField(verbose_name="Точка отсчёта")
+
+    class Meta:
+        verbose_name = "Точка отсчёта популярности"
+        verbose_name_plural = "Точка отсчёта популярности"
+
+    def __str__(self) -> str:
+        return f"{self.epoch}"
+
+
+class RecipeChange(models.Model):
+    """
+    Журнал изменений рецептов для синхронизации клиентов.
+    Id записи служит курсором: клиент запрашивает изменения после него.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ACTIONS = [
+        (CREATED, "Создан"),
+        (UPDATED, "Изменён"),
+        (DELETED, "Удалён"),
+    ]
+
+    recipe_id = models.BigIntegerField(verbose_name="Id рецепта")
+    action = models.CharField(
+        verbose_name="Действие", max_length=7, choices=ACTIONS
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now_add=True, db_index=True
+    )
+
+    class Meta:
+        ordering = ["id"]
+        verbose_name = "Изменение рецепта"
+        verbose_name_plural = "Изменения рецептов"
+        indexes = [
+            models.Index(fields=["recipe_id", "-id"], name="change_recipe"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipe_id} {self.action}"
+
+
+class RecipeSignature(models.Model):
+    """MinHash-сигнатура рецепта для поиска почти одинаковых рецептов."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name="signature",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    minhash = models.BinaryField(verbose_name="Сигнатура")
+
+    class Meta:
+        verbose_name = "Сигнатура рецепта"
+        verbose_name_plural = "Сигнатуры рецептов"
+
+
+class RecipeBucket(models.Model):
+    """
+    Корзина LSH: хэш полосы сигнатуры. Рецепты с общей корзиной —
+    кандидаты в дубликаты.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="buckets",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    band = models.PositiveSmallIntegerField(verbose_name="Полоса")
+    hash = models.BigIntegerField(verbose_name="Хэш полосы")
+
+    class Meta:
+        verbose_name = "Корзина LSH"
+        verbose_name_plural = "Корзины LSH"
+        indexes = [
+            models.Index(fields=["hash"], name="bucket_hash"),
+        ]
+
+
+class RecipeDuplicate(models.Model):
+    """Пара почти одинаковых рецептов для модерации."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="duplicates",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    duplicate = models.ForeignKey(
+        Recipe,
+        related_name="+",
+        on_delete=models.CASCADE,
+        verbose_name="Похожий рецепт",
+    )
+    similarity = models.FloatField(verbose_name="Оценка сходства")
+    created = models.DateTimeField(
+        verbose_name="Дата обнаружения", auto_now_add=True
+    )
+
+    class Meta:
+        ordering = ["-created"]
+        verbose_name = "Дубликат рецепта"
+        verbose_name_plural = "Дубликаты рецептов"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "duplicate"], name="unique_duplicate"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipe} ~ {self.duplicate}"
+
+
+class RecipeDocument(models.Model):
+    """
+    Готовое к выдаче представление рецепта без полей, зависящих
+    от пользователя. Пересчитывается при изменении рецепта, его тегов,
+    ингредиентов и профиля автора.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name="document",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    document = models.JSONField(verbose_name="Документ")
+    updated = models.DateTimeField(
+        verbose_name="Дата обновления", auto_now=True
+    )
+
+    class Meta:
+        verbose_name = "Документ рецепта"
+        verbose_name_plural = "Документы рецептов"
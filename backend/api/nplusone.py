@@ -0,0 +1,166 @@
+"""
+Поиск N+1 запросов.
+
+Каждый запрос к базе за время обработки HTTP-запроса получает отпечаток:
+текст без значений и место вызова в коде проекта. Отпечаток, который
+повторился больше NPLUSONE_THRESHOLD раз, — признак запроса на каждый
+объект: о нём сообщается вместе с полем сериализатора, из которого он
+сделан, и стеком. NPLUSONE_MODE задаёт реакцию: "log" пишет
+предупреждение в журнал, "raise" бросает NPlusOneError, пустое значение
+отключает проверку. Намеренные повторы перечисляются в
+NPLUSONE_ALLOWLIST шаблонами fnmatch для места вызова
+("api/views.py:*") или поля ("FollowSerializer.recipes").
+"""
+import fnmatch
+import logging
+import os
+import re
+import sys
+import traceback
+from contextlib import ExitStack, contextmanager
+
+import django
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.fields import Field
+
+logger = logging.getLogger(__name__)
+
+DJANGO_DIR = os.path.dirname(django.__file__)
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDERS = re.compile(r"\?(?:, \?)+")
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize(sql):
+    """Текст запроса без значений: одинаков для запросов одной формы."""
+    return PLACEHOLDERS.sub("...", LITERAL.sub("?", sql))
+
+
+def _is_project(filename):
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and "site-packages" not in filename
+        and filename != __file__
+    )
+
+
+def _is_visible(filename):
+    return not filename.startswith(DJANGO_DIR) and filename != __file__
+
+
+def _origin(frame):
+    """Место вызова в коде проекта и поле сериализатора."""
+    site = field = None
+    while frame is not None and (site is None or field is None):
+        code = frame.f_code
+        if site is None and _is_project(code.co_filename):
+            site = (
+                f"{os.path.relpath(code.co_filename, settings.BASE_DIR)}:"
+                f"{frame.f_lineno} in {code.co_name}"
+            )
+        owner = frame.f_locals.get("self")
+        # type(), а не isinstance: isinstance вычисляет ленивые объекты
+        # вроде request.user, а их вычисление снова обращается к базе.
+        if (
+            field is None
+            and issubclass(type(owner), Field)
+            and owner.field_name
+        ):
+            field = f"{type(owner.parent).__name__}.{owner.field_name}"
+        frame = frame.f_back
+    return site, field
+
+
+class Detector:
+    """Считает запросы по отпечаткам."""
+
+    def __init__(self):
+        self.seen = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = sys._getframe(1)
+        site, field = _origin(frame)
+        key = (normalize(sql), site)
+        if key in self.seen:
+            self.seen[key]["count"] += 1
+        else:
+            stack = traceback.extract_stack(frame)
+            # Стек от первого вызова в коде проекта, без кадров Django.
+            start = next(
+                (
+                    index for index, entry in enumerate(stack)
+                    if _is_project(entry.filename)
+                ),
+                0,
+            )
+            self.seen[key] = {
+                "sql": key[0],
+                "site": site,
+                "field": field,
+                "count": 1,
+                "stack": [
+                    entry for entry in stack[start:]
+                    if _is_visible(entry.filename)
+                ],
+            }
+        return execute(sql, params, many, context)
+
+    def repeats(self):
+        """Повторы сверх порога, кроме разрешённых."""
+        return [
+            found for found in self.seen.values()
+            if found["count"] > settings.NPLUSONE_THRESHOLD
+            and not any(
+                fnmatch.fnmatch(found["site"] or "", pattern)
+                or fnmatch.fnmatch(found["field"] or "", pattern)
+                for pattern in settings.NPLUSONE_ALLOWLIST
+            )
+        ]
+
+
+@contextmanager
+def detect():
+    """Считает запросы ко всем базам внутри блока."""
+    detector = Detector()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
+
+
+def describe(found):
+    return (
+        f"{found['count']} одинаковых запросов из {found['site']}"
+        + (f" (поле {found['field']})" if found["field"] else "")
+        + f":\n{found['sql']}\n"
+        + "".join(traceback.format_list(found["stack"]))
+    )
+
+
+def report(repeats, where):
+    if not repeats:
+        return
+    message = f"N+1 в {where}:\n" + "\n".join(map(describe, repeats))
+    if settings.NPLUSONE_MODE == "raise":
+        raise NPlusOneError(message)
+    logger.warning(message)
+
+
+class NPlusOneMiddleware:
+    """Проверяет запросы к базе за время обработки каждого запроса."""
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_MODE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with detect() as detector:
+            response = self.get_response(request)
+        report(detector.repeats(), f"{request.method} {request.path}")
+        return response
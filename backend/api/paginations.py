@@ -1,6 +1,61 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = "limit"
     page_size = 6
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц: без фильтров число строк
+    берётся из статистики PostgreSQL вместо COUNT(*) по всей таблице.
+    Фильтр менеджера мягкого удаления (deleted_at IS NULL) оценку не
+    отключает: из неё вычитается число помеченных строк, которое
+    считается по индексу deleted_at.
+    """
+
+    exact_below = 10000
+
+    def _deleted(self, query, connection):
+        """
+        Число помеченных строк, если запрос отбирает только неудалённые,
+        и None, если в нём есть другие условия.
+        """
+        model = query.model
+        if not query.where:
+            return 0
+        if "deleted_at" not in {
+            field.name for field in model._meta.concrete_fields
+        }:
+            return None
+        active = model._base_manager.filter(deleted_at__isnull=True).query
+        compile_where = (
+            lambda q: q.get_compiler(connection=connection).compile(q.where)
+        )
+        if compile_where(query) != compile_where(active):
+            return None
+        return model._base_manager.filter(deleted_at__isnull=False).count()
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor != "postgresql":
+            return super().count
+        deleted = self._deleted(query, connection)
+        if deleted is None:
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                [query.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] - deleted < self.exact_below:
+            return super().count
+        return row[0] - deleted
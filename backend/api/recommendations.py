@@ -0,0 +1,166 @@
+"""
+Рекомендации рецептов на основе сходства «рецепт-рецепт».
+
+Сходство складывается из косинусной близости по совместным
+добавлениям в избранное и список покупок и из доли общих ингредиентов
+(коэффициент Жаккара). Пересчёт выполняет команда build_recommendations,
+а онлайн-запросы читают готовые top-K соседей по индексу.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from api.indexes import IngredientIndex
+from api.models import Favorite, Recipe, RecipeSimilarity, ShoppingList
+
+
+def _interactions():
+    """
+    Разреженная матрица пользователь x рецепт: для каждого пользователя
+    словарь {id рецепта: вес}, и обратный индекс рецепт -> пользователи.
+    """
+    user_items = defaultdict(dict)
+    for model, weight in (
+        (ShoppingList, settings.RECOMMENDATIONS_CART_WEIGHT),
+        (Favorite, 1.0),
+    ):
+        for user_id, recipe_id in model.objects.values_list(
+            "user_id", "recipe_id"
+        ).iterator(chunk_size=10000):
+            items = user_items[user_id]
+            items[recipe_id] = max(items.get(recipe_id, 0), weight)
+    item_users = defaultdict(list)
+    norms = defaultdict(float)
+    for user_id, items in user_items.items():
+        for recipe_id, weight in items.items():
+            item_users[recipe_id].append(user_id)
+            norms[recipe_id] += weight * weight
+    return user_items, item_users, norms
+
+
+def _cooccurrence(recipe_id, user_items, item_users, norms):
+    """Косинусная близость к рецептам, добавленным теми же пользователями."""
+    scores = defaultdict(float)
+    for user_id in item_users.get(recipe_id, ()):
+        items = user_items[user_id]
+        weight = items[recipe_id]
+        for other_id, other_weight in items.items():
+            scores[other_id] += weight * other_weight
+    scores.pop(recipe_id, None)
+    norm = math.sqrt(norms.get(recipe_id, 0))
+    return {
+        other_id: score / (norm * math.sqrt(norms[other_id]))
+        for other_id, score in scores.items()
+    }
+
+
+def _ingredient_overlap(recipe_id, index):
+    """Коэффициент Жаккара по ингредиентам для ближайших кандидатов."""
+    ingredients = index.recipe_ingredients.get(recipe_id, ())
+    ranking = index.rank(ingredients)
+    candidates = ranking[: settings.RECOMMENDATIONS_INGREDIENT_CANDIDATES]
+    return {
+        other_id: shared / (len(ingredients) + missing)
+        for other_id, shared, missing in candidates
+        if other_id != recipe_id
+    }
+
+
+def build_similarities(recipe_ids=None, report=None):
+    """
+    Пересчитывает top-K похожих рецептов.
+    Без recipe_ids пересчитываются рецепты, помеченные как устаревшие.
+    """
+    if recipe_ids is None:
+        recipe_ids = list(
+            Recipe.objects.filter(similarity_stale=True).values_list(
+                "id", flat=True
+            )
+        )
+    user_items, item_users, norms = _interactions()
+    index = IngredientIndex()
+    index.build()
+    alpha = settings.RECOMMENDATIONS_COFAVORITE_WEIGHT
+    top_k = settings.RECOMMENDATIONS_TOP_K
+    batch_size = settings.RECOMMENDATIONS_BATCH_SIZE
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        rows = []
+        for recipe_id in batch:
+            cofavorite = _cooccurrence(
+                recipe_id, user_items, item_users, norms
+            )
+            overlap = _ingredient_overlap(recipe_id, index)
+            scores = {
+                other_id: alpha * cofavorite.get(other_id, 0)
+                + (1 - alpha) * overlap.get(other_id, 0)
+                for other_id in cofavorite.keys() | overlap.keys()
+            }
+            best = sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+            rows.extend(
+                RecipeSimilarity(
+                    recipe_id=recipe_id, similar_id=other_id, score=score
+                )
+                for other_id, score in best
+            )
+        with transaction.atomic():
+            RecipeSimilarity.objects.filter(recipe_id__in=batch).delete()
+            RecipeSimilarity.objects.bulk_create(rows)
+            Recipe.objects.filter(id__in=batch).update(similarity_stale=False)
+        if report:
+            report(min(start + batch_size, len(recipe_ids)), len(recipe_ids))
+    return len(recipe_ids)
+
+
+def mark_stale(user_id, recipe_id, include_recipe=True):
+    """
+    Помечает для пересчёта рецепты, сходство которых изменилось, когда
+    пользователь добавил рецепт в избранное или список покупок или убрал
+    его оттуда: сам рецепт, остальные рецепты пользователя (изменилась
+    совместная встречаемость) и рецепты, в чьих top-K он уже есть
+    (изменилась его норма). include_recipe=False — сам рецепт уже
+    помечен, например record_event.
+    """
+    neighbours = Recipe.objects.filter(
+        Q(id__in=Favorite.objects.filter(user_id=user_id).values("recipe"))
+        | Q(
+            id__in=ShoppingList.objects.filter(user_id=user_id).values(
+                "recipe"
+            )
+        )
+        | Q(
+            id__in=RecipeSimilarity.objects.filter(
+                similar_id=recipe_id
+            ).values("recipe")
+        )
+    )
+    if include_recipe:
+        neighbours = neighbours | Recipe.objects.filter(id=recipe_id)
+    else:
+        neighbours = neighbours.exclude(id=recipe_id)
+    neighbours.update(similarity_stale=True)
+
+
+def similar_recipes(recipe_id):
+    """Id похожих рецептов, от самых похожих."""
+    return RecipeSimilarity.objects.filter(recipe_id=recipe_id).values_list(
+        "similar_id", flat=True
+    )
+
+
+def recommended_recipes(seed_ids):
+    """
+    Id рекомендованных рецептов по рецептам пользователя: сумма сходств
+    с избранным и списком покупок, без уже добавленных рецептов.
+    """
+    return (
+        RecipeSimilarity.objects.filter(recipe_id__in=seed_ids)
+        .exclude(similar_id__in=seed_ids)
+        .values("similar_id")
+        .annotate(total=Sum("score"))
+        .order_by("-total", "-similar_id")
+        .values_list("similar_id", flat=True)
+    )
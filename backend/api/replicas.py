@@ -0,0 +1,110 @@
+"""
+Чтение с реплик базы данных.
+
+Реплики перечисляются в переменной окружения DB_REPLICA_HOSTS и
+становятся алиасами replica1, replica2, ... с настройками основной базы.
+Безопасные запросы к вьюсетам с ReplicaReadMixin читают с реплик,
+всё остальное — с основной базы. После успешного изменения через такой
+вьюсет пользователь на REPLICA_STICKY_SECONDS закрепляется за основной
+базой, чтобы видеть свои изменения несмотря на отставание реплик.
+Закрепление хранится в подписанной cookie: следующий запрос может
+попасть в другой воркер, а cookie клиент присылает в любой.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = "replica_pin"
+PIN_SALT = "api.replicas.pin"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def is_pinned(request):
+    """Закреплён ли пользователь запроса за основной базой."""
+    user = request.user
+    return user.is_authenticated and request.get_signed_cookie(
+        PIN_COOKIE,
+        default=None,
+        salt=PIN_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS,
+    ) == str(user.id)
+
+
+def pin(request, response):
+    response.set_signed_cookie(
+        PIN_COOKIE,
+        str(request.user.id),
+        salt=PIN_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+@contextmanager
+def primary():
+    """
+    Чтение с основной базы внутри блока. Нужно для данных, которые
+    кэшируются надолго: отставшая копия иначе осталась бы в кэше.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _replica_reads.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Ограничивает чтение с реплик одним запросом: потоки сервера
+    обрабатывают запросы по очереди и иначе унаследовали бы состояние.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replica_reads.set(False)
+        try:
+            return self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+
+
+class ReplicaReadMixin:
+    """Безопасные запросы вьюсета читают с реплик."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(request):
+            _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            and request.user.is_authenticated
+            and response.status_code < 400
+        ):
+            pin(request, response)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,15 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """Запуск тестов, в котором повторяющиеся запросы — ошибка."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._nplusone = override_settings(NPLUSONE_MODE="raise")
+        self._nplusone.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._nplusone.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,118 @@
+"""
+Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+В PostgreSQL используется колонка Recipe.search_vector (tsvector) с
+GIN-индексом и ранжированием ts_rank. В SQLite тот же поиск выполняется
+по теневой таблице FTS5, чтобы его можно было проверить локально. На
+обеих базах каждое слово запроса ищется как начало слова.
+Индекс обновляется сигналами рецепта, его ингредиентов и переименования
+ингредиента (api/signals.py); массовый импорт обновляет его сам.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, router
+from django.db.models import F, Value
+from django.db.models.expressions import RawSQL
+
+from api.models import Recipe
+
+FTS_TABLE = "api_recipe_fts"
+
+
+def _vendor(for_write=False):
+    if for_write:
+        return connections[router.db_for_write(Recipe)].vendor
+    return connections[router.db_for_read(Recipe)].vendor
+
+
+def _ingredient_names(recipe):
+    return " ".join(recipe.ingredients.values_list("name", flat=True))
+
+
+def update_search_index(recipe):
+    """Пересчитывает поисковый индекс рецепта после сохранения."""
+    vendor = _vendor(for_write=True)
+    if vendor == "postgresql":
+        config = settings.SEARCH_CONFIG
+        Recipe.objects.filter(pk=recipe.pk).update(
+            search_vector=(
+                SearchVector("name", weight="A", config=config)
+                + SearchVector(
+                    Value(_ingredient_names(recipe)), weight="B",
+                    config=config,
+                )
+                + SearchVector("text", weight="C", config=config)
+            )
+        )
+    elif vendor == "sqlite":
+        with connections[router.db_for_write(Recipe)].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe.pk]
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) "
+                "VALUES (%s, %s, %s, %s)",
+                [recipe.pk, recipe.name, _ingredient_names(recipe),
+                 recipe.text],
+            )
+
+
+def refresh_search_index(recipe_ids):
+    """
+    Пересчитывает поисковый индекс рецептов по id; рецепты, которых
+    нет или которые удалены, убираются из индекса.
+    """
+    found = set()
+    for recipe in Recipe.objects.filter(id__in=recipe_ids).defer(
+        "search_vector"
+    ):
+        update_search_index(recipe)
+        found.add(recipe.id)
+    for recipe_id in set(recipe_ids) - found:
+        remove_from_search_index(recipe_id)
+
+
+def remove_from_search_index(recipe_id):
+    """Удаляет рецепт из теневой таблицы FTS5 (в PostgreSQL не нужно)."""
+    if _vendor(for_write=True) == "sqlite":
+        with connections[router.db_for_write(Recipe)].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe_id]
+            )
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует по релевантности."""
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return queryset
+    vendor = _vendor()
+    if vendor == "postgresql":
+        # Как и "слово"* в FTS5: слова запроса ищутся как начала слов.
+        search_query = SearchQuery(
+            " & ".join(f"{word}:*" for word in words),
+            config=settings.SEARCH_CONFIG,
+            search_type="raw",
+        )
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "-pub_date")
+        )
+    if vendor == "sqlite":
+        match = " ".join(f'"{word}"*' for word in words)
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s "
+            f"AND {FTS_TABLE}.rowid = {Recipe._meta.db_table}.id",
+            (match,),
+        )
+        return (
+            queryset.annotate(rank=rank)
+            .filter(rank__isnull=False)
+            .order_by("-rank", "-pub_date")
+        )
+    return queryset.filter(name__icontains=query)
@@ -1,10 +1,18 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
 
+from api.events import publish
+from api.feed import fan_out_recipe
+from api.membership import member_ids
 from api.models import (Favorite, Follow, Ingredient, IngredientRecipe, Recipe,
                         ShoppingList, Tag)
+from api.tasks import run_in_background
+from api.upkeep import recipes_saved
 
 User = get_user_model()
 
@@ -12,6 +20,43 @@ MIN_AMOUNT = 1
 MAX_AMOUNT = 32000
 
 
+def requested_fields(request):
+    """Поля из параметров ?fields= и ?omit= (через запятую)."""
+    params = getattr(request, "query_params", request.GET)
+    return (
+        {name for name in params.get("fields", "").split(",") if name},
+        {name for name in params.get("omit", "").split(",") if name},
+    )
+
+
+def wants_field(request, name):
+    """Попадёт ли поле name в ответ на безопасный запрос."""
+    if request.method not in SAFE_METHODS:
+        return True
+    only, omit = requested_fields(request)
+    return (not only or name in only) and name not in omit
+
+
+class SparseFieldsMixin:
+    """
+    Оставляет в ответе только поля из ?fields= и убирает поля из ?omit=.
+    Применяется только к сериализатору верхнего уровня.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if request is None or parent is not None:
+            return fields
+        return {
+            name: field for name, field in fields.items()
+            if wants_field(request, name)
+        }
+
+
 class CreateUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -27,11 +72,28 @@ class CreateUserSerializer(serializers.ModelSerializer):
             "password": {"write_only": True},
         }
 
+    def validate(self, data):
+        email = data.get("email", getattr(self.instance, "email", None))
+        username = data.get(
+            "username", getattr(self.instance, "username", None)
+        )
+        deleted = User.all_objects.filter(
+            Q(email=email) | Q(username=username), deleted_at__isnull=False
+        )
+        if self.instance is not None:
+            deleted = deleted.exclude(pk=self.instance.pk)
+        if deleted.exists():
+            raise ValidationError(
+                "Пользователь с такими данными ещё удаляется, "
+                "попробуйте позже"
+            )
+        return data
+
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)
 
 
-class GETUserSerializer(serializers.ModelSerializer):
+class GETUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
 
@@ -47,10 +109,7 @@ class GETUserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context["request"].user
-        if user.is_anonymous or (user == obj):
-            return False
-        return obj.following.filter(user=user).exists()
+        return obj.id in member_ids(self.context["request"], Follow)
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
@@ -60,7 +119,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ("__all__",)
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     email = serializers.ReadOnlyField(source="following.email")
     id = serializers.ReadOnlyField(source="following.id")
@@ -89,12 +148,17 @@ class FollowSerializer(serializers.ModelSerializer):
 
     def get_recipes(self, obj) -> list:
         limit = self.context["request"].GET.get("recipes_limit")
-        recipes = obj.following.recipe.all()
+        # Список подписок загружает рецепты заранее в recipe_page.
+        recipes = getattr(obj.following, "recipe_page", None)
+        if recipes is None:
+            recipes = obj.following.recipe.all()
         if limit and limit.isdigit():
             recipes = recipes[: int(limit)]
         return ShortRecipeSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj) -> int:
+        if hasattr(obj, "recipes_count"):
+            return obj.recipes_count
         return obj.following.recipe.count()
 
     def validate(self, data):
@@ -162,48 +226,6 @@ class GETIngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
-class RecipeGETSerializer(serializers.ModelSerializer):
-    """
-    Serializer для модели Recipe для безопасных методов.
-    """
-
-    author = GETUserSerializer()
-    tags = TagSerializer(many=True, read_only=True)
-    ingredients = GETIngredientRecipeSerializer(
-        many=True, source="recipe_ingredients", read_only=True
-    )
-    image = Base64ImageField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Recipe
-        fields = (
-            "id",
-            "tags",
-            "author",
-            "ingredients",
-            "is_favorited",
-            "is_in_shopping_cart",
-            "name",
-            "image",
-            "text",
-            "cooking_time",
-        )
-
-    def get_is_favorited(self, obj):
-        user = self.context["request"].user
-        if user.is_anonymous:
-            return False
-        return obj.favorite.filter(user=user).exists()
-
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context["request"].user
-        if user.is_anonymous:
-            return False
-        return obj.shopping_cart.filter(user=user).exists()
-
-
 class POSTIngredientSerializer(serializers.ModelSerializer):
     """
     Serializer для поля ingredient модели Recipe. Создание ингредиентов.
@@ -253,16 +275,10 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "is_favorited", "is_in_shopping_cart")
 
     def get_is_favorited(self, obj):
-        user = self.context["request"].user
-        if user.is_anonymous:
-            return False
-        return obj.favorite.exists()
+        return obj.id in member_ids(self.context["request"], Favorite)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context["request"].user
-        if user.is_anonymous:
-            return False
-        return obj.shopping_cart.exists()
+        return obj.id in member_ids(self.context["request"], ShoppingList)
 
     def validate(self, obj):
         if not obj.get("ingredients"):
@@ -319,17 +335,29 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
         IngredientRecipe.objects.bulk_create(obj)
         recipe.tags.set(tags)
+        recipe.update_tags_mask(tags)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
         recipe = super().create(validated_data)
         self.add_ingredients_tags(ingredients, tags, recipe)
+        recipes_saved([recipe], created=True)
+        run_in_background(fan_out_recipe, recipe.id)
+        publish(
+            f"author:{recipe.author_id}",
+            "recipe",
+            {"id": recipe.id, "name": recipe.name, "author": recipe.author_id},
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
         instance.ingredients.clear()
         self.add_ingredients_tags(ingredients, tags, instance)
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        recipes_saved([instance], created=False)
+        return instance
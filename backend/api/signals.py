@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api.documents import AUTHOR_FIELDS, refresh_recipes
+from api.indexes import ingredient_name_index, tag_index
+from api.models import (TAG_BITS_CACHE_KEY, Ingredient, IngredientRecipe,
+                        Recipe, Tag)
+from api.search import refresh_search_index
+from api.tasks import run_in_background
+
+User = get_user_model()
+
+
+def refresh_related(**lookups):
+    """Пересобирает в фоне документы рецептов, подходящих под фильтр."""
+    run_in_background(
+        refresh_recipes,
+        list(Recipe.objects.filter(**lookups).values_list("id", flat=True)),
+    )
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    tag_index.touch([instance.id])
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_clear_bit(sender, instance, **kwargs):
+    # Сигнал, а не Tag.delete: удаление из админки идёт через queryset.
+    instance.clear_bit()
+
+
+@receiver(post_delete, sender=Tag)
+def tag_bits_changed(sender, instance, **kwargs):
+    cache.delete(TAG_BITS_CACHE_KEY)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    ingredient_name_index.touch([instance.id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        refresh_related(tags=instance.id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        refresh_related(ingredients=instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search(sender, instance, raw=False, **kwargs):
+    # После фиксации: ингредиенты рецепта сохраняются позже него.
+    if not raw:
+        transaction.on_commit(lambda: refresh_search_index([instance.id]))
+
+
+@receiver([post_save, post_delete], sender=IngredientRecipe)
+def recipe_ingredients_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            lambda: refresh_search_index([instance.recipe_id])
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_search(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        run_in_background(
+            refresh_search_index,
+            list(
+                Recipe.objects.filter(ingredients=instance.id).values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+
+
+@receiver(post_save, sender=User)
+def author_documents(sender, instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    refresh_related(author=instance.id)
@@ -0,0 +1,91 @@
+"""
+Фоновые задачи, выполняемые в ограниченном пуле потоков процесса.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executors_lock = threading.Lock()
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_executor(name, max_workers):
+    """Именованный ограниченный пул потоков текущего процесса."""
+    pid = os.getpid()
+    with _executors_lock:
+        executor = _executors.get((name, pid))
+        # После fork потоки пула родителя недоступны, создаём пул заново.
+        if executor is None:
+            executor = _executors[name, pid] = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=f"foodgram-{name}",
+            )
+    return executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Фоновая задача %s завершилась с ошибкой", func)
+    finally:
+        connection.close()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Выполняет func в фоне после фиксации текущей транзакции.
+    При BACKGROUND_TASKS_SYNC задача выполняется сразу в текущем потоке.
+    """
+
+    def submit():
+        if settings.BACKGROUND_TASKS_SYNC:
+            func(*args, **kwargs)
+        else:
+            get_executor(
+                "task", settings.BACKGROUND_TASKS_WORKERS
+            ).submit(_run, func, args, kwargs)
+
+    transaction.on_commit(submit)
+
+
+def _drain(key):
+    while True:
+        with _queues_lock:
+            queue = _queues[key]
+            if not queue:
+                del _queues[key]
+                return
+            func, args = queue.popleft()
+        _run(func, args, {})
+
+
+def run_in_order(key, func, *args):
+    """
+    Как run_in_background, но задачи с одинаковым key выполняются
+    по одной в порядке постановки.
+    """
+
+    def submit():
+        if settings.BACKGROUND_TASKS_SYNC:
+            func(*args)
+            return
+        with _queues_lock:
+            queue = _queues.get(key)
+            if queue is None:
+                queue = _queues[key] = deque()
+                get_executor(
+                    "task", settings.BACKGROUND_TASKS_WORKERS
+                ).submit(_drain, key)
+            queue.append((func, args))
+
+    transaction.on_commit(submit)
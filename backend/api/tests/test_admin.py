@@ -0,0 +1,127 @@
+"""Админка: число запросов на страницах списков и сохранение рецепта."""
+from unittest import mock
+
+from django.contrib.admin import site
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.models import (Favorite, Follow, Ingredient, IngredientRecipe, Recipe,
+                        RecipeChange, RecipeDocument, RecipeDuplicate,
+                        ShoppingList, Tag)
+
+User = get_user_model()
+
+ADMIN_QUERY_BUDGET = 12
+
+
+class AdminQueryCountTests(TestCase):
+    """
+    Число запросов на странице списка укладывается в ADMIN_QUERY_BUDGET
+    и не растёт вместе с таблицами.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "admin"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def seed(self, start, count):
+        authors = [
+            User.objects.create(
+                username=f"author{index}", email=f"author{index}@example.com"
+            )
+            for index in range(start, start + count)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f"Тег {index}", color=f"#{index:06X}", slug=f"tag{index}"
+            )
+            for index in range(start, start + count)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {index}", measurement_unit="г"
+            )
+            for index in range(start, start + count)
+        ]
+        recipes = []
+        for index, author in enumerate(authors, start):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {index}", text="Описание",
+                cooking_time=10, image="recipes/images/recipe.png",
+            )
+            recipe.tags.set(tags[:2])
+            recipes.append(recipe)
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in ingredients[:3]
+        )
+        for model in (Favorite, ShoppingList):
+            model.objects.bulk_create(
+                model(user=author, recipe=recipe)
+                for author, recipe in zip(authors, reversed(recipes))
+            )
+        Follow.objects.bulk_create(
+            Follow(user=user, following=following)
+            for user, following in zip(authors, authors[1:])
+        )
+        RecipeDuplicate.objects.bulk_create(
+            RecipeDuplicate(recipe=first, duplicate=second, similarity=0.9)
+            for first, second in zip(recipes[::2], recipes[1::2])
+        )
+
+    def changelists(self):
+        return [
+            reverse(
+                f"admin:{model._meta.app_label}_"
+                f"{model._meta.model_name}_changelist"
+            )
+            for model in site._registry
+        ] + [reverse("admin:api_recipeduplicate_clusters")]
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_grow_with_tables(self):
+        self.seed(0, 4)
+        for url in self.changelists():
+            self.count_queries(url)
+        small = {url: self.count_queries(url) for url in self.changelists()}
+        self.seed(4, 16)
+        for url in self.changelists():
+            with self.subTest(url=url):
+                count = self.count_queries(url)
+                self.assertLessEqual(count, ADMIN_QUERY_BUDGET)
+                self.assertEqual(count, small[url])
+
+
+class RecipeAdminSaveTests(TestCase):
+    def test_edit_refreshes_derived_data(self):
+        author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        recipe = Recipe.objects.create(
+            author=author, name="Омлет", text="Взбить яйца", cooking_time=10
+        )
+        form = mock.Mock(instance=recipe)
+        with mock.patch("api.upkeep.ingredient_index") as ingredients, \
+                mock.patch("api.upkeep.recipe_name_index") as names:
+            site._registry[Recipe].save_related(None, form, [], True)
+        ingredients.touch.assert_called_once_with([recipe.id])
+        names.touch.assert_called_once_with([recipe.id])
+        self.assertEqual(
+            RecipeChange.objects.get(recipe_id=recipe.id).action,
+            RecipeChange.UPDATED,
+        )
+        self.assertTrue(RecipeDocument.objects.filter(recipe=recipe).exists())
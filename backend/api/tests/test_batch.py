@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="user", email="user@example.com"
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, *urls):
+        response = self.client.post(
+            "/api/batch/", [{"url": url} for url in urls], format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_results_keep_order(self):
+        me, tags = self.batch("/api/users/me/", "/api/tags/")
+        self.assertEqual(me["status"], 200)
+        self.assertEqual(me["body"]["username"], "user")
+        self.assertEqual(tags, {"status": 200, "body": []})
+
+    def test_streaming_response_is_rejected_per_item(self):
+        export, me = self.batch("/api/users/me/export/", "/api/users/me/")
+        self.assertEqual(export["status"], 400)
+        self.assertEqual(me["status"], 200)
@@ -0,0 +1,40 @@
+"""Бюджеты операций API из budgets.json."""
+import math
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from api import budgets
+
+SCHEMA = settings.BASE_DIR.parent / "docs" / "openapi-schema.yml"
+
+
+class BudgetTests(TestCase):
+    """
+    Каждая операция схемы укладывается в бюджет по статусу, числу
+    запросов и размеру ответа. Время базы зависит от машины, его
+    проверяет команда check_budgets.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        cls.addClassCleanup(media_root.disable)
+        super().setUpClass()
+
+    def test_operations_fit_budgets(self):
+        expected = budgets.load_budgets()
+        results = budgets.run(SCHEMA, repeat=1)
+        self.assertEqual(set(results), set(expected))
+        for operation, roles in results.items():
+            for role, result in roles.items():
+                with self.subTest(operation=operation, role=role):
+                    limit = {**expected[operation][role], "db_ms": math.inf}
+                    self.assertEqual(
+                        budgets.violations(result, limit), []
+                    )
@@ -0,0 +1,44 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.caches import check_shared_cache, check_throttle_cache
+
+LOCAL = {"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+}}
+SHARED = {"default": {
+    "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+    "LOCATION": "memcached:11211",
+}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    @override_settings(CACHES=LOCAL, DEBUG=False)
+    def test_local_cache_warns_in_production(self):
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)], ["api.W001"]
+        )
+
+    @override_settings(CACHES=LOCAL, DEBUG=True)
+    def test_local_cache_is_fine_in_debug(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(
+        CACHES=LOCAL, THROTTLE_BACKEND="api.throttling.CacheCounters"
+    )
+    def test_cache_counters_need_shared_cache(self):
+        self.assertEqual(
+            [warning.id for warning in check_throttle_cache(None)],
+            ["api.W002"],
+        )
+
+    @override_settings(
+        CACHES=SHARED, THROTTLE_BACKEND="api.throttling.CacheCounters"
+    )
+    def test_cache_counters_in_shared_cache(self):
+        self.assertEqual(check_throttle_cache(None), [])
+
+    @override_settings(
+        CACHES=LOCAL, THROTTLE_BACKEND="api.throttling.LocalCounters"
+    )
+    def test_local_counters_need_no_cache(self):
+        self.assertEqual(check_throttle_cache(None), [])
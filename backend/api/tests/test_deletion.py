@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from api.deletion import delete_user, purge_recipes, purge_users
+from api.models import Favorite, Follow, Ingredient, IngredientRecipe, Recipe
+
+User = get_user_model()
+
+
+class PurgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        cls.reader = User.objects.create(
+            username="reader", email="reader@example.com"
+        )
+        ingredient = Ingredient.objects.create(
+            name="Яйцо", measurement_unit="шт"
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f"Омлет {index}", text="Взбить яйца",
+                cooking_time=10,
+            )
+            for index in range(3)
+        ]
+        for recipe in cls.recipes:
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=2
+            )
+            Favorite.objects.create(user=cls.reader, recipe=recipe)
+        Follow.objects.create(user=cls.reader, following=cls.author)
+
+    def test_purge_removes_marked_rows_and_dependents(self):
+        delete_user(self.author)
+        self.assertEqual(
+            list(purge_recipes(batch_size=2)), [(2, 1), (3, 0)]
+        )
+        self.assertEqual(list(purge_users()), [(1, 0)])
+        self.assertFalse(Recipe.all_objects.exists())
+        self.assertFalse(IngredientRecipe.objects.exists())
+        self.assertFalse(Favorite.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(User.all_objects.filter(id=self.author.id).exists())
+        self.assertTrue(User.objects.filter(id=self.reader.id).exists())
+        self.assertTrue(Ingredient.objects.exists())
@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Recipe, RecipeDocument
+from api.views import RecipeViewSet
+
+User = get_user_model()
+
+
+class RecipeDocumentReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name="Омлет", text="Взбить яйца",
+            cooking_time=10, image="recipes/images/omelette.png",
+        )
+
+    def test_missing_document_is_rendered_without_saving(self):
+        RecipeDocument.objects.all().delete()
+        response = APIClient().get(f"/api/recipes/{self.recipe.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Омлет")
+        self.assertFalse(RecipeDocument.objects.exists())
+
+    def test_recipe_deleted_after_lookup_is_not_found(self):
+        RecipeDocument.objects.all().delete()
+        get_object = RecipeViewSet.get_object
+
+        def get_then_delete(view):
+            # Рецепт удаляют между get_object и чтением документа.
+            recipe = get_object(view)
+            Recipe.objects.filter(id=recipe.id).update(
+                deleted_at=timezone.now()
+            )
+            return recipe
+
+        with mock.patch.object(RecipeViewSet, "get_object", get_then_delete):
+            response = APIClient().get(f"/api/recipes/{self.recipe.id}/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(RecipeDocument.objects.exists())
@@ -0,0 +1,16 @@
+from django.test import SimpleTestCase
+
+from api.duplicates import features, signature, similarity
+
+
+class FeaturesTests(SimpleTestCase):
+    def test_empty_text_has_no_text_shingles(self):
+        self.assertEqual(features([1], "Омлет", ""), {"i:1", "n:омлет"})
+
+    def test_short_text_is_one_shingle(self):
+        self.assertIn("t:взбить яйца", features([], "Омлет", "Взбить яйца"))
+
+    def test_empty_texts_do_not_make_recipes_similar(self):
+        first = signature(features([1], "Омлет", ""))
+        second = signature(features([2], "Салат", ""))
+        self.assertEqual(similarity(first, second), 0)
@@ -0,0 +1,73 @@
+"""Память выгрузки архива не растёт с размером аккаунта."""
+import os
+import shutil
+import tempfile
+import tracemalloc
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from api.documents import refresh_recipes
+from api.export import export_archive
+from api.models import Favorite, Recipe
+
+User = get_user_model()
+
+EXPORT_MEMORY_BUDGET = 256 * 1024
+
+
+@override_settings(EXPORT_CHUNK_SIZE=20, EXPORT_FILE_CHUNK=1024)
+class ExportMemoryTests(TestCase):
+    small = 40
+    large = 400
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media)
+        media_root = override_settings(MEDIA_ROOT=cls.media)
+        media_root.enable()
+        cls.addClassCleanup(media_root.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        os.makedirs(os.path.join(cls.media, "recipes"))
+        cls.users = []
+        for count in (cls.small, cls.large):
+            user = User.objects.create(
+                username=f"author{count}", email=f"author{count}@example.com"
+            )
+            for index in range(count):
+                name = f"recipes/{user.id}-{index}.png"
+                with open(os.path.join(cls.media, name), "wb") as image:
+                    image.write(os.urandom(4096))
+                recipe = Recipe.objects.create(
+                    author=user, name=f"Рецепт {index}",
+                    text="Описание " * 50, cooking_time=1, image=name,
+                )
+                Favorite.objects.create(user=user, recipe=recipe)
+            cls.users.append(user)
+        refresh_recipes(Recipe.objects.values_list("id", flat=True))
+
+    def export(self, user):
+        """Пик памяти выгрузки и число файлов в архиве."""
+        path = os.path.join(self.media, f"{user.id}.zip")
+        tracemalloc.start()
+        try:
+            with open(path, "wb") as archive:
+                for data in export_archive(user):
+                    archive.write(data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        with zipfile.ZipFile(path) as archive:
+            self.assertIsNone(archive.testzip())
+            return peak, len(archive.namelist())
+
+    def test_memory_does_not_grow_with_account(self):
+        small, small_files = self.export(self.users[0])
+        large, large_files = self.export(self.users[1])
+        self.assertEqual(large_files - small_files, self.large - self.small)
+        self.assertLess(large - small, EXPORT_MEMORY_BUDGET)
@@ -0,0 +1,100 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.imports import import_recipes
+from api.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def _image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (1, 1)).save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class ImportRecipesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        cls.addClassCleanup(media_root.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        Tag.objects.create(name="Завтрак", color="#E26C2D", slug="breakfast")
+        Ingredient.objects.create(name="яйцо", measurement_unit="шт")
+
+    def row(self, name, image=None):
+        return json.dumps({
+            "name": name,
+            "text": "Взбить яйца",
+            "cooking_time": 10,
+            "tags": ["breakfast"],
+            "image": image or _image(),
+            "ingredients": [{"name": "яйцо", "amount": 2}],
+        })
+
+    def run_import(self, lines, batch_size=None):
+        with mock.patch("api.imports.publish") as publish, mock.patch(
+            "api.imports.run_in_background"
+        ):
+            with self.captureOnCommitCallbacks() as callbacks:
+                events = list(
+                    import_recipes(lines, self.author, batch_size=batch_size)
+                )
+            self.assertFalse(publish.called)
+            for callback in callbacks:
+                callback()
+        return events, publish
+
+    def test_name_of_row_with_broken_image_is_not_reserved(self):
+        events, _ = self.run_import(
+            [self.row("Омлет", image="broken"), self.row("Омлет")],
+            batch_size=1,
+        )
+        self.assertEqual(events[-1]["created"], 1)
+        self.assertEqual(events[-1]["failed"], 1)
+        self.assertTrue(Recipe.objects.filter(name="Омлет").exists())
+
+    def test_duplicate_names_in_one_batch_are_rejected(self):
+        events, _ = self.run_import([self.row("Омлет"), self.row("Омлет")])
+        self.assertEqual(events[0]["line"], 2)
+        self.assertEqual(events[-1]["created"], 1)
+
+    def test_events_are_published_after_commit(self):
+        _, publish = self.run_import([self.row("Омлет")])
+        recipe = Recipe.objects.get(name="Омлет")
+        publish.assert_called_once_with(
+            f"author:{self.author.id}",
+            "recipe",
+            {"id": recipe.id, "name": "Омлет", "author": self.author.id},
+        )
+
+    def test_failed_insert_publishes_nothing(self):
+        with mock.patch(
+            "api.imports.RecipeImporter._insert",
+            side_effect=DatabaseError("сбой"),
+        ):
+            events, publish = self.run_import([self.row("Омлет")])
+        self.assertEqual(events[-1]["failed"], 1)
+        self.assertFalse(publish.called)
+        events, _ = self.run_import([self.row("Омлет")])
+        self.assertEqual(events[-1]["created"], 1)
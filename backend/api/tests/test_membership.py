@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Recipe
+
+User = get_user_model()
+
+
+class MembershipCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="user", email="user@example.com"
+        )
+        author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name="Омлет", text="Взбить яйца", cooking_time=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def flags(self):
+        data = self.client.get(f"/api/recipes/{self.recipe.id}/").json()
+        return data["is_favorited"], data["is_in_shopping_cart"]
+
+    def test_toggles_reset_cached_ids(self):
+        url = f"/api/recipes/{self.recipe.id}"
+        self.assertEqual(self.flags(), (False, False))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"{url}/favorite/")
+        self.assertEqual(self.flags(), (True, False))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"{url}/shopping_cart/")
+            self.client.delete(f"{url}/favorite/")
+        self.assertEqual(self.flags(), (False, True))
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from api.models import Tag
+from api.nplusone import NPlusOneError, detect, report
+
+
+class NPlusOneTests(TestCase):
+    def repeat_queries(self):
+        with detect() as detector:
+            for index in range(settings.NPLUSONE_THRESHOLD + 1):
+                Tag.objects.filter(id=index).exists()
+        return detector.repeats()
+
+    def test_runner_raises_on_repeats(self):
+        self.assertEqual(settings.NPLUSONE_MODE, "raise")
+        repeats = self.repeat_queries()
+        self.assertEqual(len(repeats), 1)
+        self.assertTrue(repeats[0]["site"].startswith("api/tests/"))
+        with self.assertRaises(NPlusOneError):
+            report(repeats, "тест")
+
+    def test_log_mode_warns(self):
+        with override_settings(NPLUSONE_MODE="log"), self.assertLogs(
+            "api.nplusone", "WARNING"
+        ):
+            report(self.repeat_queries(), "тест")
+
+    def test_queries_below_threshold_are_ignored(self):
+        with detect() as detector:
+            Tag.objects.filter(id=1).exists()
+        self.assertEqual(detector.repeats(), [])
+
+    @override_settings(NPLUSONE_ALLOWLIST=["api/tests/*"])
+    def test_allowlist(self):
+        self.assertEqual(self.repeat_queries(), [])
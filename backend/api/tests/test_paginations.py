@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import Recipe
+from api.paginations import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class EstimatedCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        for index in range(3):
+            Recipe.objects.create(
+                author=author, name=f"Омлет {index}", text="Взбить яйца",
+                cooking_time=10,
+            )
+        Recipe.objects.filter(name="Омлет 0").update(
+            deleted_at=timezone.now()
+        )
+
+    def deleted(self, queryset):
+        paginator = EstimatedCountPaginator(queryset, 10)
+        return paginator._deleted(queryset.query, connection)
+
+    def test_soft_delete_filter_keeps_estimate(self):
+        self.assertEqual(self.deleted(Recipe.objects.all()), 1)
+        self.assertEqual(self.deleted(Recipe.all_objects.all()), 0)
+
+    def test_other_filters_disable_estimate(self):
+        self.assertIsNone(self.deleted(Recipe.objects.filter(name="Омлет 1")))
+        self.assertIsNone(
+            self.deleted(Recipe.all_objects.filter(deleted_at__isnull=False))
+        )
+
+    def test_count_is_exact_outside_postgresql(self):
+        paginator = EstimatedCountPaginator(Recipe.objects.all(), 10)
+        self.assertEqual(paginator.count, 2)
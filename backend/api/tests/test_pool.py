@@ -0,0 +1,167 @@
+"""Пул соединений foodgram.db.pool на базах SQLite."""
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from foodgram.db.pool import ConnectionPool, PoolTimeout, get_pool
+from foodgram.db.sqlite3.base import DatabaseWrapper
+
+User = get_user_model()
+
+
+def ping(connection):
+    connection.execute("SELECT 1").close()
+
+
+def reset(connection):
+    if connection.in_transaction:
+        connection.rollback()
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.name = str(Path(directory.name) / "pool.sqlite3")
+
+    def connect(self):
+        return sqlite3.connect(self.name, check_same_thread=False)
+
+    def make_pool(self, **options):
+        options = {
+            "max_size": 2, "timeout": 0.05, "max_lifetime": 60,
+            "pre_ping": True, **options,
+        }
+        pool = ConnectionPool(**options)
+        self.addCleanup(pool.close_idle)
+        return pool
+
+    def test_connection_is_reused(self):
+        pool = self.make_pool()
+        connection = pool.checkout(self.connect, ping)
+        pool.checkin(connection, reset)
+        self.assertIs(pool.checkout(self.connect, ping), connection)
+        stats = pool.stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["in_use"], 1)
+
+    def test_exhausted_pool_times_out(self):
+        pool = self.make_pool(max_size=1)
+        connection = pool.checkout(self.connect, ping)
+        with self.assertRaises(PoolTimeout), self.assertLogs(
+            "foodgram.db.pool", "WARNING"
+        ):
+            pool.checkout(self.connect, ping)
+        stats = pool.stats()
+        self.assertEqual(stats["exhausted"], 1)
+        self.assertEqual(stats["timeouts"], 1)
+        pool.checkin(connection, reset)
+        self.assertIs(pool.checkout(self.connect, ping), connection)
+
+    def test_broken_connection_is_replaced(self):
+        pool = self.make_pool()
+        connection = pool.checkout(self.connect, ping)
+        pool.checkin(connection, reset)
+        connection.close()
+        replacement = pool.checkout(self.connect, ping)
+        self.assertIsNot(replacement, connection)
+        stats = pool.stats()
+        self.assertEqual(stats["ping_failures"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_expired_connection_is_closed(self):
+        pool = self.make_pool(max_lifetime=0)
+        connection = pool.checkout(self.connect, ping)
+        pool.checkin(connection, reset)
+        stats = pool.stats()
+        self.assertEqual(stats["closed"], 1)
+        self.assertEqual(stats["size"], 0)
+
+    def test_open_transaction_is_rolled_back(self):
+        pool = self.make_pool()
+        connection = pool.checkout(self.connect, ping)
+        connection.execute("CREATE TABLE item (id INTEGER)")
+        connection.commit()
+        connection.execute("INSERT INTO item VALUES (1)")
+        pool.checkin(connection, reset)
+        connection = pool.checkout(self.connect, ping)
+        self.assertEqual(
+            connection.execute("SELECT count(*) FROM item").fetchone(), (0,)
+        )
+
+    def test_new_pool_after_fork(self):
+        pool = get_pool("test_new_pool_after_fork", {"MAX_SIZE": 1})
+        self.assertIs(get_pool("test_new_pool_after_fork", {}), pool)
+        pool.pid = -1
+        self.assertIsNot(get_pool("test_new_pool_after_fork", {}), pool)
+
+    def make_wrapper(self):
+        wrapper = DatabaseWrapper({
+            "NAME": self.name,
+            "USER": "", "PASSWORD": "", "HOST": "", "PORT": "",
+            "ATOMIC_REQUESTS": False, "AUTOCOMMIT": True,
+            "CONN_MAX_AGE": 0, "OPTIONS": {}, "TIME_ZONE": None,
+            "TEST": {}, "POOL": {"MAX_SIZE": 1, "TIMEOUT": 0.05},
+        })
+        self.addCleanup(wrapper.close_pool)
+        return wrapper
+
+    def test_wrapper_returns_connection_to_pool(self):
+        wrapper = self.make_wrapper()
+        for _ in range(3):
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            wrapper.close()
+        stats = wrapper._pool.stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertEqual(stats["idle"], 1)
+
+    def test_connection_released_in_transaction_returns_in_autocommit(self):
+        wrapper = self.make_wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute("CREATE TABLE item (id INTEGER)")
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute("INSERT INTO item VALUES (1)")
+        connection = wrapper.connection
+        wrapper.close()
+        # Соединение в пуле уже в autocommit: pre-ping не откроет
+        # транзакцию до того, как Django настроит соединение.
+        self.assertIsNone(connection.isolation_level)
+        self.assertFalse(connection.in_transaction)
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, connection)
+        self.assertTrue(wrapper.get_autocommit())
+        with wrapper.cursor() as cursor:
+            cursor.execute("INSERT INTO item VALUES (2)")
+        self.assertFalse(connection.in_transaction)
+        wrapper.close()
+        self.assertEqual(
+            self.connect().execute("SELECT id FROM item").fetchall(), [(2,)]
+        )
+
+
+class DatabasePoolViewTests(TestCase):
+    def test_admin_gets_pool_metrics(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(
+            username="admin", email="admin@example.com", is_staff=True
+        ))
+        response = client.get("/api/metrics/db-pool/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("pid", response.json())
+        self.assertTrue(response.json()["pools"])
+
+    def test_user_is_forbidden(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(
+            username="user", email="user@example.com"
+        ))
+        response = client.get("/api/metrics/db-pool/")
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,129 @@
+"""
+Чтение с реплик на двух базах SQLite. Реплика — снимок основной
+тестовой базы: всё, что записано в основную базу после снимка,
+на реплике не видно, как при отставании репликации.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import Favorite, Ingredient, Recipe, Tag
+from api.replicas import PIN_COOKIE
+
+User = get_user_model()
+
+REPLICA = "replica"
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], MEDIA_ROOT=MEDIA_ROOT)
+class ReplicaReadTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Реплика добавляется после проверки databases: тестовый раннер
+        # не создаёт для неё базу, её содержимое задаёт snapshot().
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            **connections.databases[DEFAULT_DB_ALIAS],
+            "NAME": str(Path(cls.directory) / "replica.sqlite3"),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        connections[REPLICA].close_pool()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.directory)
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        self.reader = User.objects.create(
+            username="reader", email="reader@example.com"
+        )
+        self.tag = Tag.objects.create(
+            name="Завтрак", color="#E26C2D", slug="breakfast"
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="Омлет", text="Взбить яйца",
+            cooking_time=10, image="recipes/images/omelette.png",
+        )
+        self.snapshot()
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+
+    def snapshot(self):
+        """Копирует основную базу в реплику."""
+        for alias in (DEFAULT_DB_ALIAS, REPLICA):
+            connections[alias].ensure_connection()
+        connections[DEFAULT_DB_ALIAS].connection.backup(
+            connections[REPLICA].connection
+        )
+
+    def create_recipe(self):
+        response = self.author_client.post(
+            "/api/recipes/",
+            {
+                "name": "Блины",
+                "text": "Жарить на сковороде",
+                "cooking_time": 20,
+                "image": IMAGE,
+                "tags": [self.tag.id],
+                "ingredients": [{"id": self.ingredient.id, "amount": 100}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def test_reads_go_to_replica(self):
+        recipe_id = self.create_recipe().json()["id"]
+        response = APIClient().get(f"/api/recipes/{recipe_id}/")
+        self.assertEqual(response.status_code, 404)
+        response = self.reader_client.get(f"/api/recipes/{recipe_id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_writer_is_pinned_to_primary(self):
+        response = self.create_recipe()
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.author_client.get(
+            f"/api/recipes/{response.json()['id']}/"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_pin_belongs_to_its_user(self):
+        recipe_id = self.create_recipe().json()["id"]
+        self.reader_client.cookies = self.author_client.cookies
+        response = self.reader_client.get(f"/api/recipes/{recipe_id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_forged_pin_is_ignored(self):
+        recipe_id = self.create_recipe().json()["id"]
+        self.author_client.cookies[PIN_COOKIE] = str(self.author.id)
+        response = self.author_client.get(f"/api/recipes/{recipe_id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_membership_is_loaded_from_primary(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        response = self.reader_client.get(f"/api/recipes/{self.recipe.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["is_favorited"])
@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.deletion import delete_recipes
+from api.models import Favorite, Ingredient, IngredientRecipe, Recipe, Tag
+from api.search import FTS_TABLE
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    """Поиск ?search= по теневой таблице FTS5 в SQLite."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        cls.breakfast = Tag.objects.create(
+            name="Завтрак", color="#32CD32", slug="breakfast"
+        )
+        cls.dinner = Tag.objects.create(
+            name="Ужин", color="#800080", slug="dinner"
+        )
+        egg = Ingredient.objects.create(name="Яйцо", measurement_unit="шт")
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.omelette = Recipe.objects.create(
+                author=cls.author, name="Омлет с сыром",
+                text="Взбить яйца и пожарить", cooking_time=10,
+            )
+            cls.toast = Recipe.objects.create(
+                author=cls.author, name="Тост",
+                text="Подавать к омлету или к чаю", cooking_time=5,
+            )
+            cls.soup = Recipe.objects.create(
+                author=cls.author, name="Суп",
+                text="Сварить бульон", cooking_time=40,
+            )
+            IngredientRecipe.objects.create(
+                recipe=cls.soup, ingredient=egg, amount=1
+            )
+        cls.omelette.tags.set([cls.breakfast])
+        cls.omelette.update_tags_mask()
+        cls.toast.tags.set([cls.dinner])
+        cls.toast.update_tags_mask()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get(f"/api/recipes/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.json()["results"]]
+
+    def indexed(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {FTS_TABLE}")
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_matches_name_text_and_ingredients(self):
+        self.assertEqual(self.search("search=бульон"), [self.soup.id])
+        self.assertEqual(self.search("search=яйцо"), [self.soup.id])
+        self.assertEqual(self.search("search=ужин"), [])
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.search("search=сыр"), [self.omelette.id])
+        self.assertEqual(self.search("search=омл сыр"), [self.omelette.id])
+
+    def test_name_match_ranks_before_text_match(self):
+        self.assertEqual(
+            self.search("search=омлет"), [self.omelette.id, self.toast.id]
+        )
+
+    def test_combines_with_tags(self):
+        self.assertEqual(
+            self.search("search=омлет&tags=dinner"), [self.toast.id]
+        )
+        self.assertEqual(
+            self.search("search=омлет&tags=breakfast&tags=dinner"),
+            [self.omelette.id, self.toast.id],
+        )
+
+    def test_combines_with_is_favorited(self):
+        reader = User.objects.create(
+            username="reader", email="reader@example.com"
+        )
+        Favorite.objects.create(user=reader, recipe=self.toast)
+        self.client.force_authenticate(reader)
+        self.assertEqual(
+            self.search("search=омлет&is_favorited=1"), [self.toast.id]
+        )
+
+    def test_update_refreshes_index(self):
+        self.soup.name = "Борщ"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup.save()
+        self.assertEqual(self.search("search=борщ"), [self.soup.id])
+        self.assertEqual(self.search("search=суп"), [])
+
+    def test_ingredient_change_refreshes_index(self):
+        salt = Ingredient.objects.create(name="Соль", measurement_unit="г")
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientRecipe.objects.create(
+                recipe=self.toast, ingredient=salt, amount=1
+            )
+        self.assertEqual(self.search("search=соль"), [self.toast.id])
+
+    def test_delete_removes_from_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_recipes(Recipe.objects.filter(id=self.omelette.id))
+        self.assertEqual(self.indexed(), {self.toast.id, self.soup.id})
+        self.assertEqual(self.search("search=омлет"), [self.toast.id])
+        self.assertEqual(self.search("search=сыр"), [])
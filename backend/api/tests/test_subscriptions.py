@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Follow, Recipe
+
+User = get_user_model()
+
+AUTHORS = settings.NPLUSONE_THRESHOLD + 3
+
+
+class SubscriptionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username="reader", email="reader@example.com"
+        )
+        for index in range(AUTHORS):
+            author = User.objects.create(
+                username=f"author{index}", email=f"author{index}@example.com"
+            )
+            Follow.objects.create(user=cls.user, following=author)
+            for number in range(3):
+                Recipe.objects.create(
+                    author=author, name=f"Рецепт {number}", text="Текст",
+                    cooking_time=5,
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, query=""):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"/api/users/subscriptions/?limit={AUTHORS}{query}"
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"], len(queries)
+
+    def test_recipes_are_loaded_in_one_query(self):
+        results, count = self.get()
+        self.assertEqual(len(results), AUTHORS)
+        for author in results:
+            self.assertEqual(len(author["recipes"]), 3)
+            self.assertEqual(author["recipes_count"], 3)
+        self.assertLess(count, AUTHORS)
+
+    def test_recipes_limit_applies_per_author(self):
+        results, _ = self.get("&recipes_limit=2")
+        for author in results:
+            names = [recipe["name"] for recipe in author["recipes"]]
+            self.assertEqual(names, ["Рецепт 2", "Рецепт 1"])
+            self.assertEqual(author["recipes_count"], 3)
@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+NOW = 1_000_020.0
+
+
+@override_settings(
+    THROTTLE_BACKEND="api.throttling.LocalCounters",
+    THROTTLE_IP_BUDGET=3,
+    THROTTLE_USER_BUDGET=5,
+)
+class CostThrottleTests(TestCase):
+    def setUp(self):
+        for target, value in (
+            ("api.throttling._counters", None),
+            ("api.throttling.time.time", lambda: NOW),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, address, client=None):
+        """Запрос к списку тегов через nginx от клиента с адресом address."""
+        return (client or APIClient()).get(
+            "/api/tags/",
+            REMOTE_ADDR="172.18.0.5",
+            HTTP_X_FORWARDED_FOR=address,
+        )
+
+    def test_anonymous_budget_allows_then_denies(self):
+        for _ in range(3):
+            self.assertEqual(self.get("203.0.113.1").status_code, 200)
+        response = self.get("203.0.113.1")
+        self.assertEqual(response.status_code, 429)
+        # Окно только началось: до конца 60 с и ещё треть следующего,
+        # пока доля этого окна в оценке не опустится до 2 единиц.
+        self.assertEqual(response["Retry-After"], "80")
+
+    def test_clients_behind_proxy_have_separate_buckets(self):
+        for _ in range(3):
+            self.get("203.0.113.1")
+        self.assertEqual(self.get("203.0.113.1").status_code, 429)
+        self.assertEqual(self.get("203.0.113.2").status_code, 200)
+
+    def test_users_do_not_spend_address_budget(self):
+        user = User.objects.create(username="user", email="user@example.com")
+        client = APIClient()
+        client.force_authenticate(user)
+        for _ in range(5):
+            self.assertEqual(
+                self.get("203.0.113.1", client).status_code, 200
+            )
+        self.assertEqual(self.get("203.0.113.1", client).status_code, 429)
+        self.assertEqual(self.get("203.0.113.1").status_code, 200)
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from api.indexes import RecipeNameIndex
+from api.models import Favorite, Recipe, TrendingEpoch
+from api.trending import decay, record_event
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username="author", email="author@example.com"
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f"Омлет {index}", text="Взбить яйца",
+                cooking_time=10,
+            )
+            for index in range(3)
+        ]
+        TrendingEpoch.objects.create(
+            epoch=timezone.now()
+            - timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        )
+
+    def setUp(self):
+        self.index = RecipeNameIndex()
+        patcher = mock.patch("api.trending.recipe_name_index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for count, recipe in enumerate(self.recipes, 1):
+            for _ in range(count):
+                record_event(Favorite, recipe.id)
+        self.index.ensure_fresh()
+
+    def scores(self):
+        return dict(zip(self.index.ids, self.index.scores))
+
+    def test_events_do_not_touch_suggestions(self):
+        with mock.patch.object(self.index, "touch") as touch:
+            record_event(Favorite, self.recipes[0].id)
+        self.assertFalse(touch.called)
+
+    def test_decay_rescales_suggestions_in_place(self):
+        with mock.patch.object(
+            self.index, "build", side_effect=AssertionError
+        ), self.captureOnCommitCallbacks(execute=True):
+            decay()
+        expected = dict(Recipe.objects.values_list("id", "trending_score"))
+        for recipe_id, score in self.scores().items():
+            self.assertAlmostEqual(score, expected[recipe_id])
+        self.assertEqual(
+            [item["id"] for item in self.index.search("омлет")],
+            [recipe.id for recipe in reversed(self.recipes)],
+        )
+
+    def test_rescale_zeroes_small_scores(self):
+        self.index.rescale(settings.TRENDING_MIN_SCORE / 8)
+        self.assertEqual(set(self.scores().values()), {0.0})
+
+    def test_replay_scales_before_refresh(self):
+        before = self.scores()
+        changed, *others = self.recipes
+        Recipe.objects.filter(id=changed.id).update(trending_score=10)
+        self.index.apply([[changed.id], {"scale": 0.5}])
+        scores = self.scores()
+        self.assertEqual(scores[changed.id], 10)
+        for recipe in others:
+            self.assertEqual(scores[recipe.id], before[recipe.id] / 2)
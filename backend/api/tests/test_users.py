@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.deletion import delete_user
+
+User = get_user_model()
+
+
+class UserWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            username="admin", email="admin@example.com", is_superuser=True
+        )
+        cls.user = User.objects.create(
+            username="user", email="user@example.com"
+        )
+
+    def test_partial_update_keeps_other_fields(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.patch(
+            f"/api/users/{self.user.id}/", {"first_name": "Иван"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Иван")
+        self.assertEqual(self.user.email, "user@example.com")
+
+    def test_name_of_user_being_deleted_is_not_reused(self):
+        delete_user(self.user)
+        response = APIClient().post("/api/users/", {
+            "email": "other@example.com",
+            "username": "user",
+            "first_name": "Имя",
+            "last_name": "Фамилия",
+            "password": "Strong-password-1",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
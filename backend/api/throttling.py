@@ -0,0 +1,178 @@
+"""
+Ограничение частоты запросов по стоимости.
+
+Каждое действие вьюсета стоит THROTTLE_COSTS["<basename>.<action>"]
+единиц, по умолчанию одну. Страницы больше стандартной и большие тела
+запросов стоят дороже: ?limit=1000 считается за столько страниц,
+сколько в нём стандартных, тело — по единице за каждые
+THROTTLE_BODY_UNIT байт. За окно THROTTLE_WINDOW секунд пользователь
+тратит не больше THROTTLE_USER_BUDGET единиц, анонимные запросы с одного
+адреса — THROTTLE_IP_BUDGET.
+
+Окно скользящее: расход оценивается как расход текущего окна плюс
+доля предыдущего, пропорциональная ещё не прошедшей части. На ключ
+хранятся номер окна и два числа. Счётчики по умолчанию живут в памяти
+процесса; THROTTLE_BACKEND позволяет хранить их в общем кэше Django
+(api.throttling.CacheCounters).
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+
+def _wait(previous, current, cost, limit, window, elapsed):
+    """
+    Сколько секунд ждать, пока оценка расхода с учётом cost уложится
+    в limit; 0 — можно сейчас.
+    """
+    cost = min(cost, limit)
+    weight = 1 - elapsed / window
+    if previous * weight + current + cost <= limit:
+        return 0
+    if current + cost <= limit:
+        # Хватит того, что доля предыдущего окна уменьшится.
+        return (weight - (limit - current - cost) / previous) * window
+    # Ждать следующего окна, где текущее станет предыдущим.
+    return window - elapsed + (1 - (limit - cost) / current) * window
+
+
+class LocalCounters:
+    """Счётчики в памяти процесса: ключ -> [номер окна, текущее, прошлое]."""
+
+    # Как часто удалять ключи, не обновлявшиеся два окна.
+    sweep_every = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._hits = 0
+
+    def hit(self, checks, cost, window, now):
+        """
+        Списывает cost со всех ключей checks — пар (ключ, лимит), если
+        каждый укладывается в лимит. Возвращает 0 или сколько ждать.
+        """
+        index, elapsed = divmod(now, window)
+        with self._lock:
+            counters = []
+            wait = 0
+            for key, limit in checks:
+                counter = self._counters.get(key)
+                if counter is None:
+                    counter = self._counters[key] = [index, 0, 0]
+                elif counter[0] != index:
+                    counter[2] = counter[1] if counter[0] == index - 1 else 0
+                    counter[0], counter[1] = index, 0
+                counters.append(counter)
+                wait = max(wait, _wait(
+                    counter[2], counter[1], cost, limit, window, elapsed
+                ))
+            if not wait:
+                for counter in counters:
+                    counter[1] += cost
+            self._hits += 1
+            if self._hits % self.sweep_every == 0:
+                self._sweep(index)
+        return wait
+
+    def _sweep(self, index):
+        self._counters = {
+            key: counter for key, counter in self._counters.items()
+            if counter[0] >= index - 1
+        }
+
+
+class CacheCounters:
+    """
+    Счётчики в кэше default: ключ на окно. Общие для процессов они
+    только с общим кэшем (memcached, Redis); с кэшем в памяти процесса
+    у каждого воркера свои счётчики, о чём предупреждает api.W002.
+    Проверка и списание не атомарны, при гонке лимит может быть
+    превышен на несколько запросов.
+    """
+
+    def hit(self, checks, cost, window, now):
+        index, elapsed = divmod(now, window)
+        index = int(index)
+        keys = {
+            key: (f"throttle:{key}:{index}", f"throttle:{key}:{index - 1}")
+            for key, _ in checks
+        }
+        counts = cache.get_many(
+            [name for names in keys.values() for name in names]
+        )
+        wait = max(
+            _wait(
+                counts.get(keys[key][1], 0), counts.get(keys[key][0], 0),
+                cost, limit, window, elapsed,
+            )
+            for key, limit in checks
+        )
+        if not wait:
+            for current, _ in keys.values():
+                try:
+                    cache.incr(current, cost)
+                except ValueError:
+                    # Первый запрос в окне; ключ мог создать соседний процесс.
+                    if not cache.add(current, cost, window * 2):
+                        cache.incr(current, cost)
+        return wait
+
+
+_counters = None
+_counters_lock = threading.Lock()
+
+
+def get_counters():
+    global _counters
+    if _counters is None:
+        with _counters_lock:
+            if _counters is None:
+                _counters = import_string(settings.THROTTLE_BACKEND)()
+    return _counters
+
+
+class CostThrottle(BaseThrottle):
+    """
+    Бюджет в единицах стоимости действий: у пользователя свой, у
+    анонимных запросов — общий на адрес клиента. Адрес за nginx берётся
+    из X-Forwarded-For с учётом NUM_PROXIES.
+    """
+
+    def cost(self, request, view):
+        basename = getattr(view, "basename", "")
+        action = getattr(view, "action", "")
+        cost = settings.THROTTLE_COSTS.get(f"{basename}.{action}", 1)
+        paginator = getattr(view, "paginator", None)
+        if paginator is not None and paginator.page_size:
+            size = paginator.get_page_size(request) or paginator.page_size
+            cost *= math.ceil(size / paginator.page_size)
+        length = request.META.get("CONTENT_LENGTH")
+        if length and length.isdigit():
+            cost += int(length) // settings.THROTTLE_BODY_UNIT
+        return cost
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            checks = [
+                (f"user:{request.user.id}", settings.THROTTLE_USER_BUDGET)
+            ]
+        else:
+            checks = [
+                (f"ip:{self.get_ident(request)}", settings.THROTTLE_IP_BUDGET)
+            ]
+        self._wait = get_counters().hit(
+            checks,
+            self.cost(request, view),
+            settings.THROTTLE_WINDOW,
+            time.time(),
+        )
+        return not self._wait
+
+    def wait(self):
+        return math.ceil(self._wait)
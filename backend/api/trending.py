@@ -0,0 +1,85 @@
+"""
+Популярность рецептов с экспоненциальным затуханием.
+
+Используется затухание «вперёд»: вместо того чтобы уменьшать старые
+вклады, каждое новое событие получает вес 2 ** (t / период полураспада),
+где t отсчитывается от общей точки отсчёта. Порядок рецептов по такой
+сумме совпадает с порядком по затухающей популярности, поэтому событие
+обновляет одну строку. Команда decay_trending периодически переносит
+точку отсчёта на текущий момент и масштабирует все значения одним
+UPDATE, чтобы они не росли неограниченно. Событие держит разделяемую
+блокировку точки отсчёта до записи, а decay() — исключительную: иначе
+событие, прочитавшее старую точку, записало бы вклад в старом масштабе
+после пересчёта.
+"""
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.indexes import recipe_name_index
+from api.models import Favorite, Recipe, ShoppingList, TrendingEpoch
+
+WEIGHTS = {
+    Favorite: 1.0,
+    ShoppingList: settings.TRENDING_CART_WEIGHT,
+}
+
+
+def _epoch():
+    epoch = TrendingEpoch.objects.values_list("epoch", flat=True).first()
+    if epoch is None:
+        epoch = TrendingEpoch.objects.create(epoch=timezone.now()).epoch
+    return epoch
+
+
+def _shared_epoch():
+    """
+    Точка отсчёта под блокировкой FOR SHARE до конца транзакции.
+    В SQLite блокировок строк нет, запись и так сериализована.
+    """
+    using = router.db_for_write(TrendingEpoch)
+    sql = f"SELECT * FROM {TrendingEpoch._meta.db_table}"
+    if connections[using].vendor == "postgresql":
+        sql += " FOR SHARE"
+    state = next(iter(TrendingEpoch.objects.raw(sql).using(using)), None)
+    return state.epoch if state is not None else _epoch()
+
+
+def _growth(since):
+    elapsed = (timezone.now() - since).total_seconds()
+    return 2 ** (elapsed / settings.TRENDING_HALF_LIFE)
+
+
+def record_event(model, recipe_id):
+    """
+    Учитывает добавление рецепта в избранное или список покупок и
+    помечает его сходство для пересчёта — одним UPDATE строки рецепта.
+    """
+    with transaction.atomic():
+        Recipe.objects.filter(id=recipe_id).update(
+            trending_score=F("trending_score")
+            + WEIGHTS[model] * _growth(_shared_epoch()),
+            similarity_stale=True,
+        )
+
+
+def decay():
+    """Переносит точку отсчёта на текущий момент, масштабируя значения."""
+    with transaction.atomic():
+        state = TrendingEpoch.objects.select_for_update().first()
+        if state is None:
+            _epoch()
+            return 0
+        factor = 1 / _growth(state.epoch)
+        Recipe.objects.filter(
+            trending_score__lt=settings.TRENDING_MIN_SCORE / factor
+        ).exclude(trending_score=0).update(trending_score=0)
+        updated = Recipe.objects.exclude(trending_score=0).update(
+            trending_score=F("trending_score") * factor
+        )
+        state.epoch = timezone.now()
+        state.save(update_fields=["epoch"])
+        # Подсказки хранят популярность, которая теперь в другом масштабе.
+        recipe_name_index.scale(factor)
+    return updated
@@ -0,0 +1,41 @@
+"""
+Производные данные рецептов.
+
+Рецепты меняют сериализатор, админка, импорт и удаление. После каждого
+изменения нужно записать его в журнал изменений, обновить документы,
+дубликаты и поиск и сообщить индексам в памяти, какие рецепты
+перечитать. Функции модуля делают это в одном месте; вызываются внутри
+транзакции, изменившей рецепты. Поисковый индекс при сохранении
+обновляют сигналы Recipe и IngredientRecipe.
+"""
+from api.changes import log_changes
+from api.documents import refresh_documents
+from api.duplicates import index_recipes
+from api.indexes import ingredient_index, recipe_name_index
+from api.models import RecipeChange
+from api.search import remove_from_search_index
+
+
+def _touch(recipe_ids):
+    ingredient_index.touch(recipe_ids)
+    recipe_name_index.touch(recipe_ids)
+
+
+def recipes_saved(recipes, created):
+    """Созданные (created) или изменённые рецепты вместе с ингредиентами."""
+    recipe_ids = [recipe.id for recipe in recipes]
+    log_changes(
+        recipe_ids,
+        RecipeChange.CREATED if created else RecipeChange.UPDATED,
+    )
+    refresh_documents(recipe_ids)
+    index_recipes(recipes)
+    _touch(recipe_ids)
+
+
+def recipes_deleted(recipe_ids):
+    """Рецепты, помеченные удалёнными."""
+    log_changes(recipe_ids, RecipeChange.DELETED)
+    for recipe_id in recipe_ids:
+        remove_from_search_index(recipe_id)
+    _touch(recipe_ids)
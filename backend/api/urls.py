@@ -1,7 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.views import (BatchView, DatabasePoolView, EventTicketView,
+                       IngredientViewSet, RecipeViewSet, TagViewSet,
+                       UserViewSet)
 
 router = DefaultRouter()
 
@@ -11,6 +13,9 @@ router.register("recipes", RecipeViewSet, "recipes")
 router.register("ingredients", IngredientViewSet, "ingredients")
 
 urlpatterns = [
+    path("batch/", BatchView.as_view(), name="batch"),
+    path("events/ticket/", EventTicketView.as_view(), name="events-ticket"),
+    path("metrics/db-pool/", DatabasePoolView.as_view(), name="db-pool"),
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
 ]
@@ -1,30 +1,94 @@
+import json
+import os
 from datetime import datetime as dt
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import F, Sum
-from django.http import HttpResponse
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.serializers import SetPasswordSerializer
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from rest_framework.permissions import (SAFE_METHODS, AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from api.batch import run_batch
+from api.changes import changes_since
+from api.deletion import delete_recipes, delete_user
+from api.documents import AUTHOR_FIELDS, FIELDS, load_documents
+from api.events import FOLLOW, UNFOLLOW, issue_ticket, publish
+from api.export import export_archive
+from api.feed import feed_queryset, sync_timeline
 from api.filters import IngredientSearchFilter, RecipeFilter
-from api.models import Favorite, Follow, Ingredient, Recipe, ShoppingList, Tag
+from api.imports import import_recipes
+from api.indexes import (ingredient_index, ingredient_name_index,
+                         recipe_name_index, tag_index)
+from api.membership import invalidate_members, member_ids
+from api.models import (Favorite, Follow, Ingredient, Recipe, RecipeChange,
+                        ShoppingList, Tag)
 from api.paginations import CustomPagination
 from api.permissions import IsCurrentUserOrReadOnly, IsOwnerOrReadOnly
+from api.recommendations import (mark_stale, recommended_recipes,
+                                 similar_recipes)
+from api.replicas import ReplicaReadMixin
 from api.serializers import (CreateUserSerializer, FavoriteSerializer,
                              FollowSerializer, GETUserSerializer,
-                             IngredientSerializer, RecipeGETSerializer,
-                             RecipeWriteSerializer, ShoppingListSerializer,
-                             TagSerializer)
+                             IngredientSerializer, RecipeWriteSerializer,
+                             ShoppingListSerializer, TagSerializer,
+                             wants_field)
+from api.tasks import run_in_background, run_in_order
+from api.trending import record_event
+from foodgram.db.pool import pool_stats
 
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def serialize_recipes(recipe_ids, context):
+    """
+    Рецепты в порядке переданных id: готовые документы и поля
+    текущего пользователя.
+    """
+    request = context["request"]
+    fields = [name for name in FIELDS if wants_field(request, name)]
+    documents = load_documents(recipe_ids, fields)
+    favorites = (
+        member_ids(request, Favorite) if "is_favorited" in fields else ()
+    )
+    cart = (
+        member_ids(request, ShoppingList)
+        if "is_in_shopping_cart" in fields else ()
+    )
+    follows = member_ids(request, Follow) if "author" in fields else ()
+    data = []
+    for recipe_id in recipe_ids:
+        document = documents.get(recipe_id)
+        if document is None:
+            continue
+        recipe = {}
+        for name in fields:
+            if name == "is_favorited":
+                recipe[name] = recipe_id in favorites
+            elif name == "is_in_shopping_cart":
+                recipe[name] = recipe_id in cart
+            elif name == "author":
+                author = document["author"]
+                recipe[name] = {
+                    **{field: author[field] for field in AUTHOR_FIELDS},
+                    "is_subscribed": author["id"] in follows,
+                }
+            elif name == "image" and document["image"]:
+                recipe[name] = request.build_absolute_uri(document["image"])
+            else:
+                recipe[name] = document[name]
+        data.append(recipe)
+    return data
+
+
+class UserViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     Вьюсет модели User и Follow с возможностью смены пороля.
     """
@@ -38,6 +102,9 @@ class UserViewSet(viewsets.ModelViewSet):
             return GETUserSerializer
         return CreateUserSerializer
 
+    def perform_destroy(self, instance):
+        delete_user(instance)
+
     @action(
         methods=["GET"],
         detail=False,
@@ -54,6 +121,21 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        methods=["GET"],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        url_path="me/export",
+    )
+    def export(self, request):
+        response = StreamingHttpResponse(
+            export_archive(request.user), content_type="application/zip"
+        )
+        response[
+            "Content-Disposition"
+        ] = f"attachment; filename=foodgram-{request.user.username}.zip"
+        return response
+
     @action(
         methods=["POST"], detail=False,
         permission_classes=[IsAuthenticated]
@@ -65,9 +147,7 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         self.request.user.set_password(serializer.data["new_password"])
         self.request.user.save()
-        return Response(
-            "Пароль успешно изменен", status=status.HTTP_204_NO_CONTENT
-        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=True,
@@ -84,6 +164,11 @@ class UserViewSet(viewsets.ModelViewSet):
             )
             serializer.is_valid(raise_exception=True)
             serializer.save(following=following, user=user)
+            invalidate_members(request, Follow)
+            run_in_order(
+                f"timeline:{user.id}", sync_timeline, user.id, following.id
+            )
+            publish(f"user:{user.id}", FOLLOW, {"id": following.id})
             return Response(
                 serializer.data, status=status.HTTP_201_CREATED
             )
@@ -94,13 +179,56 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         follow.delete()
-        return Response("Вы отписались", status=status.HTTP_204_NO_CONTENT)
+        invalidate_members(request, Follow)
+        run_in_order(
+            f"timeline:{user.id}", sync_timeline, user.id, following.id
+        )
+        publish(f"user:{user.id}", UNFOLLOW, {"id": following.id})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        url_path="me/recommended",
+    )
+    def recommended(self, request):
+        seed_ids = member_ids(request, Favorite) | member_ids(
+            request, ShoppingList
+        )
+        page = self.paginate_queryset(recommended_recipes(seed_ids))
+        return self.get_paginated_response(
+            serialize_recipes(page, {"request": request})
+        )
 
     @action(
         detail=False, methods=["get"], permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        follows = Follow.objects.filter(user=self.request.user)
+        follows = Follow.objects.filter(
+            user=self.request.user, following__deleted_at__isnull=True
+        ).select_related("following")
+        if wants_field(request, "recipes_count"):
+            follows = follows.annotate(
+                recipes_count=Count(
+                    "following__recipe",
+                    filter=Q(following__recipe__deleted_at__isnull=True),
+                )
+            )
+        if wants_field(request, "recipes"):
+            recipes = Recipe.objects.only(
+                "id", "author_id", "name", "image", "cooking_time"
+            )
+            limit = request.GET.get("recipes_limit")
+            if limit and limit.isdigit():
+                # Первые recipes_limit рецептов каждого автора.
+                recipes = recipes.filter(id__in=Subquery(
+                    Recipe.objects.filter(author_id=OuterRef("author_id"))
+                    .values("id")[:int(limit)]
+                ))
+            follows = follows.prefetch_related(Prefetch(
+                "following__recipe", queryset=recipes, to_attr="recipe_page"
+            ))
         pages = self.paginate_queryset(follows)
         serializer = FollowSerializer(
             pages, many=True, context={"request": request}
@@ -109,7 +237,10 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 class TagViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    ReplicaReadMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     """Вьюсет для модели тегов."""
 
@@ -117,9 +248,17 @@ class TagViewSet(
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
 
+    def list(self, request, *args, **kwargs):
+        """Список тегов, заранее сериализованный в памяти процесса."""
+        tag_index.ensure_fresh()
+        return HttpResponse(tag_index.content, content_type="application/json")
+
 
 class IngredientViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    ReplicaReadMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     """Вьюсет для модели ингредиентов."""
 
@@ -129,36 +268,71 @@ class IngredientViewSet(
     filter_backends = (IngredientSearchFilter,)
     search_fields = ("^name",)
 
+    def list(self, request, *args, **kwargs):
+        """Поиск по началу названия из памяти процесса, как фильтр ^name."""
+        ingredient_name_index.ensure_fresh()
+        return Response(
+            ingredient_name_index.search(
+                IngredientSearchFilter().get_search_terms(request)
+            )
+        )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     Вьюсет модели Recipe, Favorite, ShoppingList
     с возможностью скачивания списка покупок в формате txt файла
     """
 
     queryset = Recipe.objects.all()
+    serializer_class = RecipeWriteSerializer
     permission_classes = (IsOwnerOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     pagination_class = CustomPagination
     filterset_class = RecipeFilter
 
-    def get_serializer_class(self):
-        if self.request.method in SAFE_METHODS:
-            return RecipeGETSerializer
-        return RecipeWriteSerializer
+    def get_queryset(self):
+        if self.action in ("list", "retrieve"):
+            return Recipe.objects.only("id", "author")
+        return super().get_queryset()
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({"request": self.request})
         return context
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.values_list("id", flat=True))
+        return self.get_paginated_response(
+            serialize_recipes(page, self.get_serializer_context())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        recipes = serialize_recipes([recipe.id], self.get_serializer_context())
+        if not recipes:
+            # Рецепт удалён между get_object и чтением документа.
+            raise Http404
+        return Response(recipes[0])
+
+    def perform_destroy(self, instance):
+        delete_recipes(Recipe.objects.filter(id=instance.id))
+
+    def publish_cart(self, model, recipe_id, in_cart):
+        if model is ShoppingList:
+            publish(
+                f"user:{self.request.user.id}",
+                "cart",
+                {"id": recipe_id, "is_in_shopping_cart": in_cart},
+            )
+
     def favorite_shopping(
         self,
         request,
         model,
         post_serializer,
         post_400_message,
-        delete_204_message,
     ):
         user = self.request.user
         id = self.kwargs.get("pk")
@@ -184,14 +358,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer = post_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             serializer.save(user=user, recipe=recipe)
+            invalidate_members(request, model)
+            record_event(model, recipe.id)
+            run_in_background(
+                mark_stale, user.id, recipe.id, include_recipe=False
+            )
+            self.publish_cart(model, recipe.id, True)
             return Response(
                 serializer.data, status=status.HTTP_201_CREATED
             )
         if favorite_recipe.exists():
             favorite_recipe.delete()
-            return Response(
-                delete_204_message, status=status.HTTP_204_NO_CONTENT
-            )
+            invalidate_members(request, model)
+            run_in_background(mark_stale, user.id, recipe.id)
+            self.publish_cart(model, recipe.id, False)
+            return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {"errors": "Объект не найден"}, status=status.HTTP_400_BAD_REQUEST
         )
@@ -207,7 +388,6 @@ class RecipeViewSet(viewsets.ModelViewSet):
             Favorite,
             FavoriteSerializer,
             "Рецепт уже в избранном",
-            "Рецепт удалён из избранного",
         )
 
     @action(
@@ -221,9 +401,114 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ShoppingList,
             ShoppingListSerializer,
             "Рецепт уже в списке покупок",
-            "Рецепт удалён из списка покупок",
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAdminUser],
+        url_path="import",
+    )
+    def bulk_import(self, request):
+        skip = request.query_params.get("skip", "0")
+        if not skip.isdigit():
+            return Response(
+                {"skip": "Номер строки должен быть целым числом"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        events = import_recipes(request.stream or [], request.user, int(skip))
+        return StreamingHttpResponse(
+            (
+                json.dumps(event, ensure_ascii=False) + "\n"
+                for event in events
+            ),
+            content_type="application/x-ndjson",
+        )
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        page = self.paginate_queryset(similar_recipes(recipe.id))
+        return self.get_paginated_response(
+            serialize_recipes(page, self.get_serializer_context())
         )
 
+    @action(
+        detail=False, methods=["get"], permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        page = self.paginate_queryset(feed_queryset(request))
+        return self.get_paginated_response(
+            serialize_recipes(
+                [recipe_id for recipe_id, _ in page],
+                self.get_serializer_context(),
+            )
+        )
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        since = request.query_params.get("since", "0")
+        if not since.isdigit():
+            return Response(
+                {"since": "Курсор должен быть целым числом"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        changes, cursor, has_more = changes_since(int(since))
+        recipes = {
+            recipe["id"]: recipe
+            for recipe in serialize_recipes(
+                [
+                    recipe_id for recipe_id, change in changes
+                    if change != RecipeChange.DELETED
+                ],
+                self.get_serializer_context(),
+            )
+        }
+        deltas = []
+        for recipe_id, change in changes:
+            if recipe_id in recipes:
+                deltas.append(
+                    {"id": recipe_id, "action": change,
+                     "recipe": recipes[recipe_id]}
+                )
+            else:
+                deltas.append(
+                    {"id": recipe_id, "action": RecipeChange.DELETED}
+                )
+        return Response(
+            {"cursor": cursor, "has_more": has_more, "changes": deltas}
+        )
+
+    @action(detail=False, methods=["get"])
+    def suggest(self, request):
+        recipe_name_index.ensure_fresh()
+        return Response(
+            recipe_name_index.search(request.query_params.get("q", ""))
+        )
+
+    @action(detail=False, methods=["get"])
+    def by_ingredients(self, request):
+        ingredient_ids = [
+            int(ingredient_id)
+            for ingredient_id in request.query_params.getlist("ingredients")
+            if ingredient_id.isdigit()
+        ]
+        if not ingredient_ids:
+            return Response(
+                {"ingredients": "Нужно выбрать ингредиент!"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        ingredient_index.ensure_fresh()
+        page = self.paginate_queryset(ingredient_index.rank(ingredient_ids))
+        data = serialize_recipes(
+            [recipe_id for recipe_id, _, _ in page],
+            self.get_serializer_context(),
+        )
+        counts = {recipe_id: found for recipe_id, *found in page}
+        for recipe in data:
+            recipe["matched"], recipe["missing"] = counts[recipe["id"]]
+        return self.get_paginated_response(data)
+
     @action(
         detail=False, methods=["get"], permission_classes=[IsAuthenticated]
     )
@@ -234,7 +519,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ingredients = (
                 (
                     Ingredient.objects.filter(
-                        recipe_ingredients__recipe__shopping_cart__user=user
+                        recipe_ingredients__recipe__shopping_cart__user=user,
+                        recipe_ingredients__recipe__deleted_at__isnull=True,
                     )
                 )
                 .values("name", measurement=F("measurement_unit"))
@@ -260,3 +546,70 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(
             "Список покупок пуст.", status=status.HTTP_404_NOT_FOUND
         )
+
+
+class EventTicketView(APIView):
+    """
+    Билет для подключения к потоку /api/events/ из браузера, где
+    EventSource не умеет передавать заголовок Authorization.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        return Response(
+            {
+                "ticket": issue_ticket(request.user),
+                "expires_in": settings.EVENTS_TICKET_MAX_AGE,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class DatabasePoolView(APIView):
+    """
+    Метрики пулов соединений с базой. Пул у каждого воркера свой,
+    ответ описывает воркер, обработавший запрос (поле pid).
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), "pools": pool_stats()})
+
+
+class BatchView(APIView):
+    """
+    Пакет GET-запросов к API: принимает список адресов
+    и возвращает ответы на них одним JSON.
+    """
+
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        requests = request.data
+        if not isinstance(requests, list) or not requests:
+            return Response(
+                {"errors": "Передайте список запросов"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(requests) > settings.BATCH_MAX_REQUESTS:
+            return Response(
+                {"errors": "Слишком много запросов в пакете"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        urls = []
+        for item in requests:
+            if (
+                not isinstance(item, dict)
+                or not isinstance(item.get("url"), str)
+                or item.get("method", "GET").upper() != "GET"
+            ):
+                return Response(
+                    {"errors": "Поддерживаются только GET-запросы с url"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            urls.append(item["url"])
+        return Response(
+            {"results": run_batch(request, urls)}, status=status.HTTP_200_OK
+        )
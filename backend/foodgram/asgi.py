@@ -2,6 +2,9 @@
 ASGI config for foodgram project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Поток событий /api/events/ обслуживается асинхронным обработчиком без
+Django, остальные запросы — Django, синхронная часть которого
+выполняется в пуле потоков.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +12,24 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from api.async_views import PooledASGIHandler  # noqa: E402
+from api.events import events_app  # noqa: E402
+
+django_application = PooledASGIHandler()
+
+ROUTES = {
+    "/api/events/": events_app,
+}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] in ROUTES:
+        await ROUTES[scope["path"]](scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -0,0 +1,246 @@
+"""
+Пул соединений с базой данных внутри процесса.
+
+Django открывает соединение на поток и закрывает его в конце запроса
+(CONN_MAX_AGE = 0). Бэкенды foodgram.db.* вместо открытия берут
+соединение из пула, а вместо закрытия возвращают его туда. Пул
+ограничен по размеру, проверяет соединение перед выдачей (pre-ping),
+закрывает соединения старше максимального срока жизни и считает
+метрики: время ожидания свободного соединения и исчерпание пула.
+
+Настройки задаются ключом POOL в настройках базы:
+    MAX_SIZE     — максимум соединений в процессе;
+    TIMEOUT      — сколько ждать свободного соединения, секунд;
+    MAX_LIFETIME — срок жизни соединения, секунд;
+    PRE_PING     — проверять соединение перед выдачей.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "MAX_SIZE": 10,
+    "TIMEOUT": 10,
+    "MAX_LIFETIME": 1800,
+    "PRE_PING": True,
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, max_size, timeout, max_lifetime, pre_ping):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._available = threading.Semaphore(max_size)
+        self._idle = deque()
+        self._created = {}
+        self.metrics = {
+            "checkouts": 0,
+            "created": 0,
+            "closed": 0,
+            "ping_failures": 0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.metrics,
+                "size": len(self._created),
+                "idle": len(self._idle),
+                "in_use": len(self._created) - len(self._idle),
+            }
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created.pop(id(connection), None)
+            self.metrics["closed"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, connection):
+        created = self._created.get(id(connection), 0)
+        return time.monotonic() - created > self.max_lifetime
+
+    def checkout(self, connect, ping):
+        """
+        Свободное соединение из пула или новое через connect().
+        ping(connection) должен бросить исключение для неисправного
+        соединения.
+        """
+        started = time.monotonic()
+        if not self._available.acquire(blocking=False):
+            with self._lock:
+                self.metrics["exhausted"] += 1
+            if not self._available.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.metrics["timeouts"] += 1
+                logger.warning("Пул соединений исчерпан: %s", self.stats())
+                raise PoolTimeout(
+                    f"Нет свободного соединения за {self.timeout} с"
+                )
+        waited = time.monotonic() - started
+        with self._lock:
+            self.metrics["checkouts"] += 1
+            self.metrics["wait_total"] += waited
+            self.metrics["wait_max"] = max(self.metrics["wait_max"], waited)
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    break
+                if self._expired(connection):
+                    self._discard(connection)
+                    continue
+                if self.pre_ping:
+                    try:
+                        ping(connection)
+                    except Exception:
+                        with self._lock:
+                            self.metrics["ping_failures"] += 1
+                        self._discard(connection)
+                        continue
+                return connection
+            connection = connect()
+            with self._lock:
+                self._created[id(connection)] = time.monotonic()
+                self.metrics["created"] += 1
+            return connection
+        except BaseException:
+            self._available.release()
+            raise
+
+    def checkin(self, connection, reset):
+        """
+        Возвращает соединение в пул. reset(connection) откатывает
+        незавершённую транзакцию и включает autocommit; при ошибке
+        соединение закрывается.
+        """
+        if id(connection) not in self._created:
+            # Соединение выдано не этим пулом.
+            connection.close()
+            return
+        try:
+            if self._expired(connection):
+                self._discard(connection)
+                return
+            try:
+                reset(connection)
+            except Exception:
+                self._discard(connection)
+                return
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._available.release()
+
+    def close_idle(self):
+        """Закрывает простаивающие соединения."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return
+                connection = self._idle.popleft()
+            self._discard(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, options):
+    """
+    Пул для параметров подключения в текущем процессе. После fork
+    дочерний процесс получает новый пул и не переиспользует сокеты
+    родителя.
+    """
+    pool = _pools.get(key)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                options = {**DEFAULTS, **options}
+                pool = _pools[key] = ConnectionPool(
+                    max_size=options["MAX_SIZE"],
+                    timeout=options["TIMEOUT"],
+                    max_lifetime=options["MAX_LIFETIME"],
+                    pre_ping=options["PRE_PING"],
+                )
+    return pool
+
+
+def pool_stats():
+    """Метрики всех пулов текущего процесса."""
+    return [
+        pool.stats() for pool in list(_pools.values())
+        if pool.pid == os.getpid()
+    ]
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Примесь к DatabaseWrapper бэкенда: соединения берутся из пула
+    и возвращаются в него. Бэкенд реализует ping_connection
+    и reset_connection для сырого соединения драйвера; reset_connection
+    откатывает незавершённую транзакцию и включает autocommit.
+    """
+
+    _pool = None
+
+    def ping_connection(self, connection):
+        raise NotImplementedError
+
+    def reset_connection(self, connection):
+        raise NotImplementedError
+
+    def get_new_connection(self, conn_params):
+        self._pool = get_pool(
+            repr(sorted(conn_params.items())),
+            self.settings_dict.get("POOL", {}),
+        )
+        try:
+            return self._pool.checkout(
+                functools.partial(super().get_new_connection, conn_params),
+                self.ping_connection,
+            )
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _close(self):
+        if self.connection is not None:
+            self._pool.checkin(self.connection, self.reset_connection)
+
+    def close_pool(self):
+        """Закрывает простаивающие соединения пула этого подключения."""
+        if self._pool is not None:
+            self._pool.close_idle()
+
+
+class PooledDatabaseCreationMixin:
+    """
+    Перед удалением тестовой базы закрывает соединения пула с ней,
+    иначе PostgreSQL не даст удалить базу с активными сессиями.
+    """
+
+    def destroy_test_db(self, *args, **kwargs):
+        self.connection.close()
+        self.connection.close_pool()
+        super().destroy_test_db(*args, **kwargs)
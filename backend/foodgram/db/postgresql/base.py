@@ -0,0 +1,36 @@
+"""PostgreSQL с пулом соединений foodgram.db.pool."""
+from django.db.backends.postgresql import base, creation
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from foodgram.db.pool import (PooledDatabaseCreationMixin,
+                              PooledDatabaseWrapperMixin)
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # Для соединения из пула базовый бэкенд не вызывался, а уровень
+        # изоляции нужен обёртке при управлении транзакциями.
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def ping_connection(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def reset_connection(self, connection):
+        if connection.closed:
+            raise self.Database.InterfaceError("Соединение закрыто")
+        if connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        # Иначе pre-ping при следующей выдаче откроет транзакцию, и
+        # set_autocommit в connect() завершится ошибкой.
+        connection.autocommit = True
@@ -0,0 +1,22 @@
+"""SQLite с пулом соединений foodgram.db.pool."""
+from django.db.backends.sqlite3 import base, creation
+
+from foodgram.db.pool import (PooledDatabaseCreationMixin,
+                              PooledDatabaseWrapperMixin)
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def ping_connection(self, connection):
+        connection.execute("SELECT 1").close()
+
+    def reset_connection(self, connection):
+        if connection.in_transaction:
+            connection.rollback()
+        # Режим autocommit, как его включает _set_autocommit бэкенда.
+        connection.isolation_level = None
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
@@ -7,10 +8,16 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv("SECRET_KEY", get_random_secret_key())
 
-DEBUG = os.getenv("DEBUG", "False").lower == "true"
+DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "127.0.0.1,localhost").split(",")
 
+# coreapi установлен только как зависимость djoser, схема API описана в
+# docs/openapi-schema.yml. Иначе rest_framework и django_filters при
+# старте каждого процесса загружают его вместе с pkg_resources и jinja2.
+sys.modules.setdefault("coreapi", None)
+sys.modules.setdefault("coreschema", None)
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -27,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.nplusone.NPlusOneMiddleware",
+    "api.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -56,17 +65,148 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "foodgram.wsgi.application"
 
+ASYNC_VIEWS_WORKERS = int(os.getenv("ASYNC_VIEWS_WORKERS", 16))
+BACKGROUND_TASKS_WORKERS = int(os.getenv("BACKGROUND_TASKS_WORKERS", 2))
+
+# Соединение с базой одновременно держат потоки запросов (под ASGI —
+# пул ASYNC_VIEWS_WORKERS), фоновые задачи, а также прогрев воркера
+# и авторизация потока событий. Подзапросы /api/batch/ делят соединение
+# своего запроса.
+DB_POOL_SIZE = int(
+    os.getenv("DB_POOL_SIZE", ASYNC_VIEWS_WORKERS + BACKGROUND_TASKS_WORKERS + 4)
+)
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "foodgram.db.postgresql",
         "NAME": os.getenv("POSTGRES_DB", "django"),
         "USER": os.getenv("POSTGRES_USER", "django"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", ""),
         "PORT": os.getenv("DB_PORT", 5432),
+        "POOL": {
+            "MAX_SIZE": DB_POOL_SIZE,
+            "TIMEOUT": int(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "MAX_LIFETIME": int(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+        },
     }
 }
 
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{index}")
+
+DATABASE_ROUTERS = ["api.replicas.ReplicaRouter"]
+
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 15))
+
+# Кэш должен быть общим для воркеров (см. api/caches.py), в infra/ это
+# memcached.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+MEMBERSHIP_CACHE_TIMEOUT = int(os.getenv("MEMBERSHIP_CACHE_TIMEOUT", 3600))
+MEMBERSHIP_LOCAL_TIMEOUT = 5
+
+BACKGROUND_TASKS_SYNC = (
+    os.getenv("BACKGROUND_TASKS_SYNC", "False").lower() == "true"
+)
+
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", 10000))
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+FEED_POPULAR_AUTHORS_TIMEOUT = 600
+
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "russian")
+
+INDEX_MAX_REPLAY = 100
+INDEX_DELTA_TIMEOUT = 3600
+INDEX_LOCAL_TIMEOUT = 60
+
+TAG_BITS_CACHE_TIMEOUT = 3600
+TAG_BITS_LOCAL_TIMEOUT = 60
+
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_COFAVORITE_WEIGHT = 0.7
+RECOMMENDATIONS_CART_WEIGHT = 0.5
+RECOMMENDATIONS_INGREDIENT_CANDIDATES = 200
+RECOMMENDATIONS_BATCH_SIZE = 500
+
+TRENDING_HALF_LIFE = 3 * 24 * 60 * 60
+TRENDING_CART_WEIGHT = 0.5
+TRENDING_MIN_SCORE = 1e-3
+
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", 4))
+
+RECIPE_CHANGES_PAGE_SIZE = 500
+RECIPE_CHANGES_LAG = 5
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "api.events.PostgresBroker")
+EVENTS_TICKET_MAX_AGE = 30
+EVENTS_HEARTBEAT = 15
+EVENTS_QUEUE_SIZE = 100
+
+DUPLICATES_PERMUTATIONS = 128
+DUPLICATES_BANDS = 32
+DUPLICATES_THRESHOLD = 0.5
+
+PURGE_BATCH_SIZE = 500
+
+EXPORT_CHUNK_SIZE = 500
+EXPORT_FILE_CHUNK = 64 * 1024
+
+IMPORT_BATCH_SIZE = 200
+IMPORT_IMAGE_WORKERS = int(os.getenv("IMPORT_IMAGE_WORKERS", 2))
+
+NPLUSONE_MODE = os.getenv("NPLUSONE_MODE", "log" if DEBUG else "")
+NPLUSONE_THRESHOLD = 5
+NPLUSONE_ALLOWLIST = []
+
+THROTTLE_BACKEND = os.getenv(
+    "THROTTLE_BACKEND", "api.throttling.LocalCounters"
+)
+THROTTLE_WINDOW = 60
+THROTTLE_USER_BUDGET = int(os.getenv("THROTTLE_USER_BUDGET", 600))
+THROTTLE_IP_BUDGET = int(os.getenv("THROTTLE_IP_BUDGET", 1200))
+THROTTLE_BODY_UNIT = 256 * 1024
+THROTTLE_COSTS = {
+    "recipes.create": 10,
+    "recipes.update": 10,
+    "recipes.partial_update": 10,
+    "recipes.destroy": 5,
+    "recipes.favorite": 2,
+    "recipes.shopping_cart": 2,
+    "recipes.download_shopping_cart": 20,
+    "recipes.bulk_import": 100,
+    "recipes.by_ingredients": 5,
+    "recipes.similar": 2,
+    "recipes.feed": 2,
+    "recipes.changes": 2,
+    "users.create": 10,
+    "users.destroy": 10,
+    "users.set_password": 10,
+    "users.subscribe": 2,
+    "users.subscriptions": 2,
+    "users.recommended": 5,
+    "users.export": 100,
+}
+
+SUGGEST_LIMIT = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -101,6 +241,8 @@ MEDIA_ROOT = BASE_DIR / "media/"
 
 AUTH_USER_MODEL = "users.User"
 
+TEST_RUNNER = "api.runner.NPlusOneTestRunner"
+
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -111,4 +253,9 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
     ],
+    "DEFAULT_THROTTLE_CLASSES": [
+        "api.throttling.CostThrottle",
+    ],
+    # Перед приложением стоит nginx: адрес клиента — в X-Forwarded-For.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 1)),
 }
@@ -0,0 +1,62 @@
+"""
+Прогрев процесса сервера до первого запроса.
+
+Без прогрева первый запрос каждого воркера импортирует представления,
+сериализаторы и Pillow, собирает маршруты, загружает переводы, открывает
+соединение с базой и строит индексы тегов, ингредиентов и названий
+рецептов.
+load_modules() не обращается к базе и может выполняться в мастере
+gunicorn до fork: импортированные модули станут общими для воркеров.
+warm_up() выполняется в каждом воркере.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver, reverse
+from django.utils import translation
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+ROUTES = ("recipes-list", "users-list", "tags-list", "ingredients-list")
+
+
+def load_modules():
+    """Импортирует модули и готовит маршруты и переводы."""
+    resolver = get_resolver()
+    for name in ROUTES:
+        resolver.resolve(reverse(name))
+    Image.preinit()
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext("")
+
+
+def close_connections():
+    """
+    Закрывает соединения с базой и простаивающие соединения пула:
+    сокеты, унаследованные через fork, оказались бы общими у процессов.
+    """
+    for connection in connections.all():
+        connection.close()
+        if hasattr(connection, "close_pool"):
+            connection.close_pool()
+
+
+def warm_up():
+    """Открывает соединение с базой и заполняет кэши процесса."""
+    from api.indexes import ingredient_name_index, recipe_name_index, tag_index
+    from api.models import Tag
+
+    load_modules()
+    try:
+        Tag.slug_bits()
+        tag_index.ensure_fresh()
+        ingredient_name_index.ensure_fresh()
+        recipe_name_index.ensure_fresh()
+    except Exception:
+        # Кэши заполнит первый запрос, воркер запускается и так.
+        logger.exception("Не удалось прогреть кэши процесса")
+    finally:
+        # Соединение возвращается в пул и достанется первому запросу.
+        connections.close_all()
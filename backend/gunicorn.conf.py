@@ -0,0 +1,42 @@
+"""
+Настройки gunicorn, файл читается из рабочего каталога.
+
+Приложение загружается в мастере до запуска воркеров (preload_app):
+Django, DRF и модели импортируются один раз и делятся между воркерами.
+Перед fork мастер закрывает соединения с базой, после fork каждый воркер
+прогревается: открывает соединение и заполняет кэши до первого запроса.
+
+По умолчанию воркеры синхронные (foodgram.wsgi). GUNICORN_ASGI=true
+запускает foodgram.asgi в воркерах uvicorn: так работает сервис events
+из infra/, который держит потоки /api/events/.
+"""
+import multiprocessing
+import os
+
+if os.getenv("GUNICORN_ASGI", "False").lower() == "true":
+    wsgi_app = "foodgram.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "foodgram.wsgi"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+preload_app = True
+
+
+def when_ready(server):
+    from foodgram.warmup import load_modules
+
+    load_modules()
+
+
+def pre_fork(server, worker):
+    from foodgram.warmup import close_connections
+
+    close_connections()
+
+
+def post_fork(server, worker):
+    from foodgram.warmup import warm_up
+
+    warm_up()
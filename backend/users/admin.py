@@ -1,10 +1,12 @@
-from django.contrib.admin import ModelAdmin, register
+from django.contrib.admin import register
 
+from api.admin import LargeTableAdmin, SoftDeleteMixin
+from api.deletion import delete_user
 from users.models import User
 
 
 @register(User)
-class UserAdmin(ModelAdmin):
+class UserAdmin(SoftDeleteMixin, LargeTableAdmin):
 
     list_display = (
         "id",
@@ -15,7 +17,8 @@ class UserAdmin(ModelAdmin):
         "role",
     )
     search_fields = ("username", "email")
-    list_filter = (
-        "username",
-        "email",
-    )
+    list_filter = ("role",)
+
+    def soft_delete(self, queryset):
+        for user in queryset:
+            delete_user(user)
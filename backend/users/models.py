@@ -1,4 +1,4 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -10,6 +10,13 @@ ROLES = (
 )
 
 
+class ActiveUserManager(UserManager):
+    """Пользователи, кроме помеченных на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class User(AbstractUser):
     username = models.CharField(
         _("username"),
@@ -31,6 +38,14 @@ class User(AbstractUser):
     first_name = models.CharField(_("имя"), max_length=150,)
     last_name = models.CharField(_("фамилия"), max_length=150,)
     password = models.CharField(_("Пароль"), max_length=150,)
+    deleted_at = models.DateTimeField(
+        _("Дата удаления"), null=True, blank=True, db_index=True,
+        editable=False,
+    )
+
+    objects = ActiveUserManager()
+    all_objects = UserManager()
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "password", "first_name", "last_name"]
 